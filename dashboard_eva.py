@@ -11,10 +11,17 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import io
 import json
+import logging
 import os
+import re
+import threading
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
 
 # Configuración de la página
 st.set_page_config(
@@ -405,6 +412,63 @@ CALIFICACION_COLORS = {
 }
 
 
+# =============================================================================
+# CACHE DE FIGURAS PLOTLY
+# =============================================================================
+# Las figuras se guardan serializadas (JSON) bajo una clave de contenido:
+# (tipo de gráfico, hash de los datos de entrada, hash de las opciones).
+# El cache es del proceso, así que lo comparten todos los usuarios: dos
+# supervisores mirando el mismo equipo reutilizan la misma figura. La
+# expulsión es LRU con un máximo de MAX_FIGURAS_CACHE entradas.
+MAX_FIGURAS_CACHE = 256
+_CACHE_FIGURAS = OrderedDict()
+_CACHE_FIGURAS_LOCK = threading.Lock()
+
+
+def hash_entrada_figura(*partes):
+    """
+    Hash estable de los datos de entrada de un gráfico. Los DataFrame/Series se
+    hashean por contenido (valores, índice, columnas y tipos); el resto se
+    serializa a JSON con claves ordenadas.
+    """
+    h = hashlib.sha1()
+    for parte in partes:
+        if isinstance(parte, pd.DataFrame):
+            h.update(json.dumps([list(map(str, parte.columns)), list(map(str, parte.dtypes))]).encode())
+            h.update(pd.util.hash_pandas_object(parte, index=True).to_numpy().tobytes())
+        elif isinstance(parte, pd.Series):
+            h.update(json.dumps([str(parte.name), str(parte.dtype)]).encode())
+            h.update(pd.util.hash_pandas_object(parte, index=True).to_numpy().tobytes())
+        else:
+            h.update(json.dumps(parte, default=str, sort_keys=True).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+def figura_cacheada(tipo, datos, construir, **opciones):
+    """
+    Devuelve la figura de tipo `tipo` para `datos` y `opciones`, construyéndola
+    con `construir()` sólo si no está en el cache. `datos` debe incluir todo lo
+    que `construir` lee; cada acierto devuelve una figura nueva, así que el
+    llamador puede modificarla sin afectar al cache.
+    """
+    clave = (tipo, hash_entrada_figura(datos), hash_entrada_figura(opciones))
+    with _CACHE_FIGURAS_LOCK:
+        fig_json = _CACHE_FIGURAS.get(clave)
+        if fig_json is not None:
+            _CACHE_FIGURAS.move_to_end(clave)
+    if fig_json is not None:
+        return go.Figure(json.loads(fig_json))
+
+    fig = construir()
+    with _CACHE_FIGURAS_LOCK:
+        _CACHE_FIGURAS[clave] = fig.to_json()
+        _CACHE_FIGURAS.move_to_end(clave)
+        while len(_CACHE_FIGURAS) > MAX_FIGURAS_CACHE:
+            _CACHE_FIGURAS.popitem(last=False)
+    return fig
+
+
 def agrupar_valores_pequenos(values, names, umbral=4):
     """
     Agrupa valores menores al umbral% en 'Otros' y retorna info del hover
@@ -441,6 +505,22 @@ def crear_pie_chart_expandible(values, names, titulo, colors, key_id, height_nor
     """
     Crea un gráfico de pie limpio con leyenda lateral y opción de popup
     """
+    values, names, colors = list(values), list(names), list(colors)
+    fig = figura_cacheada(
+        'pie_expandible', [values, names, colors],
+        lambda: _figura_pie_expandible(values, names, colors, height_normal),
+        height=height_normal
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Botón para popup
+    if st.button(f"🔍 Ver detalle", key=f"btn_{key_id}"):
+        otros_info = agrupar_valores_pequenos(values, names)[2]
+        mostrar_popup_grafico(titulo, values, names, colors, otros_info, key_id)
+
+
+def _figura_pie_expandible(values, names, colors, height_normal):
+    """Arma la figura de crear_pie_chart_expandible (sin cache)"""
     # Agrupar valores pequeños
     values_agrupados, names_agrupados, otros_info = agrupar_valores_pequenos(list(values), list(names))
     total = sum(values_agrupados)
@@ -505,11 +585,7 @@ def crear_pie_chart_expandible(values, names, titulo, colors, key_id, height_nor
         )
     )
     
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Botón para popup
-    if st.button(f"🔍 Ver detalle", key=f"btn_{key_id}"):
-        mostrar_popup_grafico(titulo, values, names, colors, otros_info, key_id)
+    return fig
 
 
 @st.dialog("📊 Vista Detallada", width="large")
@@ -521,26 +597,23 @@ def mostrar_popup_grafico(titulo, values, names, colors, otros_info, key_id):
     values_agrupados, names_agrupados, otros_desglose = agrupar_valores_pequenos(list(values), list(names))
     total = sum(values_agrupados)
     
-    # Crear hover text
-    hover_texts = []
-    for n, v in zip(names_agrupados, values_agrupados):
-        pct = (v / total) * 100 if total > 0 else 0
-        if n == 'Otros' and otros_desglose:
-            desglose = "<br>".join([f"• {k}: {d['cantidad']} ({d['porcentaje']}%)" 
-                                   for k, d in otros_desglose.items()])
-            hover_texts.append(f"<b>Otros</b><br>Total: {v} ({pct:.1f}%)<br><b>Desglose:</b><br>{desglose}")
-        else:
-            hover_texts.append(f"<b>{n}</b><br>Cantidad: {v}<br>Porcentaje: {pct:.1f}%")
-    
-    # Colores
-    cols = list(colors)
-    if 'Otros' in names_agrupados:
-        cols = cols[:len(names_agrupados)-1] + ['#7F8C8D']
+    def _figura_detalle():
+        # Crear hover text
+        hover_texts = []
+        for n, v in zip(names_agrupados, values_agrupados):
+            pct = (v / total) * 100 if total > 0 else 0
+            if n == 'Otros' and otros_desglose:
+                desglose = "<br>".join([f"• {k}: {d['cantidad']} ({d['porcentaje']}%)" 
+                                       for k, d in otros_desglose.items()])
+                hover_texts.append(f"<b>Otros</b><br>Total: {v} ({pct:.1f}%)<br><b>Desglose:</b><br>{desglose}")
+            else:
+                hover_texts.append(f"<b>{n}</b><br>Cantidad: {v}<br>Porcentaje: {pct:.1f}%")
     
-    # Layout en dos columnas: gráfico y tabla
-    col_grafico, col_tabla = st.columns([3, 2])
+        # Colores
+        cols = list(colors)
+        if 'Otros' in names_agrupados:
+            cols = cols[:len(names_agrupados)-1] + ['#7F8C8D']
     
-    with col_grafico:
         fig = go.Figure(data=[go.Pie(
             values=values_agrupados,
             labels=names_agrupados,
@@ -555,7 +628,7 @@ def mostrar_popup_grafico(titulo, values, names, colors, otros_info, key_id):
             hovertemplate='%{customdata}<extra></extra>',
             customdata=hover_texts
         )])
-        
+    
         fig.update_layout(
             height=380,
             margin=dict(t=15, b=15, l=15, r=15),
@@ -574,6 +647,13 @@ def mostrar_popup_grafico(titulo, values, names, colors, otros_info, key_id):
             )
         )
         
+        return fig
+    
+    # Layout en dos columnas: gráfico y tabla
+    col_grafico, col_tabla = st.columns([3, 2])
+    
+    with col_grafico:
+        fig = figura_cacheada('pie_detalle', [list(values), list(names), list(colors)], _figura_detalle)
         st.plotly_chart(fig, use_container_width=True)
     
     with col_tabla:
@@ -597,109 +677,152 @@ def mostrar_popup_grafico(titulo, values, names, colors, otros_info, key_id):
             st.dataframe(df_otros, use_container_width=True, hide_index=True)
 
 
-# Directorio base del script
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# =============================================================================
+# TABLA PAGINADA
+# =============================================================================
+# st.dataframe serializa el frame completo por el websocket en cada rerun.
+# tabla_paginada resuelve búsqueda y orden en el servidor y envía sólo la
+# página visible; el CSV se genera aparte y sólo cuando se pide.
+FILAS_POR_PAGINA = [25, 50, 100, 200]
+SIN_ORDEN_TABLA = '(orden actual)'
 
-# Variables y helpers para precarga de datos en background
-_DATOS_PRELOAD = None
-_DATOS_LOADING = False
 
-def cargar_datos_io():
-    """Versión pura de IO de carga de datos sin usar Streamlit ni decoradores.
-    Usa la misma lógica que carga_datos() pero sin interacciones con Streamlit.
+def posiciones_tabla(df, buscar='', columna=None, descendente=False):
     """
-    datos = {}
-
-    # Cargar evaluaciones primero para saber qué archivos cargar
-    ruta_eval = os.path.join(BASE_DIR, 'reportes/evaluaciones_gemini.csv')
-    archivos_evaluados = set()
-    if os.path.exists(ruta_eval):
-        try:
-            df_eval = pd.read_csv(ruta_eval)
-            archivos_evaluados = set(df_eval['archivo'].tolist())
-        except Exception:
-            pass
-
-    # Cargar transcripciones mejoradas (solo las que tienen evaluación)
-    carpeta = os.path.join(BASE_DIR, "transcripts/mejorados_gemini")
-    if os.path.exists(carpeta):
-        transcripciones = []
-        for archivo in os.listdir(carpeta):
-            if archivo.endswith('.json') and archivo in archivos_evaluados:
-                try:
-                    with open(os.path.join(carpeta, archivo), 'r', encoding='utf-8') as f:
-                        transcripciones.append(json.load(f))
-                except Exception:
-                    continue
-        datos['transcripciones'] = transcripciones
-
-    # Cargar resumen de cierres
-    ruta_cierres = os.path.join(BASE_DIR, 'reportes/cierres_comerciales/resumen_cierres.json')
-    if os.path.exists(ruta_cierres):
-        try:
-            with open(ruta_cierres, 'r', encoding='utf-8') as f:
-                datos['cierres'] = json.load(f)
-        except Exception:
-            datos['cierres'] = None
-
-    # Cargar CSV de cierres
-    ruta = os.path.join(BASE_DIR, 'reportes/cierres_comerciales/cierres_comerciales.csv')
-    if os.path.exists(ruta):
+    Posiciones (np.ndarray) de las filas de `df` que contienen `buscar` en
+    alguna columna de texto, ordenadas por `columna` (estable, nulos al final).
+    """
+    posiciones = np.arange(len(df))
+    if buscar:
+        mascara = np.zeros(len(df), dtype=bool)
+        for i in range(df.shape[1]):
+            serie = df.iloc[:, i]
+            if serie.dtype == object or isinstance(serie.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+                mascara |= serie.astype('string').str.contains(
+                    buscar, case=False, regex=False, na=False
+                ).to_numpy(dtype=bool)
+        posiciones = posiciones[mascara]
+    if columna is not None:
+        serie = df[columna].iloc[posiciones].reset_index(drop=True)
         try:
-            datos['cierres_df'] = pd.read_csv(ruta, sep=';')
-        except Exception:
-            datos['cierres_df'] = None
+            orden = serie.sort_values(ascending=not descendente, kind='stable', na_position='last')
+        except TypeError:
+            # Columnas con tipos mezclados: ordenar por su texto
+            orden = serie.astype('string').sort_values(ascending=not descendente, kind='stable', na_position='last')
+        posiciones = posiciones[orden.index.to_numpy()]
+    return posiciones
 
-    # Cargar resumen de planes
-    ruta = os.path.join(BASE_DIR, 'reportes/planes/resumen_planes.json')
-    if os.path.exists(ruta):
-        try:
-            with open(ruta, 'r', encoding='utf-8') as f:
-                datos['planes_resumen'] = json.load(f)
-        except Exception:
-            datos['planes_resumen'] = None
 
-    # Cargar para_gemini CSV
-    ruta = os.path.join(BASE_DIR, 'reportes/para_gemini/datos_consolidados_para_gemini.csv')
-    if os.path.exists(ruta):
-        try:
-            datos['para_gemini'] = pd.read_csv(ruta)
-        except Exception:
-            datos['para_gemini'] = None
+def huella_tabla(df):
+    """
+    Huella del contenido de `df`: las páginas rearman sus tablas en cada rerun,
+    así que la identidad del objeto no sirve para saber si la tabla cambió.
+    """
+    digest = hashlib.sha1(repr((len(df), [str(c) for c in df.columns])).encode('utf-8'))
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Celdas no hasheables (listas, diccionarios): se comparan por su texto
+        digest.update(pd.util.hash_pandas_object(df.astype(str), index=True).to_numpy().tobytes())
+    return digest.hexdigest()
 
-    # Cargar evaluaciones
-    ruta = os.path.join(BASE_DIR, 'reportes/evaluaciones_gemini.csv')
-    if os.path.exists(ruta):
-        try:
-            df_eval = pd.read_csv(ruta)
-            datos['evaluaciones'] = df_eval
-            datos['evaluaciones_gemini_df'] = df_eval
-        except Exception:
-            datos['evaluaciones'] = None
-            datos['evaluaciones_gemini_df'] = None
 
-    return datos
+def boton_descarga_csv(df, etiqueta, nombre_archivo, key, filas=None, huella=None, **kwargs):
+    """
+    Exportación CSV en dos pasos: el archivo se genera recién al pedirlo (no
+    en cada rerun) y se descarta cuando cambia el contenido de la tabla o las
+    filas. `huella` es huella_tabla(df) si quien llama ya la calculó.
+    """
+    estado = f'csv_{key}'
+    huella = (huella or huella_tabla(df),
+              None if filas is None else hashlib.sha1(np.asarray(filas).tobytes()).hexdigest())
+    if st.button(etiqueta, key=f'{estado}_preparar', **kwargs):
+        datos_csv = df if filas is None else df.iloc[filas]
+        st.session_state[estado] = {
+            'huella': huella,
+            'csv': datos_csv.to_csv(index=False).encode('utf-8'),
+        }
+    preparado = st.session_state.get(estado)
+    if preparado and preparado['huella'] == huella:
+        st.download_button(
+            label="💾 Guardar CSV",
+            data=preparado['csv'],
+            file_name=nombre_archivo,
+            mime="text/csv",
+            key=f'{estado}_descargar',
+            **kwargs
+        )
+    elif preparado:
+        del st.session_state[estado]
 
 
-def iniciar_preload_datos():
-    """Inicia la carga de datos en un thread de fondo para no bloquear la UI.
-    Guarda el resultado en la variable global _DATOS_PRELOAD.
-    Usa la versión IO para evitar que Streamlit muestre mensajes internos como "Running cargar_datos()".
+def tabla_paginada(df, key, filas_por_pagina=50, estilo=None, nombre_csv=None,
+                   buscable=True, ordenable=True, **kwargs_dataframe):
     """
-    global _DATOS_PRELOAD, _DATOS_LOADING
-    import threading
-    if _DATOS_LOADING or _DATOS_PRELOAD is not None:
-        return
-    def _bg():
-        global _DATOS_PRELOAD, _DATOS_LOADING
-        _DATOS_LOADING = True
-        try:
-            _DATOS_PRELOAD = cargar_datos_io()
-        finally:
-            _DATOS_LOADING = False
+    Muestra `df` de a una página con búsqueda y orden resueltos en el servidor.
+    `estilo` recibe la página y devuelve un Styler (se estiliza sólo lo
+    visible); `nombre_csv` agrega la exportación de las filas filtradas.
+    El resto de los argumentos se pasan a st.dataframe. Devuelve la página.
+    """
+    buscar, columna, descendente = '', None, False
+    if buscable or ordenable:
+        col_buscar, col_orden, col_dir = st.columns([3, 2, 1])
+        if buscable:
+            with col_buscar:
+                buscar = st.text_input("🔎 Buscar", key=f'{key}_buscar').strip()
+        if ordenable:
+            with col_orden:
+                opcion = st.selectbox("Ordenar por", [SIN_ORDEN_TABLA] + list(df.columns),
+                                      format_func=str, key=f'{key}_orden')
+            with col_dir:
+                descendente = st.selectbox("Dirección", ['↑ Asc', '↓ Desc'], key=f'{key}_dir') == '↓ Desc'
+            columna = None if opcion == SIN_ORDEN_TABLA else opcion
+
+    # Posiciones filtradas/ordenadas, memoizadas mientras el contenido de la
+    # tabla sea el mismo (en la sesión queda solo la huella, no la tabla)
+    huella = huella_tabla(df)
+    memo = st.session_state.setdefault(f'tabla_paginada_{key}', {'huella': None, 'resultados': {}})
+    if memo['huella'] != huella:
+        memo['huella'] = huella
+        memo['resultados'] = {}
+    clave = (buscar, columna, descendente)
+    if clave not in memo['resultados']:
+        memo['resultados'][clave] = posiciones_tabla(df, buscar, columna, descendente)
+    posiciones = memo['resultados'][clave]
+    total = len(posiciones)
+
+    # Volver a la primera página cuando cambian la búsqueda o el orden
+    key_pagina = f'{key}_pagina'
+    if st.session_state.get(f'{key}_consulta') != clave:
+        st.session_state[f'{key}_consulta'] = clave
+        st.session_state[key_pagina] = 1
+
+    col_pagina, col_filas, col_info = st.columns([1, 1, 2])
+    with col_filas:
+        indice = FILAS_POR_PAGINA.index(filas_por_pagina) if filas_por_pagina in FILAS_POR_PAGINA else 0
+        filas = st.selectbox("Filas por página", FILAS_POR_PAGINA, index=indice, key=f'{key}_filas')
+    paginas = max(1, -(-total // filas))
+    if st.session_state.get(key_pagina, 1) > paginas:
+        st.session_state[key_pagina] = paginas
+    with col_pagina:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, step=1, key=key_pagina)
+
+    inicio = (int(pagina) - 1) * filas
+    df_pagina = df.iloc[posiciones[inicio:inicio + filas]]
+    with col_info:
+        texto = f"Filas {min(inicio + 1, total):,}–{inicio + len(df_pagina):,} de {total:,}"
+        if total != len(df):
+            texto += f" (filtradas de {len(df):,})"
+        st.caption(texto)
+
+    st.dataframe(estilo(df_pagina) if estilo else df_pagina, **kwargs_dataframe)
+    if nombre_csv:
+        boton_descarga_csv(df, "📥 Exportar CSV", nombre_csv, key, filas=posiciones, huella=huella)
+    return df_pagina
+
 
-    th = threading.Thread(target=_bg, daemon=True)
-    th.start()
+# Directorio base del script
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Mapeo de nombres de criterios para gráficos
 CRITERIOS_NOMBRES = {
@@ -1616,6 +1739,31 @@ def obtener_permisos_usuario():
     return permisos
 
 
+def clave_alcance(permisos):
+    """
+    Alcance de datos de una sesión según sus permisos:
+    ('todos',), ('equipo', (equipos...)) o ('agente', nombre en minúsculas).
+    """
+    if not permisos or permisos['puede_ver_todos']:
+        return ('todos',)
+    if permisos['vendedores_permitidos']:
+        return ('agente', permisos['vendedores_permitidos'][0].lower())
+    if permisos['equipos_permitidos']:
+        return ('equipo', tuple(permisos['equipos_permitidos']))
+    return ('todos',)
+
+
+def mascara_vendedor(serie, nombre_vendedor):
+    """
+    Máscara de las filas cuyo agente contiene el nombre del vendedor. La
+    comparación se hace una vez por valor distinto, no por fila.
+    """
+    nombre = str(nombre_vendedor).lower()
+    valores = pd.Series(serie.dropna().unique())
+    coincidentes = valores[valores.astype(str).str.lower().str.contains(nombre, regex=False)]
+    return serie.isin(coincidentes)
+
+
 def filtrar_datos_por_permisos(df, permisos, columna_agente='agente', columna_equipo='equipo'):
     """
     Filtra un DataFrame según los permisos del usuario.
@@ -1624,16 +1772,12 @@ def filtrar_datos_por_permisos(df, permisos, columna_agente='agente', columna_eq
     if permisos['puede_ver_todos']:
         return df
     
-    df_filtrado = df.copy()
+    df_filtrado = df
     
     # Filtrar por vendedores específicos primero (para vendedores)
     if permisos['vendedores_permitidos']:
-        nombre_usuario = permisos['vendedores_permitidos'][0].lower()
         if columna_agente in df_filtrado.columns:
-            mask = df_filtrado[columna_agente].apply(
-                lambda x: nombre_usuario in str(x).lower() if pd.notna(x) else False
-            )
-            df_filtrado = df_filtrado[mask]
+            df_filtrado = df_filtrado[mascara_vendedor(df_filtrado[columna_agente], permisos['vendedores_permitidos'][0])]
         return df_filtrado
     
     # Filtrar por equipo (para supervisores)
@@ -1838,7 +1982,7 @@ def mostrar_login():
                     if valido:
                         # Iniciar carga de datos en background para evitar que la UI muestre "Running cargar_datos()" inmediatamente
                         try:
-                            iniciar_preload_datos()
+                            precargar_fuentes()
                             st.session_state['datos_preload_started'] = True
                         except Exception:
                             # En caso de algún error, no impedir el login
@@ -1930,7 +2074,7 @@ def cargar_listado_vendedores():
         ruta_listado = os.path.join(BASE_DIR, 'LISTADO-DE-VENDEDORES.csv')
         df_listado = pd.read_csv(ruta_listado, header=0)
         for _, row in df_listado.iterrows():
-            usuario = str(row.iloc[0]).strip().lower().replace('\t', '').replace(' ', '')
+            usuario = normalizar_id_agente(row.iloc[0])
             nombre = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ""
             equipo = str(row.iloc[2]).strip() if len(row) > 2 and pd.notna(row.iloc[2]) else "Sin Equipo"
             if usuario and nombre and usuario != 'usuario':
@@ -1944,49 +2088,270 @@ def cargar_listado_vendedores():
         pass
     return listado_vendedores, equipos_vendedores
 
+# Los códigos de agente llegan como amza10, MZA 10, MZA_10, Mza_51 o mza10 según
+# el reporte: todos se llevan al ID canónico amza<n> del listado de vendedores
+PATRON_CODIGO_AGENTE = r'^a?mza0*(\d+)$'
+
+
+def normalizar_ids_agentes(serie):
+    """
+    Normaliza IDs de agente en bloque al ID canónico: minúsculas, sin espacios,
+    tabs ni guiones bajos y con el prefijo amza (MZA_10 -> amza10)
+    """
+    normalizados = serie.astype(str).str.strip().str.lower().str.replace(r'[\s_]+', '', regex=True)
+    return normalizados.str.replace(PATRON_CODIGO_AGENTE, r'amza\1', regex=True)
+
+
+def normalizar_id_agente(valor):
+    """ID canónico de un único código de agente (ver normalizar_ids_agentes)"""
+    return normalizar_ids_agentes(pd.Series([valor])).iloc[0]
+
+
+# Índice normalizado usuario -> (nombre, equipo), compartido entre sesiones y
+# reconstruido solo cuando cambia LISTADO-DE-VENDEDORES.csv. 'tabla' es la
+# tabla de identidades (ID canónico, alias, nombre, equipo) y 'alias' el mapa
+# alias -> ID canónico con que se resuelven códigos y nombres.
+_INDICE_VENDEDORES = {'firma': None, 'indice': {}, 'tabla': pd.DataFrame(), 'alias': {}}
+
+
+def obtener_indice_vendedores():
+    """Devuelve el índice {usuario_normalizado: (nombre, equipo)} del listado de vendedores"""
+    ruta_listado = os.path.join(BASE_DIR, 'LISTADO-DE-VENDEDORES.csv')
+    firma = firma_archivo(ruta_listado)
+    if _INDICE_VENDEDORES['firma'] != firma or firma is None:
+        indice = {}
+        tabla = pd.DataFrame(columns=['agente_id', 'alias', 'nombre', 'equipo'])
+        alias = {}
+        try:
+            df_listado = pd.read_csv(ruta_listado, header=0, dtype=str)
+            usuarios = normalizar_ids_agentes(df_listado.iloc[:, 0])
+            nombres = df_listado.iloc[:, 1].str.strip().str.title()
+            if df_listado.shape[1] > 2:
+                equipos = df_listado.iloc[:, 2].str.strip().fillna("Sin Equipo")
+            else:
+                equipos = pd.Series("Sin Equipo", index=df_listado.index)
+            validos = nombres.notna() & (nombres != '') & (usuarios != '') & (usuarios != 'usuario')
+            indice = dict(zip(usuarios[validos], zip(nombres[validos], equipos[validos])))
+            tabla = construir_tabla_agentes(df_listado.iloc[:, 0][validos], indice)
+            alias = {a: fila.agente_id for fila in tabla.itertuples() for a in fila.alias}
+        except Exception:
+            pass
+        _INDICE_VENDEDORES.update(firma=firma, indice=indice, tabla=tabla, alias=alias)
+    return _INDICE_VENDEDORES['indice']
+
+
+def construir_tabla_agentes(usuarios, indice):
+    """
+    Tabla de identidades de agente: una fila por ID canónico con sus alias
+    (códigos tal como figuran en el listado, la variante mza<n> y el nombre en
+    minúsculas), el nombre real y el equipo.
+    """
+    crudos = defaultdict(set)
+    for usuario in usuarios:
+        crudos[normalizar_id_agente(usuario)].add(str(usuario).strip())
+    filas = []
+    for agente_id, (nombre, equipo) in indice.items():
+        alias = {agente_id, nombre.lower()} | {c.lower() for c in crudos[agente_id]}
+        if agente_id.startswith('amza') and agente_id[4:].isdigit():
+            alias.add(agente_id[1:])
+        filas.append((agente_id, sorted(alias), nombre, equipo))
+    return pd.DataFrame(filas, columns=['agente_id', 'alias', 'nombre', 'equipo'])
+
+
+def obtener_tabla_agentes():
+    """Tabla de identidades de agente vigente (ver construir_tabla_agentes)"""
+    obtener_indice_vendedores()
+    return _INDICE_VENDEDORES['tabla']
+
+
+# Memo valor crudo -> (agente_id, nombre, equipo), o None si no se encontró;
+# se descarta cuando cambia la versión del listado
+_RESOLUCION_AGENTES = {'firma': None, 'memo': {}}
+
+
+def resolver_agentes(serie):
+    """
+    Resuelve una columna de códigos o nombres de agente contra la tabla de
+    identidades en una sola pasada: cada valor distinto se normaliza y se busca
+    una única vez (y queda memoizado), luego se hace un map. Retorna un
+    DataFrame alineado con `serie` con agente_id, nombre y equipo (nulos si no
+    hubo coincidencia; ver agentes_sin_resolver).
+    """
+    obtener_indice_vendedores()
+    if _RESOLUCION_AGENTES['firma'] != _INDICE_VENDEDORES['firma']:
+        _RESOLUCION_AGENTES.update(firma=_INDICE_VENDEDORES['firma'], memo={})
+    memo = _RESOLUCION_AGENTES['memo']
+    indice, alias = _INDICE_VENDEDORES['indice'], _INDICE_VENDEDORES['alias']
+
+    nuevos = pd.Series([v for v in serie.dropna().unique() if v not in memo], dtype=object)
+    if not nuevos.empty:
+        # Primero como código, después como nombre
+        ids = normalizar_ids_agentes(nuevos).map(alias)
+        ids = ids.where(ids.notna(), nuevos.astype(str).str.strip().str.lower().map(alias))
+        for valor, agente_id in zip(nuevos, ids):
+            memo[valor] = (agente_id,) + indice[agente_id] if pd.notna(agente_id) else None
+
+    resueltos = {v: memo[v] for v in serie.dropna().unique() if memo[v] is not None}
+    return pd.DataFrame({
+        campo: serie.map({v: r[i] for v, r in resueltos.items()}).astype(object)
+        for i, campo in enumerate(['agente_id', 'nombre', 'equipo'])
+    }, index=serie.index)
+
+
+def agentes_sin_resolver():
+    """Valores de agente vistos que no coinciden con ningún código ni nombre del listado"""
+    return sorted({str(v) for v, r in _RESOLUCION_AGENTES['memo'].items()
+                   if r is None and str(v).strip().lower() != 'desconocido'})
+
+
+def emparejar_agentes(nombres, claves):
+    """
+    Para cada nombre o código de `nombres`, la clave de `claves` (p. ej. las del
+    coaching) que corresponde al mismo agente según la tabla de identidades, o
+    la que coincide exacto como texto; None si no hay ninguna.
+    """
+    claves = list(claves)
+    por_id, por_texto = {}, {}
+    for clave, agente_id in zip(claves, resolver_agentes(pd.Series(claves, dtype=object))['agente_id']):
+        if pd.notna(agente_id):
+            por_id.setdefault(agente_id, clave)
+        por_texto.setdefault(str(clave).strip().lower(), clave)
+    nombres = list(nombres)
+    ids = resolver_agentes(pd.Series(nombres, dtype=object))['agente_id']
+    return [
+        por_id.get(agente_id) if pd.notna(agente_id) and agente_id in por_id
+        else por_texto.get(str(nombre).strip().lower())
+        for nombre, agente_id in zip(nombres, ids)
+    ]
+
+
+def resolver_nombres_agentes(serie):
+    """
+    Convierte una columna de IDs de agente a nombres reales con resolver_agentes.
+    Los IDs sin coincidencia se conservan tal cual; los nulos pasan a "Desconocido".
+    """
+    if serie.dropna().empty:
+        return pd.Series("Desconocido", index=serie.index, dtype=object)
+    resultado = resolver_agentes(serie)['nombre'].fillna(serie.astype(object).map(str, na_action='ignore'))
+    resultado = resultado.astype(object).fillna("Desconocido")
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        resultado = resultado.astype('category')
+    return resultado
+
+
+# Memo nombre -> equipo; se descarta cuando cambia la versión del listado
+_EQUIPOS_POR_NOMBRE = {'firma': None, 'exactos': {}, 'memo': {}}
+
+
+def _memo_equipos():
+    """Devuelve (exactos, memo) vigentes para la versión actual del listado"""
+    indice = obtener_indice_vendedores()
+    if _EQUIPOS_POR_NOMBRE['firma'] != _INDICE_VENDEDORES['firma'] or not _EQUIPOS_POR_NOMBRE['exactos']:
+        exactos = {}
+        for nombre, equipo in indice.values():
+            if equipo != "Sin Equipo":
+                exactos.setdefault(nombre.lower().strip(), equipo)
+        _EQUIPOS_POR_NOMBRE.update(firma=_INDICE_VENDEDORES['firma'], exactos=exactos, memo={})
+    return _EQUIPOS_POR_NOMBRE['exactos'], _EQUIPOS_POR_NOMBRE['memo']
+
+
+def obtener_equipo_por_nombre(nombre):
+    """
+    Obtiene el equipo del vendedor por su nombre: coincidencia exacta y, si no
+    hay, la primera coincidencia parcial del listado. El resultado se memoiza
+    por nombre distinto, así la búsqueda parcial corre una sola vez por nombre.
+    """
+    if nombre is None or pd.isna(nombre):
+        return "Sin Equipo"
+    exactos, memo = _memo_equipos()
+    nombre_lower = str(nombre).lower().strip()
+    if nombre_lower in memo:
+        return memo[nombre_lower]
+    equipo = exactos.get(nombre_lower)
+    if equipo is None:
+        equipo = next((eq for nom, eq in exactos.items() if nombre_lower in nom or nom in nombre_lower), "Sin Equipo")
+    memo[nombre_lower] = equipo
+    return equipo
+
+
+def resolver_equipos(serie):
+    """
+    Devuelve la columna categórica 'equipo' para una columna de nombres (o
+    códigos) de vendedor: la tabla de identidades y, si no asigna equipo, la
+    búsqueda por nombre de obtener_equipo_por_nombre
+    """
+    equipos = resolver_agentes(serie)['equipo']
+    pendientes = serie[equipos.isna() | (equipos == "Sin Equipo")].dropna().unique()
+    mapeo = {n: obtener_equipo_por_nombre(n) for n in pendientes}
+    equipos = equipos.where(~serie.isin(list(mapeo)), serie.map(mapeo))
+    return equipos.astype(object).fillna("Sin Equipo").astype('category')
+
+
 def obtener_nombre_vendedor_global(agente_id):
     """Convierte ID de agente a nombre real usando el listado global"""
-    listado, _ = cargar_listado_vendedores()
-    if pd.isna(agente_id) or agente_id is None:
+    if agente_id is None or pd.isna(agente_id):
         return "Desconocido"
-    agente_normalizado = str(agente_id).lower().replace(' ', '').replace('_', '').replace('\t', '')
-    return listado.get(agente_normalizado, str(agente_id))
+    return resolver_nombres_agentes(pd.Series([agente_id], dtype=object)).iloc[0]
 
 def aplicar_mapeo_nombres_df(df, columna='agente'):
     """Aplica el mapeo de nombres a una columna de un DataFrame"""
     if columna in df.columns:
-        df[columna] = df[columna].apply(obtener_nombre_vendedor_global)
+        df[columna] = resolver_nombres_agentes(df[columna])
     return df
 
 # Alias para compatibilidad con código existente
 obtener_nombre_agente = obtener_nombre_vendedor_global
 
 
+# Sello YYMMDDhhmmss (seguido de milisegundos) del ID de interacción:
+# amza10_1_260309110119975_ACD_07065 -> 2026-03-09 11:01:19
+PATRON_FECHA_ARCHIVO = re.compile(r'(?<!\d)(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})\d*')
+
+
+def extraer_fechas_de_archivos(serie):
+    """
+    Extrae en bloque la fecha y hora de la llamada del nombre de archivo o ID de
+    interacción. Retorna una serie datetime64 (NaT si no hay sello válido).
+    """
+    partes = serie.astype(str).str.extract(PATRON_FECHA_ARCHIVO)
+    texto = '20' + partes[0] + '-' + partes[1] + '-' + partes[2] + ' ' + partes[3] + ':' + partes[4] + ':' + partes[5]
+    return pd.to_datetime(texto, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+
+
 def extraer_fecha_de_archivo(nombre_archivo):
     """
     Extrae la fecha de la llamada del nombre del archivo.
-    El patrón es: YYMMDD en posiciones como 260112 (2026-01-12)
+    El patrón es: YYMMDDhhmmss al inicio del ID de interacción
     Ejemplo: amza10_1_260112105813064_ACD_11829_transcripcion.json -> 2026-01-12
     """
-    import re
     if pd.isna(nombre_archivo) or not isinstance(nombre_archivo, str):
         return None
-    
-    # Buscar patrón de 6 dígitos que comience con 26 (2026)
-    match = re.search(r'26(01\d{2})\d+', nombre_archivo)
+    match = PATRON_FECHA_ARCHIVO.search(nombre_archivo)
     if match:
-        # Extraer MMDD del match
-        fecha_str = match.group(0)[:6]  # Primeros 6 dígitos: YYMMDD
         try:
-            year = 2000 + int(fecha_str[:2])  # 26 -> 2026
-            month = int(fecha_str[2:4])
-            day = int(fecha_str[4:6])
-            return datetime(year, month, day).date()
-        except:
+            year, month, day = (int(g) for g in match.groups()[:3])
+            return datetime(2000 + year, month, day).date()
+        except ValueError:
             return None
     return None
 
 
+def agregar_columnas_fecha(df, columna='archivo'):
+    """
+    Agrega las columnas de fecha derivadas del nombre de archivo: fecha_hora_llamada
+    (timestamp completo), fecha_llamada (día), hora_llamada, semana y dia_semana.
+    """
+    if columna in df.columns:
+        fecha_hora = extraer_fechas_de_archivos(df[columna])
+        df['fecha_hora_llamada'] = fecha_hora
+        # Día sin hora: el filtro de fechas del sidebar compara contra días completos
+        df['fecha_llamada'] = fecha_hora.dt.normalize()
+        df['hora_llamada'] = fecha_hora.dt.hour.astype('Int8')
+        df['semana'] = fecha_hora.dt.isocalendar().week.astype('UInt8')
+        df['dia_semana'] = fecha_hora.dt.day_name().astype('category')
+    return df
+
+
 def obtener_rango_fechas_disponibles(df, columna_fecha='fecha_llamada'):
     """Obtiene el rango de fechas disponibles en el DataFrame"""
     if columna_fecha not in df.columns:
@@ -2018,298 +2383,1351 @@ def obtener_semanas_disponibles(df, columna_fecha='fecha_llamada'):
     return semanas
 
 
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def cargar_datos():
-    """Carga todos los datos necesarios para el dashboard"""
-    datos = {}
-    
-    # Cargar evaluaciones primero para saber qué archivos cargar
-    ruta_eval = os.path.join(BASE_DIR, 'reportes/evaluaciones_gemini.csv')
-    archivos_evaluados = set()
-    if os.path.exists(ruta_eval):
-        df_eval = pd.read_csv(ruta_eval)
-        archivos_evaluados = set(df_eval['archivo'].tolist())
-    
-    # Cargar transcripciones mejoradas (solo las que tienen evaluación)
-    carpeta = os.path.join(BASE_DIR, "transcripts/mejorados_gemini")
-    if os.path.exists(carpeta):
-        transcripciones = []
-        for archivo in os.listdir(carpeta):
-            if archivo.endswith('.json') and archivo in archivos_evaluados:
-                with open(os.path.join(carpeta, archivo), 'r', encoding='utf-8') as f:
-                    transcripciones.append(json.load(f))
-        datos['transcripciones'] = transcripciones
-    
-    # Cargar resumen de cierres
-    ruta_cierres = os.path.join(BASE_DIR, 'reportes/cierres_comerciales/resumen_cierres.json')
-    if os.path.exists(ruta_cierres):
-        with open(ruta_cierres, 'r', encoding='utf-8') as f:
-            datos['cierres'] = json.load(f)
-    
-    # Cargar CSV de cierres
-    ruta = os.path.join(BASE_DIR, 'reportes/cierres_comerciales/cierres_comerciales.csv')
-    if os.path.exists(ruta):
-        datos['cierres_df'] = pd.read_csv(ruta, sep=';')
-    
-    # Cargar resumen de planes
-    ruta = os.path.join(BASE_DIR, 'reportes/planes/resumen_planes.json')
-    if os.path.exists(ruta):
-        with open(ruta, 'r', encoding='utf-8') as f:
-            datos['planes'] = json.load(f)
-    
-    # Cargar CSV de planes detallado
-    ruta = os.path.join(BASE_DIR, 'reportes/planes/analisis_planes_detallado.csv')
-    if os.path.exists(ruta):
-        datos['planes_df'] = pd.read_csv(ruta)
-    
-    # Cargar resumen de quejas
-    ruta = os.path.join(BASE_DIR, 'reportes/quejas/resumen_quejas.json')
-    if os.path.exists(ruta):
-        with open(ruta, 'r', encoding='utf-8') as f:
-            datos['quejas'] = json.load(f)
-    
-    # Cargar CSV de quejas
-    ruta = os.path.join(BASE_DIR, 'reportes/quejas/quejas_no_resueltas.csv')
-    if os.path.exists(ruta):
-        datos['quejas_df'] = pd.read_csv(ruta)
-    
-    # Cargar análisis integral
-    ruta = os.path.join(BASE_DIR, 'reportes/analisis_integral/resumen_integral.json')
-    if os.path.exists(ruta):
-        with open(ruta, 'r', encoding='utf-8') as f:
-            datos['integral'] = json.load(f)
-    
-    # Cargar CSV integral
-    ruta = os.path.join(BASE_DIR, 'reportes/analisis_integral/analisis_integral.csv')
-    if os.path.exists(ruta):
-        datos['integral_df'] = pd.read_csv(ruta)
-    
-    # Cargar métricas por agente integral
-    ruta = os.path.join(BASE_DIR, 'reportes/analisis_integral/metricas_por_agente.csv')
-    if os.path.exists(ruta):
-        datos['metricas_agentes_df'] = pd.read_csv(ruta)
-    
-    # Cargar clasificación completa
-    ruta = os.path.join(BASE_DIR, 'reportes/clasificacion_completa/resumen_clasificacion.json')
-    if os.path.exists(ruta):
-        with open(ruta, 'r', encoding='utf-8') as f:
-            datos['clasificacion'] = json.load(f)
-    
-    # Cargar CSV clasificación completa
-    ruta = os.path.join(BASE_DIR, 'reportes/clasificacion_completa/clasificacion_completa.csv')
-    if os.path.exists(ruta):
-        datos['clasificacion_df'] = pd.read_csv(ruta)
-    
-    # Cargar clasificación por agente
-    ruta = os.path.join(BASE_DIR, 'reportes/clasificacion_completa/clasificacion_por_agente.csv')
-    if os.path.exists(ruta):
-        datos['clasificacion_agentes_df'] = pd.read_csv(ruta)
-    
-    # Cargar evaluaciones Gemini
-    ruta = os.path.join(BASE_DIR, 'reportes/evaluaciones_gemini.csv')
-    if os.path.exists(ruta):
-        datos['evaluaciones_gemini_df'] = pd.read_csv(ruta)
-    
-    # Cargar coaching de vendedores
-    # Cargar coaching de vendedores
-    ruta = os.path.join(BASE_DIR, 'reportes/coaching_vendedores/coaching_completo.json')
-    if os.path.exists(ruta):
-        with open(ruta, 'r', encoding='utf-8') as f:
-            coaching_list = json.load(f)
-            # Convertir lista a diccionario por agente (aplicando mapeo de nombres)
-            datos['coaching'] = {}
-            for item in coaching_list:
-                comparativa = item.get('comparativa', {}) or {}
-                if 'puntaje_ia' not in comparativa and 'puntaje_modelo' in comparativa:
-                    comparativa['puntaje_ia'] = comparativa['puntaje_modelo']
-                if 'puntaje_ia' not in comparativa:
-                    puntaje_prom = item.get('metricas', {}).get('evaluaciones', {}).get('puntaje_promedio', 0)
-                    comparativa['puntaje_ia'] = {
-                        'agente': puntaje_prom,
-                        'general': 0,
-                        'diferencia': 0,
-                        'percentil': 0
-                    }
-                item['comparativa'] = comparativa
-                nombre_real = obtener_nombre_vendedor_global(item['agente'])
-                item['agente'] = nombre_real
-                datos['coaching'][nombre_real] = item
-    
-    # Cargar listado de vendedores y equipos
-    listado, equipos = cargar_listado_vendedores()
-    datos['listado_vendedores'] = listado
-    datos['equipos_vendedores'] = equipos
-    
-    # Aplicar mapeo de nombres a todos los DataFrames con columna 'agente'
-    dataframes_con_agente = ['integral_df', 'metricas_agentes_df', 'clasificacion_df', 
-                             'clasificacion_agentes_df', 'evaluaciones_gemini_df', 
-                             'cierres_df', 'quejas_df']
-    for df_name in dataframes_con_agente:
-        if df_name in datos and datos[df_name] is not None:
-            datos[df_name] = aplicar_mapeo_nombres_df(datos[df_name], 'agente')
-    
-    # =========================================================================
-    # AGREGAR COLUMNA DE FECHA A LOS DATAFRAMES QUE TIENEN NOMBRE DE ARCHIVO
-    # =========================================================================
-    dataframes_con_archivo = ['evaluaciones_gemini_df', 'clasificacion_df', 'integral_df']
-    for df_name in dataframes_con_archivo:
-        if df_name in datos and datos[df_name] is not None:
-            df = datos[df_name]
-            if 'archivo' in df.columns:
-                # Extraer fecha del nombre del archivo
-                df['fecha_llamada'] = df['archivo'].apply(extraer_fecha_de_archivo)
-                # Convertir a datetime para facilitar filtrado
-                df['fecha_llamada'] = pd.to_datetime(df['fecha_llamada'], errors='coerce')
-                # Crear columna de semana para agrupaciones
-                df['semana'] = df['fecha_llamada'].dt.isocalendar().week
-                df['dia_semana'] = df['fecha_llamada'].dt.day_name()
-                datos[df_name] = df
-    
-    return datos
+# =============================================================================
+# SNAPSHOT COLUMNAR DE EVALUACIONES
+# =============================================================================
+# El CSV de evaluaciones se compila a Parquet con las columnas derivadas
+# (fecha, semana, nombre real, equipo) ya calculadas y con tipos compactos.
+# El snapshot se reconstruye solo si cambia el CSV o el listado de vendedores.
+CACHE_DIR = os.path.join(BASE_DIR, '.cache_eva')
+RUTA_EVALUACIONES = os.path.join(BASE_DIR, 'reportes/evaluaciones_gemini.csv')
+RUTA_LISTADO_VENDEDORES = os.path.join(BASE_DIR, 'LISTADO-DE-VENDEDORES.csv')
+SNAPSHOT_EVALUACIONES_VERSION = 5
 
 
-def crear_df_llamadas(transcripciones):
-    """Crea un DataFrame con la información de las llamadas"""
-    filas = []
-    for t in transcripciones:
-        info = t.get('info_llamada', {})
-        calidad = t.get('analisis_calidad', {})
-        productos = t.get('productos_ofrecidos', {})
-        
-        # Obtener nombre del agente y aplicar mapeo
-        agente_raw = info.get('agente', {}).get('nombre', 'desconocido')
-        agente_nombre = obtener_nombre_vendedor_global(agente_raw)
-        
-        fila = {
-            'id': info.get('id_interaccion', ''),
-            'fecha': info.get('fecha_llamada', ''),
-            'agente': agente_nombre,
-            'duracion': info.get('tiempos', {}).get('talking_time', 0),
-            'tipificacion': info.get('resultado', {}).get('tipificacion', ''),
-            'tipo': info.get('resultado', {}).get('tipos_tipificacion', ''),
-            'score_calidad': calidad.get('score_calidad', 0),
-            'tiene_saludo': calidad.get('tiene_saludo_correcto', False),
-            'tiene_cierre': calidad.get('tiene_cierre_correcto', False),
-            'planes': ', '.join(productos.get('planes_ofrecidos', [])),
-            'primer_plan': productos.get('primer_plan', ''),
-        }
-        filas.append(fila)
-    
-    df = pd.DataFrame(filas)
-    if 'fecha' in df.columns and len(df) > 0:
-        df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
-        df['dia'] = df['fecha'].dt.date
-        df['hora'] = df['fecha'].dt.hour
-    return df
+def firma_archivo(ruta):
+    """Firma barata de un archivo (mtime en ns y tamaño) para detectar cambios"""
+    try:
+        stat = os.stat(ruta)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
 
 
-def crear_df_llamadas_desde_evaluaciones(df_eval):
-    """Crea un DataFrame de llamadas usando solo evaluaciones."""
-    if df_eval is None or df_eval.empty:
-        return pd.DataFrame()
+def hash_archivo(ruta, bloque=1 << 20):
+    """Hash SHA-1 del contenido de un archivo, leído por bloques"""
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for chunk in iter(lambda: f.read(bloque), b''):
+            h.update(chunk)
+    return h.hexdigest()
 
-    base = df_eval.copy()
-    idx = base.index
 
-    if 'fecha_evaluacion' in base.columns:
-        fecha_eval = pd.to_datetime(base['fecha_evaluacion'], errors='coerce')
-    else:
-        fecha_eval = pd.Series([pd.NaT] * len(base), index=idx)
+def compilar_evaluaciones(ruta_csv=RUTA_EVALUACIONES):
+    """
+    Lee el CSV de evaluaciones y agrega las columnas derivadas con tipos compactos:
+    fecha_hora_llamada, fecha_llamada, hora_llamada, semana, dia_semana, agente
+    (nombre real) y equipo como categorías, y los diez criterios como int8.
+    """
+    df = pd.read_csv(ruta_csv)
 
-    if 'archivo' in base.columns:
-        fecha_archivo = pd.to_datetime(base['archivo'].apply(extraer_fecha_de_archivo), errors='coerce')
-    else:
-        fecha_archivo = pd.Series([pd.NaT] * len(base), index=idx)
+    agregar_columnas_fecha(df)
 
-    fecha_final = fecha_eval.fillna(fecha_archivo)
+    if 'agente' in df.columns:
+        df['agente'] = resolver_nombres_agentes(df['agente'])
+        df['equipo'] = resolver_equipos(df['agente'])
+        df['agente'] = df['agente'].astype('category')
+
+    for c in CRITERIOS_NOMBRES:
+        if c in df.columns:
+            valores = pd.to_numeric(df[c], errors='coerce')
+            if valores.notna().all() and valores.between(-128, 127).all() and (valores % 1 == 0).all():
+                df[c] = valores.astype('int8')
+    if 'puntaje_total' in df.columns:
+        df['puntaje_total'] = pd.to_numeric(df['puntaje_total'], errors='coerce').astype('float32')
 
-    if 'archivo' in base.columns:
-        ids = base['archivo']
-    else:
-        ids = base.index.astype(str)
+    return df
 
-    if 'agente' in base.columns:
-        agentes = base['agente']
-    else:
-        agentes = pd.Series(['Desconocido'] * len(base), index=idx)
 
-    if 'puntaje_total' in base.columns:
-        score_calidad = pd.to_numeric(base['puntaje_total'], errors='coerce').fillna(0)
-    else:
-        score_calidad = pd.Series([0] * len(base), index=idx)
+def cargar_evaluaciones_snapshot(ruta_csv=RUTA_EVALUACIONES):
+    """
+    Devuelve las evaluaciones desde el snapshot Parquet en CACHE_DIR.
+    Si la firma del CSV o del listado cambió, se compara el hash del contenido y,
+    solo si difiere, se recompila el snapshot. Si el snapshot no puede leerse o
+    escribirse (disco de solo lectura, pyarrow ausente) se compila en memoria.
+    """
+    if not os.path.exists(ruta_csv):
+        return None
 
-    if 'saludo_presentacion' in base.columns:
-        tiene_saludo = pd.to_numeric(base['saludo_presentacion'], errors='coerce').fillna(0) > 0
-    else:
-        tiene_saludo = pd.Series([False] * len(base), index=idx)
+    nombre = os.path.splitext(os.path.basename(ruta_csv))[0]
+    ruta_parquet = os.path.join(CACHE_DIR, f'{nombre}.parquet')
+    ruta_meta = os.path.join(CACHE_DIR, f'{nombre}.meta.json')
 
-    if 'cierre' in base.columns:
-        tiene_cierre = pd.to_numeric(base['cierre'], errors='coerce').fillna(0) > 0
-    else:
-        tiene_cierre = pd.Series([False] * len(base), index=idx)
+    firma = {
+        'version': SNAPSHOT_EVALUACIONES_VERSION,
+        'csv': firma_archivo(ruta_csv),
+        'listado': firma_archivo(RUTA_LISTADO_VENDEDORES),
+    }
 
-    if 'planes_mencionados' in base.columns:
-        planes = base['planes_mencionados'].fillna('')
-    else:
-        planes = pd.Series([''] * len(base), index=idx)
+    meta = None
+    if os.path.exists(ruta_meta) and os.path.exists(ruta_parquet):
+        try:
+            with open(ruta_meta, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except Exception:
+            meta = None
 
-    if 'primer_plan_ofrecido' in base.columns:
-        primer_plan = base['primer_plan_ofrecido'].fillna('')
-    else:
-        primer_plan = pd.Series([''] * len(base), index=idx)
+    if meta is not None and meta.get('version') == firma['version']:
+        vigente = {k: meta.get(k) for k in firma} == firma
+        if not vigente:
+            # Cambió la firma (p. ej. el archivo fue copiado de nuevo): verificar contenido
+            try:
+                hashes = {
+                    'csv_hash': hash_archivo(ruta_csv),
+                    'listado_hash': hash_archivo(RUTA_LISTADO_VENDEDORES) if firma['listado'] else None,
+                }
+            except OSError:
+                hashes = {}
+            vigente = bool(hashes) and all(meta.get(k) == v for k, v in hashes.items())
+            if vigente:
+                meta.update(firma)
+                try:
+                    with open(ruta_meta, 'w', encoding='utf-8') as f:
+                        json.dump(meta, f)
+                except OSError:
+                    pass
+        if vigente:
+            try:
+                return pd.read_parquet(ruta_parquet)
+            except Exception:
+                pass
 
-    df = pd.DataFrame({
-        'id': ids,
-        'fecha': fecha_final,
-        'agente': agentes,
-        'duracion': 0,
-        'tipificacion': 'Sin datos',
-        'tipo': 'Sin datos',
-        'score_calidad': score_calidad,
-        'tiene_saludo': tiene_saludo,
-        'tiene_cierre': tiene_cierre,
-        'planes': planes,
-        'primer_plan': primer_plan,
-    })
+    df = compilar_evaluaciones(ruta_csv)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(ruta_parquet, index=False)
+        meta = dict(firma)
+        meta['csv_hash'] = hash_archivo(ruta_csv)
+        meta['listado_hash'] = hash_archivo(RUTA_LISTADO_VENDEDORES) if firma['listado'] else None
+        with open(ruta_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    except Exception:
+        pass
+    return df
 
-    df['agente'] = df['agente'].apply(obtener_nombre_vendedor_global)
-    df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
-    if 'fecha' in df.columns and len(df) > 0:
-        df['dia'] = df['fecha'].dt.date
-        df['hora'] = df['fecha'].dt.hour
+
+# =============================================================================
+# CAPA DE ACCESO A DATOS - REGISTRO DE FUENTES
+# =============================================================================
+# Cada fuente declara su ruta, el parser y un post-proceso opcional. El
+# resultado queda en una caché de proceso compartida por todas las sesiones
+# y solo se vuelve a leer la fuente cuyos archivos (o dependencias) cambiaron.
+# Los valores cacheados se comparten entre sesiones: tratarlos como solo lectura.
+
+def leer_json(ruta):
+    """Lee un archivo JSON en UTF-8"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def leer_csv_punto_y_coma(ruta):
+    """Lee un CSV separado por punto y coma"""
+    return pd.read_csv(ruta, sep=';')
+
+
+def mapear_agentes_y_fechas_df(df):
+    """Post-proceso para reportes por llamada: nombres reales y columnas de fecha"""
+    return agregar_columnas_fecha(aplicar_mapeo_nombres_df(df, 'agente'))
+
+
+# Campos de cada transcripción que usa crear_df_llamadas (el resto del JSON no se guarda)
+CAMPOS_TRANSCRIPCION = ['id', 'fecha', 'agente', 'duracion', 'tipificacion', 'tipo',
+                        'score_calidad', 'tiene_saludo', 'tiene_cierre', 'planes', 'primer_plan']
+
+
+def extraer_campos_transcripcion(ruta):
+    """Lee un JSON de transcripción y devuelve solo los campos de CAMPOS_TRANSCRIPCION"""
+    t = leer_json(ruta)
+    info = t.get('info_llamada', {})
+    calidad = t.get('analisis_calidad', {})
+    productos = t.get('productos_ofrecidos', {})
+    return {
+        'id': info.get('id_interaccion', ''),
+        'fecha': info.get('fecha_llamada', ''),
+        'agente': info.get('agente', {}).get('nombre', 'desconocido'),
+        'duracion': info.get('tiempos', {}).get('talking_time', 0),
+        'tipificacion': info.get('resultado', {}).get('tipificacion', ''),
+        'tipo': info.get('resultado', {}).get('tipos_tipificacion', ''),
+        'score_calidad': calidad.get('score_calidad', 0),
+        'tiene_saludo': calidad.get('tiene_saludo_correcto', False),
+        'tiene_cierre': calidad.get('tiene_cierre_correcto', False),
+        'planes': ', '.join(productos.get('planes_ofrecidos', [])),
+        'primer_plan': productos.get('primer_plan', ''),
+    }
+
+
+def tipar_campos_transcripcion(df):
+    """
+    Lleva las columnas de CAMPOS_TRANSCRIPCION a tipos uniformes para poder
+    guardarlas en Parquet: texto (las listas se unen con ', '), duración en
+    segundos (numérica o hh:mm:ss), score float y banderas bool.
+    """
+    df = df.copy()
+    for c in ['id', 'fecha', 'agente', 'tipificacion', 'tipo', 'planes', 'primer_plan']:
+        if c in df.columns:
+            df[c] = df[c].map(
+                lambda v: ', '.join(map(str, v)) if isinstance(v, (list, tuple)) else '' if v is None else str(v)
+            ).astype(object)
+    if 'duracion' in df.columns:
+        numerica = pd.to_numeric(df['duracion'], errors='coerce')
+        df['duracion'] = numerica.fillna(segundos_desde_duracion(df['duracion']).astype('float64')).astype('float64')
+    if 'score_calidad' in df.columns:
+        df['score_calidad'] = pd.to_numeric(df['score_calidad'], errors='coerce').fillna(0).astype('float64')
+    for c in ['tiene_saludo', 'tiene_cierre']:
+        if c in df.columns:
+            df[c] = df[c].fillna(False).astype(bool)
     return df
 
 
-def cargar_coaching_equipo(ruta_coaching):
-    """Carga y normaliza el coaching de un equipo desde JSON."""
-    if not os.path.exists(ruta_coaching):
-        return None
+def listar_transcripciones(carpeta):
+    """Devuelve {archivo: mtime_ns} de los JSON de la carpeta"""
+    with os.scandir(carpeta) as entradas:
+        return {e.name: e.stat().st_mtime_ns for e in entradas if e.name.endswith('.json') and e.is_file()}
+
+
+def firma_transcripciones(carpeta):
+    """Firma de la carpeta de transcripciones: cambia si se agrega, borra o modifica un JSON"""
     try:
-        with open(ruta_coaching, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception:
+        archivos = listar_transcripciones(carpeta)
+    except OSError:
         return None
+    return [len(archivos), hashlib.sha1(json.dumps(sorted(archivos.items())).encode()).hexdigest()]
 
-    comparativa = data.get('comparativa', {}) or {}
-    if 'puntaje_ia' not in comparativa and 'puntaje_modelo' in comparativa:
-        comparativa['puntaje_ia'] = comparativa['puntaje_modelo']
-    data['comparativa'] = comparativa
 
-    coaching_modelo = data.get('coaching_modelo', {}) or {}
-    coaching_ia = data.get('coaching_ia') or coaching_modelo or {}
+def indexar_transcripciones(carpeta, archivos_objetivo=None, max_workers=8):
+    """
+    Índice incremental de transcripciones: un DataFrame con archivo, mtime_ns y
+    CAMPOS_TRANSCRIPCION persistido en CACHE_DIR. Solo se parsean (en paralelo)
+    los JSON nuevos o cuyo mtime cambió; el resto se toma del índice guardado.
+    Si se pasa archivos_objetivo, solo se indexan esos archivos.
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-    if 'plan_accion_equipo' not in coaching_ia:
-        if 'plan_accion_equipo' in coaching_modelo:
-            coaching_ia['plan_accion_equipo'] = coaching_modelo.get('plan_accion_equipo', [])
+    ruta_indice = os.path.join(CACHE_DIR, 'transcripciones_index.parquet')
+    actuales = listar_transcripciones(carpeta)
+    if archivos_objetivo is not None:
+        actuales = {a: m for a, m in actuales.items() if a in archivos_objetivo}
 
-    if not coaching_ia.get('plan_accion_equipo'):
-        areas = coaching_ia.get('areas_mejora_prioritarias', []) or []
-        plan = []
-        for idx, area in enumerate(areas[:4], 1):
-            nombre_area = area.get('area', 'Area clave')
-            meta = area.get('meta', 'Mejorar el puntaje del equipo')
-            plan.append({
-                'prioridad': idx,
+    columnas = ['archivo', 'mtime_ns'] + CAMPOS_TRANSCRIPCION
+    indice = pd.DataFrame(columns=columnas)
+    if os.path.exists(ruta_indice):
+        try:
+            indice = pd.read_parquet(ruta_indice)
+        except Exception:
+            pass
+
+    vigente = [actuales.get(a) == m for a, m in zip(indice['archivo'], indice['mtime_ns'])]
+    vigentes = indice[vigente] if len(indice) else indice
+    pendientes = sorted(set(actuales) - set(vigentes['archivo']))
+
+    def _extraer(archivo):
+        try:
+            return extraer_campos_transcripcion(os.path.join(carpeta, archivo))
+        except Exception:
+            return None
+
+    if pendientes:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            resultados = list(pool.map(_extraer, pendientes))
+        nuevas = [dict(r, archivo=a, mtime_ns=actuales[a]) for a, r in zip(pendientes, resultados) if r is not None]
+        if nuevas:
+            nuevas = tipar_campos_transcripcion(pd.DataFrame(nuevas, columns=columnas))
+            vigentes = nuevas if vigentes.empty else pd.concat([vigentes, nuevas], ignore_index=True)
+
+    if pendientes or len(vigentes) != len(indice):
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            vigentes.astype({'mtime_ns': 'int64'}).to_parquet(ruta_indice, index=False)
+        except Exception:
+            logger.warning("No se pudo guardar el índice de transcripciones en %s", ruta_indice, exc_info=True)
+    return vigentes.reset_index(drop=True)
+
+
+def leer_transcripciones(carpeta):
+    """Devuelve el índice de las transcripciones mejoradas que tienen evaluación"""
+    # esperar=True: si el CSV de evaluaciones cambió, filtrar con la versión nueva
+    df_eval = cargar_fuente('evaluaciones_gemini_df', esperar=True)
+    archivos_evaluados = set(df_eval['archivo'].tolist()) if df_eval is not None else set()
+    return indexar_transcripciones(carpeta, archivos_evaluados)
+
+
+def normalizar_coaching(coaching_list):
+    """Convierte la lista de coaching a diccionario por agente (aplicando mapeo de nombres)"""
+    coaching = {}
+    for item in coaching_list:
+        comparativa = item.get('comparativa', {}) or {}
+        if 'puntaje_ia' not in comparativa and 'puntaje_modelo' in comparativa:
+            comparativa['puntaje_ia'] = comparativa['puntaje_modelo']
+        if 'puntaje_ia' not in comparativa:
+            puntaje_prom = item.get('metricas', {}).get('evaluaciones', {}).get('puntaje_promedio', 0)
+            comparativa['puntaje_ia'] = {
+                'agente': puntaje_prom,
+                'general': 0,
+                'diferencia': 0,
+                'percentil': 0
+            }
+        item['comparativa'] = comparativa
+        nombre_real = obtener_nombre_vendedor_global(item['agente'])
+        item['agente'] = nombre_real
+        coaching[nombre_real] = item
+    return coaching
+
+
+# Campos pesados del coaching por vendedor: no van en el índice, se leen del
+# archivo individual coaching_<agente>.json solo cuando se muestran
+CAMPOS_DETALLE_COACHING = ['analisis_coaching', 'evolucion']
+CARPETA_COACHING_VENDEDORES = os.path.join(BASE_DIR, 'reportes/coaching_vendedores')
+
+
+def indexar_coaching(ruta):
+    """
+    Índice liviano del coaching de vendedores: cada entrada conserva métricas,
+    comparativa y demás datos de las tarjetas, y en 'archivo' el JSON individual
+    del que se leen los campos de detalle. Si el archivo individual no existe el
+    detalle queda dentro de la entrada. El índice se guarda en CACHE_DIR para no
+    volver a leer el JSON completo mientras no cambie.
+    """
+    ruta_indice = os.path.join(CACHE_DIR, 'coaching_indice.json')
+    firma = firma_archivo(ruta)
+    try:
+        with open(ruta_indice, 'r', encoding='utf-8') as f:
+            guardado = json.load(f)
+        if guardado.get('firma') == firma:
+            return guardado['indice']
+    except Exception:
+        pass
+
+    indice = []
+    for item in leer_json(ruta):
+        archivo = f"coaching_{item.get('agente')}.json"
+        if os.path.exists(os.path.join(CARPETA_COACHING_VENDEDORES, archivo)):
+            item = {k: v for k, v in item.items() if k not in CAMPOS_DETALLE_COACHING}
+            item['archivo'] = archivo
+        else:
+            item['archivo'] = None
+        indice.append(item)
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(ruta_indice, 'w', encoding='utf-8') as f:
+            json.dump({'firma': firma, 'indice': indice}, f, ensure_ascii=False)
+    except OSError:
+        pass
+    return indice
+
+
+@lru_cache(maxsize=32)
+def _leer_detalle_coaching(ruta, firma):
+    """Campos de detalle de un JSON individual (la firma invalida la entrada si cambia el archivo)"""
+    data = leer_json(ruta)
+    return {k: data.get(k) for k in CAMPOS_DETALLE_COACHING}
+
+
+def cargar_detalle_coaching(data):
+    """
+    Completa una entrada del índice de coaching con analisis_coaching y evolucion,
+    leyendo su archivo individual bajo demanda. Retorna una copia de la entrada.
+    """
+    if not data or not data.get('archivo'):
+        return data
+    ruta = os.path.join(CARPETA_COACHING_VENDEDORES, data['archivo'])
+    firma = firma_archivo(ruta)
+    if firma is None:
+        return data
+    try:
+        detalle = _leer_detalle_coaching(ruta, tuple(firma))
+    except Exception:
+        return data
+    return {**data, **detalle}
+
+
+# Histórico semanal de ventas: un Parquet por semana ISO en
+# CARPETA_VENTAS_SEMANALES (dentro de CACHE_DIR) y un índice JSON con el rango,
+# el hash del contenido, las filas, equipos, ejecutivos y vendedores de cada
+# semana. Las semanas nuevas de datos_ventas_csv.json se suman como archivos
+# nuevos; una semana ya guardada se reescribe solo si cambió su rango o su
+# contenido (p. ej. la semana en curso, que llega parcial). Las consultas usan
+# el índice para leer solo las semanas que tocan.
+RUTA_VENTAS_JSON = os.path.join(BASE_DIR, 'datos_calidad', 'datos_ventas_csv.json')
+CARPETA_VENTAS_SEMANALES = os.path.join(CACHE_DIR, 'ventas_semanales')
+DIMENSIONES_VENTAS_SEMANALES = ['equipo', 'ejecutivo', 'vendedor']
+COLUMNAS_VENTAS_SEMANALES = ['semana_iso', 'rango'] + DIMENSIONES_VENTAS_SEMANALES + [
+    'cargadas', 'aprobadas', 'canceladas', 'pendientes', 'tasa_aprobacion', 'estado'
+]
+
+
+# Semanas de la última sincronización que no se pudieron guardar (semana -> error)
+_ERRORES_VENTAS_SEMANALES = {}
+
+
+def clave_semana_iso(anio, semana):
+    """Clave de partición de una semana ISO, p. ej. '2026-W08'"""
+    return f"{int(anio)}-W{int(semana):02d}"
+
+
+def anio_iso_semana(semana, rango, fecha_proceso):
+    """
+    Año ISO de la semana `semana` del reporte procesado en `fecha_proceso`.
+    Se toma el primer día del rango ('dd/mm - dd/mm'), ubicado en el año del
+    proceso o en el anterior si quedaría después de la fecha de proceso. Sin
+    rango legible, las semanas 52/53 procesadas en enero van al año anterior y
+    la semana 1 procesada en diciembre al siguiente.
+    """
+    coincidencia = re.match(r'\s*(\d{1,2})/(\d{1,2})', str(rango or ''))
+    if coincidencia:
+        dia, mes = (int(g) for g in coincidencia.groups())
+        try:
+            inicio = datetime(fecha_proceso.year, mes, dia)
+            if inicio > fecha_proceso.to_pydatetime():
+                inicio = inicio.replace(year=fecha_proceso.year - 1)
+            return inicio.isocalendar()[0]
+        except ValueError:
+            pass
+    if int(semana) >= 52 and fecha_proceso.month == 1:
+        return fecha_proceso.year - 1
+    if int(semana) == 1 and fecha_proceso.month == 12:
+        return fecha_proceso.year + 1
+    return fecha_proceso.year
+
+
+def leer_indice_ventas_semanales(carpeta=CARPETA_VENTAS_SEMANALES):
+    """Índice del histórico (semana_iso -> archivo, rango, filas y valores de cada dimensión)"""
+    try:
+        with open(os.path.join(carpeta, 'indice.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def agregar_semana_ventas(df_semana, semana_iso, rango='', carpeta=CARPETA_VENTAS_SEMANALES):
+    """
+    Guarda una semana (una fila por vendedor) en el histórico. Si la semana ya
+    está en el índice con el mismo rango y contenido no se toca y devuelve
+    False; si cambió, se reescribe.
+    """
+    indice = leer_indice_ventas_semanales(carpeta)
+    tabla = df_semana.assign(semana_iso=semana_iso, rango=rango).reindex(columns=COLUMNAS_VENTAS_SEMANALES)
+    tabla[DIMENSIONES_VENTAS_SEMANALES] = tabla[DIMENSIONES_VENTAS_SEMANALES].astype('string')
+    hash_contenido = format(int(pd.util.hash_pandas_object(tabla, index=False).sum()) & (2**64 - 1), '016x')
+    anterior = indice.get(semana_iso)
+    if anterior is not None and anterior.get('rango') == rango and anterior.get('hash') == hash_contenido:
+        return False
+
+    os.makedirs(carpeta, exist_ok=True)
+    archivo = f'ventas_{semana_iso}.parquet'
+    tabla.to_parquet(os.path.join(carpeta, archivo + '.tmp'), index=False)
+    os.replace(os.path.join(carpeta, archivo + '.tmp'), os.path.join(carpeta, archivo))
+
+    indice[semana_iso] = {'archivo': archivo, 'rango': rango, 'hash': hash_contenido, 'filas': len(tabla)}
+    for dimension in DIMENSIONES_VENTAS_SEMANALES:
+        indice[semana_iso][dimension] = sorted(tabla[dimension].dropna().unique().tolist())
+    ruta_indice = os.path.join(carpeta, 'indice.json')
+    with open(ruta_indice + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False)
+    os.replace(ruta_indice + '.tmp', ruta_indice)
+    return True
+
+
+def sincronizar_ventas_semanales(ruta=RUTA_VENTAS_JSON, carpeta=CARPETA_VENTAS_SEMANALES):
+    """
+    Lleva al histórico las semanas de datos_ventas_csv.json que faltan o que
+    cambiaron (el año ISO sale del rango y la fecha de proceso, ver
+    anio_iso_semana). Las semanas que no se pudieron guardar quedan en
+    _ERRORES_VENTAS_SEMANALES. Devuelve el índice resultante.
+    """
+    semanal = leer_json(ruta).get('semanal', {})
+    fecha_proceso = pd.to_datetime(semanal.get('fecha_proceso'), errors='coerce')
+    if pd.isna(fecha_proceso):
+        fecha_proceso = pd.Timestamp.now()
+    errores = {}
+    for numero, semana in semanal.get('semanas', {}).items():
+        numero_semana = semana.get('semana', numero)
+        rango = semana.get('rango', '')
+        try:
+            vendedores = pd.json_normalize(semana.get('equipos', []), record_path='vendedores')
+            anio = anio_iso_semana(numero_semana, rango, fecha_proceso)
+            agregar_semana_ventas(vendedores, clave_semana_iso(anio, numero_semana), rango, carpeta)
+        except Exception as e:
+            errores[str(numero_semana)] = str(e)
+    _ERRORES_VENTAS_SEMANALES.clear()
+    _ERRORES_VENTAS_SEMANALES.update(errores)
+    return leer_indice_ventas_semanales(carpeta)
+
+
+def consultar_ventas_semanales(semanas=None, equipos=None, ejecutivos=None, vendedores=None,
+                               carpeta=CARPETA_VENTAS_SEMANALES):
+    """
+    Filas del histórico para las semanas pedidas (todas si es None) y los
+    equipos / ejecutivos / vendedores indicados, leídas en una sola pasada.
+    """
+    filtros = dict(zip(DIMENSIONES_VENTAS_SEMANALES, [equipos, ejecutivos, vendedores]))
+    archivos = [
+        os.path.join(carpeta, entrada['archivo'])
+        for semana, entrada in sorted(leer_indice_ventas_semanales(carpeta).items())
+        if (semanas is None or semana in semanas)
+        and all(valores is None or set(valores) & set(entrada.get(dimension, []))
+                for dimension, valores in filtros.items())
+    ]
+    if not archivos:
+        return pd.DataFrame(columns=COLUMNAS_VENTAS_SEMANALES)
+    filtros_parquet = [(d, 'in', list(v)) for d, v in filtros.items() if v is not None]
+    return pd.read_parquet(archivos, filters=filtros_parquet or None)
+
+
+def tendencia_ventas_semanales(por=None, **filtros):
+    """
+    Evolución semana a semana (cargadas, aprobadas y tasa de aprobación),
+    total o abierta por 'equipo', 'ejecutivo' o 'vendedor'.
+    """
+    df = consultar_ventas_semanales(**filtros)
+    claves = ['semana_iso'] + ([por] if por else [])
+    tendencia = df.groupby(claves, sort=True).agg(
+        rango=('rango', 'first'),
+        cargadas=('cargadas', 'sum'),
+        aprobadas=('aprobadas', 'sum'),
+    ).reset_index()
+    tendencia['tasa_aprobacion'] = (
+        tendencia['aprobadas'] / tendencia['cargadas'].where(tendencia['cargadas'] > 0) * 100
+    ).round(1).fillna(0)
+    return tendencia
+
+
+RUTA_PLANES_DETALLE = 'reportes/planes/analisis_planes_detallado.csv'
+RUTA_QUEJAS_NO_RESUELTAS = 'reportes/quejas/quejas_no_resueltas.csv'
+
+
+# Clave estable de una llamada: el nombre de archivo hasta el ID de interacción,
+# común a los tres reportes (amza10_1_260309110119975_ACD_07065). El ID solo no
+# alcanza: la misma interacción puede aparecer bajo dos agentes.
+PATRON_CLAVE_LLAMADA = re.compile(r'^(.*?(?<!\d)\d{12,}_[A-Z]+_\d+)')
+
+
+def _por_llamada(df):
+    """Indexa un reporte por llamada por su clave estable (una fila por clave)"""
+    if df is None or 'archivo' not in df.columns:
+        return pd.DataFrame()
+    claves = df['archivo'].astype(str).str.extract(PATRON_CLAVE_LLAMADA, expand=False)
+    validas = claves.notna() & ~claves.duplicated()
+    return df[validas.to_numpy()].set_axis(claves[validas].to_numpy(), axis=0)
+
+
+def _codigos_por_valor(valores, primero=False):
+    """Códigos canónicos de plan ('4gb, 8gb' o el primero), una vez por valor distinto"""
+    codigos = {v: codigos_planes(v) for v in pd.unique(valores.dropna())}
+    mapeo = {v: (c[0] if c else '') if primero else ', '.join(c) for v, c in codigos.items()}
+    return valores.map(mapeo)
+
+
+def construir_hechos_llamadas(ruta=RUTA_EVALUACIONES):
+    """
+    Tabla de hechos por llamada: une evaluaciones, planes y quejas por la clave
+    estable de la llamada (columna clave, ver PATRON_CLAVE_LLAMADA) con agente y
+    equipo ya resueltos, fecha/hora, puntajes, criterios, planes canónicos,
+    fibra, duración y quejas, en tipos compactos. Se rearma solo cuando cambia
+    alguno de los archivos de origen (ver 'depende' en FUENTES_DATOS).
+    """
+    evaluaciones = _por_llamada(cargar_fuente('evaluaciones_gemini_df', esperar=True))
+    planes = _por_llamada(cargar_fuente('planes_df', esperar=True))
+    quejas = _por_llamada(cargar_fuente('quejas_df', esperar=True))
+    claves = evaluaciones.index.union(planes.index).union(quejas.index)
+    evaluaciones, planes, quejas = (t.reindex(claves) for t in (evaluaciones, planes, quejas))
+
+    def _columna(tabla, nombre):
+        return tabla[nombre] if nombre in tabla.columns else pd.Series(np.nan, index=claves, dtype=object)
+
+    hechos = pd.DataFrame({'clave': claves}, index=claves)
+    hechos['id_interaccion'] = extraer_ids_interaccion(hechos['clave'])
+    hechos['archivo'] = _columna(evaluaciones, 'archivo').combine_first(_columna(planes, 'archivo')).combine_first(
+        _columna(quejas, 'archivo'))
+    hechos['evaluada'] = _columna(evaluaciones, 'archivo').notna()
+    # Agente: código crudo de planes o nombre ya resuelto de evaluaciones y quejas
+    agentes = _columna(evaluaciones, 'agente').astype(object).combine_first(_columna(quejas, 'agente')).combine_first(
+        _columna(planes, 'agente'))
+    hechos['agente'] = resolver_nombres_agentes(agentes)
+    hechos['equipo'] = resolver_equipos(hechos['agente'])
+    hechos['agente'] = hechos['agente'].astype('category')
+
+    agregar_columnas_fecha(hechos, 'id_interaccion')
+    hechos['fecha_evaluacion'] = pd.to_datetime(_columna(evaluaciones, 'fecha_evaluacion'), errors='coerce')
+
+    hechos['puntaje_total'] = pd.to_numeric(_columna(evaluaciones, 'puntaje_total'), errors='coerce').astype('float32')
+    for c in CRITERIOS_NOMBRES:
+        hechos[c] = pd.to_numeric(_columna(evaluaciones, c), errors='coerce').round().astype('Int8')
+
+    # Planes y fibra: los de la evaluación; el reporte de planes solo para llamadas sin evaluar
+    evaluada = hechos['evaluada']
+    hechos['planes'] = _codigos_por_valor(_columna(evaluaciones, 'planes_mencionados')).where(
+        evaluada, _codigos_por_valor(_columna(planes, 'planes_ofrecidos'))).fillna('').astype('category')
+    hechos['primer_plan'] = _codigos_por_valor(_columna(evaluaciones, 'primer_plan_ofrecido'), primero=True).where(
+        evaluada, _codigos_por_valor(_columna(planes, 'primer_plan'), primero=True)).fillna('').astype('category')
+    hechos['cantidad_planes'] = hechos['planes'].astype(str).str.count(r'[^,\s][^,]*').astype('uint8')
+    hechos['ofrece_fibra'] = _columna(evaluaciones, 'se_ofrecio_fibra').where(
+        evaluada, _columna(planes, 'ofrece_fibra')).fillna(False).astype(bool)
+
+    hechos['duracion_seg'] = pd.to_numeric(_columna(planes, 'duracion_seg'), errors='coerce').combine_first(
+        pd.to_numeric(_columna(quejas, 'duracion_seg'), errors='coerce')).astype('float32')
+    for c in ['cantidad_quejas', 'quejas_no_resueltas']:
+        hechos[c] = pd.to_numeric(_columna(quejas, c), errors='coerce').fillna(0).clip(0, 255).astype('uint8')
+
+    return hechos.sort_values(['fecha_hora_llamada', 'clave'], na_position='last').reset_index(drop=True)
+
+
+# clave en `datos` -> ruta (relativa a BASE_DIR o absoluta), parser, post-proceso,
+# archivos de los que depende y, opcionalmente, una función de firma propia para la ruta
+FUENTES_DATOS = {
+    'evaluaciones_gemini_df': {
+        'ruta': RUTA_EVALUACIONES,
+        'parser': cargar_evaluaciones_snapshot,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+        'interaccion': 'archivo',
+    },
+    'transcripciones': {
+        'ruta': 'transcripts/mejorados_gemini',
+        'parser': leer_transcripciones,
+        'firma': firma_transcripciones,
+        'depende': [RUTA_EVALUACIONES],
+    },
+    'cierres': {'ruta': 'reportes/cierres_comerciales/resumen_cierres.json', 'parser': leer_json},
+    'cierres_df': {
+        'ruta': 'reportes/cierres_comerciales/cierres_comerciales.csv',
+        'parser': leer_csv_punto_y_coma,
+        'post': aplicar_mapeo_nombres_df,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+    },
+    'planes': {'ruta': 'reportes/planes/resumen_planes.json', 'parser': leer_json},
+    'planes_df': {
+        'ruta': RUTA_PLANES_DETALLE,
+        'parser': pd.read_csv,
+        'interaccion': 'archivo',
+    },
+    'quejas': {'ruta': 'reportes/quejas/resumen_quejas.json', 'parser': leer_json},
+    'quejas_df': {
+        'ruta': RUTA_QUEJAS_NO_RESUELTAS,
+        'parser': pd.read_csv,
+        'post': aplicar_mapeo_nombres_df,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+        'interaccion': 'id_interaccion',
+    },
+    # Hechos por llamada ya unidos (ver construir_hechos_llamadas)
+    'llamadas_df': {
+        'ruta': RUTA_EVALUACIONES,
+        'parser': construir_hechos_llamadas,
+        'depende': [RUTA_PLANES_DETALLE, RUTA_QUEJAS_NO_RESUELTAS, RUTA_LISTADO_VENDEDORES],
+        'interaccion': 'id_interaccion',
+    },
+    'integral': {'ruta': 'reportes/analisis_integral/resumen_integral.json', 'parser': leer_json},
+    'integral_df': {
+        'ruta': 'reportes/analisis_integral/analisis_integral.csv',
+        'parser': pd.read_csv,
+        'post': mapear_agentes_y_fechas_df,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+    },
+    'metricas_agentes_df': {
+        'ruta': 'reportes/analisis_integral/metricas_por_agente.csv',
+        'parser': pd.read_csv,
+        'post': aplicar_mapeo_nombres_df,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+    },
+    'clasificacion': {'ruta': 'reportes/clasificacion_completa/resumen_clasificacion.json', 'parser': leer_json},
+    'clasificacion_df': {
+        'ruta': 'reportes/clasificacion_completa/clasificacion_completa.csv',
+        'parser': pd.read_csv,
+        'post': mapear_agentes_y_fechas_df,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+    },
+    'clasificacion_agentes_df': {
+        'ruta': 'reportes/clasificacion_completa/clasificacion_por_agente.csv',
+        'parser': pd.read_csv,
+        'post': aplicar_mapeo_nombres_df,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+    },
+    'coaching': {
+        'ruta': 'reportes/coaching_vendedores/coaching_completo.json',
+        'parser': indexar_coaching,
+        'post': normalizar_coaching,
+        'depende': [RUTA_LISTADO_VENDEDORES],
+    },
+    'calidad_procesados': {'ruta': 'datos_calidad/datos_calidad_procesados.json', 'parser': leer_json},
+    'ventas_semanales': {'ruta': RUTA_VENTAS_JSON, 'parser': sincronizar_ventas_semanales},
+}
+
+# Caché de fuentes compartida por todas las sesiones del proceso. Cada entrada
+# ({'firma', 'valor'}) se reemplaza entera al terminar una relectura, de modo que
+# un lector ve siempre la versión anterior completa o la nueva completa.
+_CACHE_FUENTES = {}
+_CACHE_FUENTES_LOCK = threading.RLock()
+# Relecturas en curso (clave -> threading.Event): una sola lectura por fuente
+_RECARGAS_EN_CURSO = {}
+
+
+def firma_fuente(clave):
+    """Firma de una fuente: la de su ruta más la de cada archivo del que depende"""
+    fuente = FUENTES_DATOS[clave]
+    rutas = [os.path.join(BASE_DIR, r) for r in [fuente['ruta']] + fuente.get('depende', [])]
+    firma_ruta = fuente.get('firma', firma_archivo)
+    return (tuple(firma_ruta(rutas[0]) or ()),) + tuple(tuple(firma_archivo(r) or ()) for r in rutas[1:])
+
+
+def _releer_fuente(clave, firma, entrada):
+    """
+    Lee la fuente y publica la nueva entrada. Si el archivo no existe la quita;
+    si la lectura falla (p. ej. archivo a medio escribir) conserva el último
+    valor válido con su firma anterior, así la próxima carga vuelve a intentar.
+    Las cachés derivadas se comparan contra el valor publicado (identidad), no
+    contra la firma: mientras dura la relectura siguen atadas al valor anterior.
+    """
+    fuente = FUENTES_DATOS[clave]
+    ruta = os.path.join(BASE_DIR, fuente['ruta'])
+    if not os.path.exists(ruta):
+        _CACHE_FUENTES.pop(clave, None)
+        return
+    try:
+        valor = fuente['parser'](ruta)
+        if valor is not None and fuente.get('post') is not None:
+            valor = fuente['post'](valor)
+    except Exception:
+        _CACHE_FUENTES[clave] = {
+            'firma': entrada['firma'] if entrada is not None else None,
+            'valor': entrada['valor'] if entrada is not None else None,
+        }
+        return
+    _CACHE_FUENTES[clave] = {'firma': firma, 'valor': valor}
+
+
+def cargar_fuente(clave, esperar=False):
+    """
+    Devuelve el contenido de una fuente registrada en FUENTES_DATOS, leyéndolo
+    solo si cambió desde la última carga. Retorna None si el archivo no existe.
+    Cada fuente se lee una sola vez aunque la pidan varias sesiones a la vez.
+    Si ya hay una versión cargada y la fuente cambió, la relectura corre en
+    segundo plano y se devuelve la versión anterior hasta que termine (salvo
+    con esperar=True); la primera carga sí espera a la lectura.
+    """
+    firma = firma_fuente(clave)
+    entrada = _CACHE_FUENTES.get(clave)
+    if entrada is not None and entrada['firma'] == firma:
+        return entrada['valor']
+
+    with _CACHE_FUENTES_LOCK:
+        evento = _RECARGAS_EN_CURSO.get(clave)
+        propia = evento is None
+        if propia:
+            evento = _RECARGAS_EN_CURSO[clave] = threading.Event()
+
+    if propia:
+        def _releer():
+            try:
+                _releer_fuente(clave, firma, entrada)
+            finally:
+                with _CACHE_FUENTES_LOCK:
+                    _RECARGAS_EN_CURSO.pop(clave, None)
+                evento.set()
+
+        if entrada is None or esperar:
+            _releer()
+        else:
+            threading.Thread(target=_releer, daemon=True).start()
+
+    if entrada is not None and not esperar:
+        return entrada['valor']
+    evento.wait()
+    entrada = _CACHE_FUENTES.get(clave)
+    return entrada['valor'] if entrada is not None else None
+
+
+def refrescar_fuentes():
+    """
+    Fuerza la relectura de todas las fuentes (acción de administrador), aunque
+    sus archivos no hayan cambiado. Las demás sesiones siguen leyendo la versión
+    anterior de cada fuente hasta que la nueva la reemplaza.
+    """
+    with _CACHE_FUENTES_LOCK:
+        for clave, entrada in list(_CACHE_FUENTES.items()):
+            _CACHE_FUENTES[clave] = {'firma': None, 'valor': entrada['valor']}
+    cargar_listado_vendedores.clear()
+    _leer_detalle_coaching.cache_clear()
+    for clave in FUENTES_DATOS:
+        cargar_fuente(clave, esperar=True)
+
+
+def precargar_fuentes():
+    """
+    Calienta la caché de fuentes en un thread de fondo (se llama al iniciar
+    sesión). Si otra sesión ya está leyendo una fuente, la pre-carga no la
+    vuelve a leer.
+    """
+    def _precargar():
+        for clave in FUENTES_DATOS:
+            cargar_fuente(clave)
+
+    threading.Thread(target=_precargar, daemon=True).start()
+
+
+# Vistas por alcance de cada fuente tabular con columna 'agente': índice de
+# posiciones por agente (nombre real) y por equipo, y las vistas ya recortadas
+_VISTAS_FUENTES = {}
+
+
+def indexar_por_alcance(df):
+    """Posiciones de fila agrupadas por nombre real del agente y por equipo"""
+    nombres = resolver_nombres_agentes(df['agente']).astype(str)
+    claves = pd.DataFrame({'agente': nombres.to_numpy(), 'equipo': resolver_equipos(nombres).astype(str).to_numpy()})
+    return {
+        'por_agente': claves.groupby('agente', sort=False).indices,
+        'por_equipo': claves.groupby('equipo', sort=False).indices,
+    }
+
+
+def obtener_vista_fuente(clave, alcance=('todos',), valor=None):
+    """
+    Devuelve la fuente recortada al alcance de la sesión (ver clave_alcance).
+    El recorte se arma uniendo las posiciones del índice por agente o equipo y
+    queda cacheado hasta que cambie la fuente o el listado de vendedores.
+    `valor` es la versión de la fuente a recortar (por defecto, la vigente).
+    """
+    valor = cargar_fuente(clave) if valor is None else valor
+    if alcance[0] == 'todos' or not isinstance(valor, pd.DataFrame) or 'agente' not in valor.columns:
+        return valor
+    with _CACHE_FUENTES_LOCK:
+        firma_listado = firma_archivo(RUTA_LISTADO_VENDEDORES)
+        entrada = _VISTAS_FUENTES.get(clave)
+        if entrada is None or entrada['valor'] is not valor or entrada['listado'] != firma_listado:
+            entrada = {'valor': valor, 'listado': firma_listado, 'indice': indexar_por_alcance(valor), 'vistas': {}}
+            _VISTAS_FUENTES[clave] = entrada
+        vista = entrada['vistas'].get(alcance)
+        if vista is None:
+            indice = entrada['indice']
+            if alcance[0] == 'agente':
+                posiciones = [p for nombre, p in indice['por_agente'].items() if alcance[1] in nombre.lower()]
+            else:
+                posiciones = [indice['por_equipo'][e] for e in alcance[1] if e in indice['por_equipo']]
+            posiciones = np.sort(np.concatenate(posiciones)) if posiciones else np.array([], dtype=np.intp)
+            vista = valor.iloc[posiciones]
+            entrada['vistas'][alcance] = vista
+    return vista
+
+
+# ID canónico de interacción: el tramo <sello>_<canal>_<n> que comparten los
+# reportes por llamada, p. ej. amza10_1_260309110119975_ACD_07065_mejorado.json
+# (evaluaciones, planes) y 260309110119975_ACD_07065 (quejas). Las fuentes que
+# lo tienen declaran la columna en 'interaccion' dentro de FUENTES_DATOS.
+PATRON_ID_INTERACCION = re.compile(r'(?<!\d)(\d{12,}_[A-Z]+_\d+)')
+_INDICES_INTERACCION = {}
+
+
+def extraer_ids_interaccion(serie):
+    """ID canónico de interacción de cada valor de la serie (NaN si no tiene)"""
+    return serie.astype(str).str.extract(PATRON_ID_INTERACCION, expand=False)
+
+
+def indice_interacciones(clave):
+    """
+    Diccionario ID de interacción -> etiquetas de las filas de la fuente `clave`
+    (una llamada puede estar partida en varios archivos). Se rearma solo cuando
+    la fuente se vuelve a leer.
+    """
+    valor = cargar_fuente(clave)
+    with _CACHE_FUENTES_LOCK:
+        entrada = _INDICES_INTERACCION.get(clave)
+        if entrada is None or entrada['valor'] is not valor:
+            columna = FUENTES_DATOS[clave]['interaccion']
+            indice = {}
+            if isinstance(valor, pd.DataFrame) and columna in valor.columns:
+                ids = extraer_ids_interaccion(valor[columna]).dropna()
+                indice = {i: ids.index[pos] for i, pos in ids.groupby(ids, sort=False).indices.items()}
+            entrada = {'valor': valor, 'indice': indice}
+            _INDICES_INTERACCION[clave] = entrada
+    return entrada['indice']
+
+
+def buscar_interaccion(clave, texto, df=None):
+    """
+    Fila de la interacción de `texto` (ID canónico, nombre de archivo o ID de
+    otro reporte) en `df`, un recorte de la fuente `clave` con sus etiquetas, o
+    en la fuente completa. Entre las partes de una misma llamada prefiere la que
+    coincide exacto con `texto`. Retorna None si no está.
+    """
+    tabla = cargar_fuente(clave) if df is None else df
+    if tabla is None or tabla.empty:
+        return None
+    columna = FUENTES_DATOS[clave]['interaccion']
+    filas = tabla.iloc[0:0]
+    coincidencia = PATRON_ID_INTERACCION.search(str(texto))
+    if coincidencia is not None:
+        etiquetas = indice_interacciones(clave).get(coincidencia.group(1), [])
+        filas = tabla.loc[[e for e in etiquetas if e in tabla.index]]
+        # La fuente pudo releerse después de armar `df`: validar el ID de cada fila
+        filas = filas[filas[columna].astype(str).str.contains(coincidencia.group(1), regex=False)]
+    if filas.empty:
+        # Sin ID canónico (o índice de otra versión de la fuente): comparación exacta
+        filas = tabla[tabla[columna] == texto]
+        if filas.empty:
+            return None
+    exactas = filas[filas[columna] == texto]
+    return (exactas if len(exactas) else filas).iloc[0]
+
+
+def cargar_datos(permisos=None):
+    """
+    Carga todos los datos necesarios para el dashboard desde el registro de fuentes.
+    Con `permisos` (ver obtener_permisos_usuario) las fuentes por agente llegan ya
+    recortadas al equipo o vendedor de la sesión. En datos['versiones_fuentes']
+    queda la versión completa de cada fuente de la que sale su recorte, para
+    consultar los índices derivados (áreas, planes) con las mismas etiquetas.
+    """
+    alcance = clave_alcance(permisos)
+    datos = {'versiones_fuentes': {}}
+    for clave in FUENTES_DATOS:
+        fuente = cargar_fuente(clave)
+        valor = obtener_vista_fuente(clave, alcance, fuente)
+        if valor is None:
+            continue
+        datos['versiones_fuentes'][clave] = fuente
+        # Copia superficial: las páginas agregan columnas sin tocar la caché compartida
+        datos[clave] = valor.copy(deep=False) if isinstance(valor, pd.DataFrame) else valor
+    
+    # Cargar listado de vendedores y equipos
+    listado, equipos = cargar_listado_vendedores()
+    datos['listado_vendedores'] = listado
+    datos['equipos_vendedores'] = equipos
+    
+    return datos
+
+
+def crear_df_llamadas(transcripciones):
+    """Crea un DataFrame con la información de las llamadas desde el índice de transcripciones"""
+    df = transcripciones[CAMPOS_TRANSCRIPCION].copy()
+    
+    df['agente'] = resolver_nombres_agentes(df['agente'])
+    
+    if len(df) > 0:
+        df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce')
+        df['dia'] = df['fecha'].dt.date
+        df['hora'] = df['fecha'].dt.hour
+    return df
+
+
+def crear_df_llamadas_desde_hechos(hechos):
+    """
+    Crea el DataFrame de llamadas a partir de la tabla de hechos (ver
+    construir_hechos_llamadas): solo las llamadas evaluadas, sin volver a
+    resolver agentes, fechas ni planes.
+    """
+    if hechos is None:
+        return pd.DataFrame()
+
+    base = hechos[hechos['evaluada']]
+    fecha = base['fecha_hora_llamada'].fillna(base['fecha_evaluacion'])
+    df = pd.DataFrame({
+        'id': base['archivo'],
+        'fecha': fecha,
+        'agente': base['agente'].cat.remove_unused_categories(),
+        'duracion': base['duracion_seg'].fillna(0),
+        'tipificacion': 'Sin datos',
+        'tipo': 'Sin datos',
+        'score_calidad': base['puntaje_total'].fillna(0),
+        'tiene_saludo': (base['saludo_presentacion'].fillna(0) > 0).astype(bool),
+        'tiene_cierre': (base['cierre'].fillna(0) > 0).astype(bool),
+        'planes': base['planes'].astype(str),
+        'primer_plan': base['primer_plan'].astype(str),
+    }).reset_index(drop=True)
+
+    if len(df) > 0:
+        df['dia'] = df['fecha'].dt.date
+        df['hora'] = df['fecha'].dt.hour
+    return df
+
+
+# =============================================================================
+# CUBO DE MÉTRICAS DE EVALUACIONES (día × equipo × agente)
+# =============================================================================
+# Sumas y conteos por celda: cualquier recorte de fechas / equipos / agentes del
+# sidebar se responde sumando celdas en lugar de agrupar las filas crudas.
+
+DIMENSIONES_CUBO = ['fecha_llamada', 'equipo', 'agente']
+
+# Rangos de desempeño del puntaje total (límite inferior exclusivo, superior inclusivo)
+RANGOS_PUNTAJE = [
+    ('n_critico', 'Crítico (0-20)', -1, 20),
+    ('n_bajo', 'Bajo (21-40)', 20, 40),
+    ('n_regular', 'Regular (41-60)', 40, 60),
+    ('n_bueno', 'Bueno (61-80)', 60, 80),
+    ('n_excelente', 'Excelente (81-100)', 80, 100),
+]
+
+_CUBO_EVALUACIONES = {'valor': None, 'cubo': None}
+
+
+def construir_cubo_evaluaciones(df_eval):
+    """
+    Agrega las evaluaciones por día × equipo × agente. Cada celda guarda el total
+    de evaluaciones (n), suma y conteo de cada criterio y del puntaje total, las
+    evaluaciones por rango de puntaje, con puntaje cero o >= 80, con fibra y con
+    algún plan ofrecido. Las evaluaciones sin fecha quedan en celdas con NaT.
+    """
+    if df_eval is None or df_eval.empty or 'agente' not in df_eval.columns:
+        return pd.DataFrame(columns=DIMENSIONES_CUBO + ['n'])
+
+    base = pd.DataFrame(index=df_eval.index)
+    if 'fecha_llamada' in df_eval.columns:
+        base['fecha_llamada'] = df_eval['fecha_llamada']
+    else:
+        base['fecha_llamada'] = pd.NaT
+    base['agente'] = df_eval['agente'].astype(str)
+    base['equipo'] = (df_eval['equipo'] if 'equipo' in df_eval.columns else resolver_equipos(df_eval['agente'])).astype(str)
+    base['n'] = 1
+
+    valores = {c: pd.to_numeric(df_eval[c], errors='coerce') for c in list(CRITERIOS_NOMBRES) + ['puntaje_total'] if c in df_eval.columns}
+    for c, serie in valores.items():
+        base[f'suma_{c}'] = serie.fillna(0).astype('float64')
+        base[f'n_{c}'] = serie.notna().astype('int64')
+
+    if 'puntaje_total' in valores:
+        puntaje = valores['puntaje_total']
+        for columna, _, desde, hasta in RANGOS_PUNTAJE:
+            base[columna] = ((puntaje > desde) & (puntaje <= hasta)).astype('int64')
+        base['n_cero'] = (puntaje == 0).astype('int64')
+        base['n_destacadas'] = (puntaje >= 80).astype('int64')
+    if 'se_ofrecio_fibra' in df_eval.columns:
+        base['n_fibra'] = df_eval['se_ofrecio_fibra'].astype(str).str.lower().isin(['true', '1']).astype('int64')
+    if 'primer_plan_ofrecido' in df_eval.columns:
+        base['n_con_plan'] = df_eval['primer_plan_ofrecido'].fillna('').astype(str).str.strip().ne('').astype('int64')
+
+    return base.groupby(DIMENSIONES_CUBO, dropna=False, sort=True).sum().reset_index()
+
+
+def obtener_cubo_evaluaciones():
+    """
+    Cubo de la versión cargada de evaluaciones; se reconstruye solo cuando
+    cargar_fuente publica otro valor (no con la firma: durante una relectura
+    en segundo plano la fuente todavía sirve la versión anterior)
+    """
+    valor = cargar_fuente('evaluaciones_gemini_df')
+    if _CUBO_EVALUACIONES['cubo'] is None or _CUBO_EVALUACIONES['valor'] is not valor:
+        _CUBO_EVALUACIONES['cubo'] = construir_cubo_evaluaciones(valor)
+        _CUBO_EVALUACIONES['valor'] = valor
+    return _CUBO_EVALUACIONES['cubo']
+
+
+def consultar_cubo(cubo, fecha_inicio=None, fecha_fin=None, equipos=None, agentes=None, por=None):
+    """
+    Suma las celdas del cubo que caen en el recorte pedido. Sin `por` retorna una
+    serie con los totales; con `por` ('agente', 'equipo', 'fecha_llamada' o una
+    lista) retorna un DataFrame agrupado. En ambos casos agrega prom_<métrica>
+    (suma / conteo) para cada criterio y el puntaje total.
+    """
+    mascara = pd.Series(True, index=cubo.index)
+    if fecha_inicio is not None:
+        mascara &= cubo['fecha_llamada'] >= pd.to_datetime(fecha_inicio)
+    if fecha_fin is not None:
+        mascara &= cubo['fecha_llamada'] <= pd.to_datetime(fecha_fin)
+    if equipos is not None:
+        mascara &= cubo['equipo'].isin(list(equipos))
+    if agentes is not None:
+        mascara &= cubo['agente'].isin([str(a) for a in agentes])
+    recorte = cubo[mascara]
+
+    metricas = [c for c in cubo.columns if c not in DIMENSIONES_CUBO]
+    if por is None:
+        resultado = recorte[metricas].sum().astype('float64')
+    else:
+        resultado = recorte.groupby(por, sort=True)[metricas].sum()
+        resultado = resultado[resultado['n'] > 0]
+
+    for c in metricas:
+        if c.startswith('suma_'):
+            nombre = c[len('suma_'):]
+            conteo = resultado[f'n_{nombre}']
+            if por is None:
+                resultado[f'prom_{nombre}'] = resultado[c] / conteo if conteo else np.nan
+            else:
+                resultado[f'prom_{nombre}'] = (resultado[c] / conteo).where(conteo > 0)
+    return resultado
+
+
+# =============================================================================
+# ÍNDICE DE ÁREAS (areas_mejora / fortalezas)
+# =============================================================================
+# Las columnas de texto libre se separan por coma y cada frase distinta se
+# normaliza y mapea a su área canónica una sola vez. El resultado es una tabla
+# explotada (evaluacion, campo, area_id, area) con una fila por área distinta de
+# cada evaluación, así el top de áreas de cualquier recorte es un conteo agrupado.
+
+COLUMNAS_AREAS = ['areas_mejora', 'fortalezas']
+
+# Frases que no aportan como área (se descartan)
+AREAS_EXCLUIDAS = [
+    'Completar el proceso de cierre',
+    'Realizar preguntas para detectar las necesidades del cliente',
+    'Resolucion de problemas',
+    'Presentacion inicial',
+    'Profundizar en la deteccion de necesidades',
+    'Mejorar la presentacion inicial',
+]
+
+# Frase normalizada -> área canónica; las frases sin mapeo quedan como vienen
+MAPA_AREAS = {
+    'saludo y presentacion': 'Saludo y Presentación',
+    'presentacion y saludo': 'Saludo y Presentación',
+    'presentacion y saludo inicial': 'Saludo y Presentación',
+    'presentacion': 'Saludo y Presentación',
+    'saludo': 'Saludo y Presentación',
+    'identificacion cliente': 'Identificación del Cliente',
+    'identificacion del cliente': 'Identificación del Cliente',
+    'deteccion necesidades': 'Detección de Necesidades',
+    'deteccion de necesidades': 'Detección de Necesidades',
+    'deteccion de necesidades del cliente': 'Detección de Necesidades',
+    'manejo de objeciones': 'Manejo de Objeciones',
+    'oferta de productos': 'Oferta de Productos',
+    'ofrecer productos adicionales': 'Oferta de Productos',
+    'presentacion y oferta de productos': 'Oferta de Productos',
+    'cierre de ventas': 'Cierre de Venta',
+    'cierre de venta': 'Cierre de Venta',
+    'cierre de la venta': 'Cierre de Venta',
+    'cierre': 'Cierre de Venta',
+    'resolucion problemas': 'Resolución de Problemas',
+    'resolucion de problemas': 'Resolución de Problemas',
+    'empatia': 'Empatía',
+    'despedida': 'Despedida',
+    'proactividad': 'Proactividad',
+    'proactividad ofrecer fibra': 'Proactividad',
+    'proactividad en la oferta de productos': 'Proactividad'
+}
+
+_INDICE_AREAS = {}
+
+
+def normalizar_area(texto):
+    """Minúsculas, sin acentos ni signos y con espacios simples (id canónico del área)"""
+    import unicodedata
+
+    texto = str(texto).strip().lower()
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    texto = re.sub(r'[^a-z0-9\s]', ' ', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    return texto
+
+
+_AREAS_EXCLUIDAS_NORM = {normalizar_area(a) for a in AREAS_EXCLUIDAS}
+
+
+def mapear_area(texto):
+    """Área canónica de una frase, o None si la frase está excluida"""
+    normalizada = normalizar_area(texto)
+    if normalizada in _AREAS_EXCLUIDAS_NORM:
+        return None
+    return MAPA_AREAS.get(normalizada, texto.strip())
+
+
+def explotar_areas(df_eval, columnas=COLUMNAS_AREAS):
+    """
+    Tabla explotada de áreas: una fila por (evaluacion, campo, area_id) en el
+    orden en que aparecen, con `evaluacion` = etiqueta del índice de df_eval.
+    """
+    partes = []
+    for campo in columnas:
+        if campo not in df_eval.columns:
+            continue
+        serie = df_eval[campo]
+        serie = serie[serie.map(lambda v: isinstance(v, str))]
+        frases = serie.str.split(',').explode()
+        frases = (frases.str.strip().str.strip('"').str.strip("'")
+                  .str.strip('[').str.strip(']').str.strip())
+        frases = frases[frases.notna() & (frases != '')]
+
+        # El mapeo se aplica una vez por frase distinta
+        area = frases.map({f: mapear_area(f) for f in pd.unique(frases)})
+        area = area[area.notna()]
+        tabla = pd.DataFrame({'evaluacion': area.index, 'campo': campo, 'area': area.to_numpy()})
+        tabla['area_id'] = tabla['area'].map({a: normalizar_area(a) for a in pd.unique(tabla['area'])})
+        partes.append(tabla.drop_duplicates(['evaluacion', 'area_id']))
+
+    if not partes:
+        return pd.DataFrame(columns=['evaluacion', 'campo', 'area_id', 'area'])
+    indice = pd.concat(partes, ignore_index=True)[['evaluacion', 'campo', 'area_id', 'area']]
+    indice['campo'] = indice['campo'].astype('category')
+    return indice
+
+
+def obtener_indice_areas(valor=None):
+    """
+    Índice de áreas de la versión `valor` de las evaluaciones (por defecto, la
+    vigente). Las etiquetas de `evaluacion` solo corresponden a las de los
+    recortes de esa misma versión, así que las páginas pasan la de su snapshot
+    (datos['versiones_fuentes'], ver cargar_datos y contar_areas).
+    """
+    valor = cargar_fuente('evaluaciones_gemini_df') if valor is None else valor
+    with _CACHE_FUENTES_LOCK:
+        entrada = _INDICE_AREAS.get('evaluaciones_gemini_df')
+    if entrada is None or entrada['valor'] is not valor:
+        # Se arma fuera del lock y se publica valor e índice juntos
+        entrada = {'valor': valor, 'indice': explotar_areas(valor)}
+        with _CACHE_FUENTES_LOCK:
+            _INDICE_AREAS['evaluaciones_gemini_df'] = entrada
+    return entrada['indice']
+
+
+def contar_areas(indice, evaluaciones=None, campo='areas_mejora'):
+    """
+    Frecuencia de cada área (cantidad de evaluaciones que la mencionan) en el
+    recorte `evaluaciones` (etiquetas del índice de la fuente), de mayor a
+    menor; los empates quedan en orden de aparición. Columnas: Área, Frecuencia.
+    """
+    mascara = indice['campo'] == campo
+    if evaluaciones is not None:
+        mascara &= indice['evaluacion'].isin(evaluaciones)
+    conteo = indice[mascara].groupby('area_id', sort=False).agg(
+        Área=('area', 'first'), Frecuencia=('evaluacion', 'size')
+    )
+    return conteo.sort_values('Frecuencia', ascending=False, kind='stable').reset_index(drop=True)
+
+
+# =============================================================================
+# ÍNDICE DE PLANES MENCIONADOS
+# =============================================================================
+# Las menciones de planes ("8GB + 8GB extra", "16 gigas", "8gb", "Plan de 18
+# gigas") se llevan a un código canónico ('8gb', '16gb', 'fibra', 'familiar', 'otro')
+# una vez por valor distinto, y quedan en una tabla larga (llamada, campo,
+# plan) con `llamada` = etiqueta del índice de la fuente. El mix de planes y
+# el primer plan ofrecido de cualquier recorte son conteos agrupados.
+
+# Columnas de cada fuente: campo del índice -> columna de la fuente
+COLUMNAS_PLANES = {
+    'planes_df': {'planes': 'planes_ofrecidos', 'primer_plan': 'primer_plan'},
+    'evaluaciones_gemini_df': {'planes': 'planes_mencionados', 'primer_plan': 'primer_plan_ofrecido'},
+}
+
+# Cantidad de gigas del plan; en "8 gigas + 10 de regalo" vale la primera.
+# Incluye las variantes mal transcriptas que aparecen en las evaluaciones
+# ("8 sigas", "14 digas", "plan de 18 días")
+PATRON_PLAN_GIGAS = re.compile(r'(\d+)\s*(?:gb|g[ií]gas?|gigabytes?|[dsr]igas|d[ií]as)\b', re.IGNORECASE)
+# Velocidad en megas: oferta de fibra
+PATRON_PLAN_MEGAS = re.compile(r'\d+\s*(?:mb|megas?|megabytes?)\b', re.IGNORECASE)
+
+_INDICE_PLANES = {}
+
+
+def codigo_plan(texto):
+    """Código canónico de una mención de plan: '<n>gb', 'fibra', 'familiar' u 'otro'"""
+    coincidencia = PATRON_PLAN_GIGAS.search(texto)
+    if coincidencia:
+        return f"{int(coincidencia.group(1))}gb"
+    if PATRON_PLAN_MEGAS.search(texto):
+        return 'fibra'
+    if 'familiar' in texto.lower():
+        return 'familiar'
+    return 'otro'
+
+
+def codigos_planes(texto):
+    """Códigos de plan de un campo separado por comas, sin repetir y en orden de mención"""
+    if not isinstance(texto, str):
+        return []
+    codigos = []
+    for parte in texto.split(','):
+        parte = parte.strip()
+        if not parte or parte.lower() in ('none', 'nan'):
+            continue
+        codigo = codigo_plan(parte)
+        if codigo not in codigos:
+            codigos.append(codigo)
+    return codigos
+
+
+def explotar_planes(df, columnas):
+    """
+    Tabla larga de menciones de planes: una fila por (llamada, campo, plan).
+    `columnas` mapea cada campo ('planes', 'primer_plan') a su columna en df;
+    del primer plan se toma sólo la primera mención.
+    """
+    partes = []
+    for campo, columna in columnas.items():
+        if columna not in df.columns:
+            continue
+        serie = df[columna].dropna()
+        # La normalización se aplica una vez por valor distinto
+        mapa = {v: codigos_planes(v) for v in pd.unique(serie)}
+        if campo == 'primer_plan':
+            mapa = {v: c[:1] for v, c in mapa.items()}
+        planes = serie.map(mapa).explode().dropna()
+        partes.append(pd.DataFrame({'llamada': planes.index, 'campo': campo, 'plan': planes.to_numpy()}))
+
+    if not partes:
+        return pd.DataFrame({'llamada': [], 'campo': pd.Categorical([]), 'plan': pd.Categorical([])})
+    indice = pd.concat(partes, ignore_index=True)
+    indice['campo'] = indice['campo'].astype('category')
+    indice['plan'] = indice['plan'].astype('category')
+    return indice
+
+
+def obtener_indice_planes(clave, fuente=None):
+    """
+    Índice de planes de la versión `fuente` de la fuente `clave` (por defecto,
+    la vigente; ver COLUMNAS_PLANES). Las etiquetas de `llamada` solo
+    corresponden a las de los recortes de esa misma versión, así que las
+    páginas pasan la de su snapshot (datos['versiones_fuentes'], ver
+    cargar_datos y contar_planes).
+    """
+    fuente = cargar_fuente(clave) if fuente is None else fuente
+    with _CACHE_FUENTES_LOCK:
+        entrada = _INDICE_PLANES.get(clave)
+    if entrada is None or entrada['valor'] is not fuente:
+        # Se arma fuera del lock y se publica valor e índice juntos
+        indice = explotar_planes(fuente if fuente is not None else pd.DataFrame(), COLUMNAS_PLANES[clave])
+        entrada = {'valor': fuente, 'indice': indice}
+        with _CACHE_FUENTES_LOCK:
+            _INDICE_PLANES[clave] = entrada
+    return entrada['indice']
+
+
+def contar_planes(indice, llamadas=None, campo='planes', por=None):
+    """
+    Menciones por plan en el recorte `llamadas` (etiquetas del índice de la
+    fuente). Sin `por` retorna una serie plan -> cantidad de mayor a menor; con
+    `por` (serie indexada por llamada: agente, equipo, día...) retorna una
+    tabla grupo x plan.
+    """
+    mascara = indice['campo'] == campo
+    if llamadas is not None:
+        mascara &= indice['llamada'].isin(llamadas)
+    sub = indice[mascara]
+    if por is None:
+        conteo = sub['plan'].value_counts()
+        return conteo[conteo > 0]
+    grupos = por.reindex(sub['llamada']).to_numpy()
+    return sub.groupby([grupos, sub['plan'].to_numpy()]).size().unstack(fill_value=0)
+
+
+def cargar_coaching_equipo(ruta_coaching):
+    """Carga y normaliza el coaching de un equipo desde JSON."""
+    if not os.path.exists(ruta_coaching):
+        return None
+    try:
+        with open(ruta_coaching, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception:
+        return None
+
+    comparativa = data.get('comparativa', {}) or {}
+    if 'puntaje_ia' not in comparativa and 'puntaje_modelo' in comparativa:
+        comparativa['puntaje_ia'] = comparativa['puntaje_modelo']
+    data['comparativa'] = comparativa
+
+    coaching_modelo = data.get('coaching_modelo', {}) or {}
+    coaching_ia = data.get('coaching_ia') or coaching_modelo or {}
+
+    if 'plan_accion_equipo' not in coaching_ia:
+        if 'plan_accion_equipo' in coaching_modelo:
+            coaching_ia['plan_accion_equipo'] = coaching_modelo.get('plan_accion_equipo', [])
+
+    if not coaching_ia.get('plan_accion_equipo'):
+        areas = coaching_ia.get('areas_mejora_prioritarias', []) or []
+        plan = []
+        for idx, area in enumerate(areas[:4], 1):
+            nombre_area = area.get('area', 'Area clave')
+            meta = area.get('meta', 'Mejorar el puntaje del equipo')
+            plan.append({
+                'prioridad': idx,
                 'accion': f"Mejorar {nombre_area} con practicas semanales del equipo.",
                 'responsable': 'Lider del equipo',
                 'plazo': 'Corto plazo',
@@ -2542,33 +3960,13 @@ def pagina_planes_ofrecidos(datos, df):
     # Cargar datos de filtrado
     listado_vendedores, equipos_vendedores = cargar_listado_vendedores()
     
-    # Crear mapeo inverso: nombre -> equipo
-    nombre_a_equipo = {}
-    for equipo, vendedores in equipos_vendedores.items():
-        for vendedor in vendedores:
-            nombre_a_equipo[vendedor.lower().strip()] = equipo
-    
-    def obtener_equipo_por_nombre(nombre):
-        """Obtiene el equipo del vendedor por su nombre"""
-        if pd.isna(nombre) or nombre is None:
-            return "Sin Equipo"
-        nombre_lower = str(nombre).lower().strip()
-        # Buscar coincidencia exacta primero
-        if nombre_lower in nombre_a_equipo:
-            return nombre_a_equipo[nombre_lower]
-        # Buscar coincidencia parcial
-        for nom, eq in nombre_a_equipo.items():
-            if nombre_lower in nom or nom in nombre_lower:
-                return eq
-        return "Sin Equipo"
-    
     # Cargar CSV de planes para filtrado
     planes_df = datos.get('planes_df', pd.DataFrame())
     
-    if not planes_df.empty and 'agente' in planes_df.columns:
+    if 'agente' in planes_df.columns:
         # Aplicar nombres reales
-        planes_df['agente_display'] = planes_df['agente'].apply(obtener_nombre_agente)
-        planes_df['equipo'] = planes_df['agente_display'].apply(obtener_equipo_por_nombre)
+        planes_df['agente_display'] = resolver_nombres_agentes(planes_df['agente'])
+        planes_df['equipo'] = resolver_equipos(planes_df['agente_display'])
         
         # Filtrar vendedores sin equipo
         planes_df = planes_df[planes_df['equipo'] != "Sin Equipo"]
@@ -2579,9 +3977,7 @@ def pagina_planes_ofrecidos(datos, df):
         if permisos['rol'] == 'vendedor':
             # Vendedor: Filtrar solo sus datos, sin mostrar selectores
             nombre_vendedor = permisos['nombre_usuario'].lower()
-            planes_df = planes_df[planes_df['agente_display'].apply(
-                lambda x: nombre_vendedor in str(x).lower() if pd.notna(x) else False
-            )]
+            planes_df = planes_df[mascara_vendedor(planes_df['agente_display'], nombre_vendedor)]
             equipo_seleccionado = permisos['equipo'] if permisos['equipo'] else "Sin Equipo"
             agente_seleccionado = permisos['nombre_usuario']
             
@@ -2702,16 +4098,16 @@ def pagina_planes_ofrecidos(datos, df):
     with col4:
         # Calcular si se ofreció fibra desde el CSV de evaluaciones
         if 'evaluaciones_gemini_df' in datos and datos['evaluaciones_gemini_df'] is not None:
-            df_eval = datos['evaluaciones_gemini_df'].copy()
             # Si hay filtros aplicados por equipo/agente, aplicarlos también aquí
+            agentes_filtrados = None
             if not df_filtrado.empty and 'agente_display' in df_filtrado.columns:
                 # Usar los mismos agentes que en df_filtrado
                 agentes_filtrados = df_filtrado['agente_display'].unique()
-                df_eval = df_eval[df_eval['agente'].isin(agentes_filtrados)]
+            resumen_fibra = consultar_cubo(obtener_cubo_evaluaciones(), agentes=agentes_filtrados)
             
-            if not df_eval.empty and 'se_ofrecio_fibra' in df_eval.columns:
-                total_con_fibra = df_eval['se_ofrecio_fibra'].sum()
-                pct_fibra_eval = (total_con_fibra / len(df_eval) * 100) if len(df_eval) > 0 else 0
+            if resumen_fibra['n'] > 0 and 'n_fibra' in resumen_fibra:
+                total_con_fibra = resumen_fibra['n_fibra']
+                pct_fibra_eval = total_con_fibra / resumen_fibra['n'] * 100
                 st.metric("🌐 Ofreció Fibra", f"{int(total_con_fibra):,}", f"{pct_fibra_eval:.1f}%")
             else:
                 st.metric("🌐 Ofreció Fibra", "N/D")
@@ -2720,16 +4116,18 @@ def pagina_planes_ofrecidos(datos, df):
     with col5:
         # Plan más usado como primer ofrecimiento
         if not df_filtrado.empty and 'primer_plan' in df_filtrado.columns:
-            primer_plan_conteo = df_filtrado['primer_plan'].dropna().value_counts().to_dict()
+            primer_plan_conteo = contar_planes(obtener_indice_planes('planes_df', datos['versiones_fuentes'].get('planes_df')), df_filtrado.index, 'primer_plan').to_dict()
         elif 'evaluaciones_gemini_df' in datos and datos['evaluaciones_gemini_df'] is not None:
-            df_eval = datos['evaluaciones_gemini_df'].copy()
+            df_eval = datos['evaluaciones_gemini_df']
             # Si hay filtros aplicados, aplicarlos también aquí
             if not df_filtrado.empty and 'agente_display' in df_filtrado.columns:
                 agentes_filtrados = df_filtrado['agente_display'].unique()
                 df_eval = df_eval[df_eval['agente'].isin(agentes_filtrados)]
             
             if 'primer_plan_ofrecido' in df_eval.columns:
-                primer_plan_conteo = df_eval['primer_plan_ofrecido'].dropna().value_counts().to_dict()
+                primer_plan_conteo = contar_planes(
+                    obtener_indice_planes('evaluaciones_gemini_df', datos['versiones_fuentes'].get('evaluaciones_gemini_df')), df_eval.index, 'primer_plan'
+                ).to_dict()
             else:
                 primer_plan_conteo = stats.get('primer_plan_conteo', {})
         else:
@@ -2747,12 +4145,7 @@ def pagina_planes_ofrecidos(datos, df):
         # Calcular conteo de planes desde el DF filtrado si está disponible
         if not df_filtrado.empty and 'planes_ofrecidos' in df_filtrado.columns:
             # Contar planes desde los datos filtrados
-            all_planes = []
-            for planes_str in df_filtrado['planes_ofrecidos'].dropna():
-                if isinstance(planes_str, str) and planes_str:
-                    all_planes.extend([p.strip().lower() for p in planes_str.split(',')])
-            from collections import Counter
-            planes_conteo = dict(Counter(all_planes))
+            planes_conteo = contar_planes(obtener_indice_planes('planes_df', datos['versiones_fuentes'].get('planes_df')), df_filtrado.index).to_dict()
         else:
             planes_conteo = stats.get('planes_conteo', {})
         
@@ -2786,8 +4179,7 @@ def pagina_planes_ofrecidos(datos, df):
         
         # Usar datos filtrados si están disponibles
         if not df_filtrado.empty and 'primer_plan' in df_filtrado.columns:
-            primer_plan_series = df_filtrado['primer_plan'].dropna().str.lower().value_counts()
-            primer_plan = primer_plan_series.to_dict()
+            primer_plan = contar_planes(obtener_indice_planes('planes_df', datos['versiones_fuentes'].get('planes_df')), df_filtrado.index, 'primer_plan').to_dict()
         else:
             primer_plan = stats.get('primer_plan_conteo', {})
         
@@ -2965,13 +4357,7 @@ def pagina_coaching_vendedores(datos):
     
     def obtener_equipo_vendedor(agente_id):
         """Obtiene el equipo del vendedor"""
-        agente_normalizado = str(agente_id).lower().replace(' ', '').replace('_', '')
-        for equipo, vendedores in equipos_vendedores.items():
-            # Normalizar nombres de vendedores para comparación
-            for vendedor in vendedores:
-                if agente_normalizado in vendedor.lower().replace(' ', ''):
-                    return equipo
-        return "Sin Equipo"
+        return str(resolver_equipos(pd.Series([agente_id], dtype=object)).iloc[0])
     
     # Verificar si hay datos de coaching
     if 'coaching' not in datos or not datos['coaching']:
@@ -3372,7 +4758,7 @@ def pagina_coaching_vendedores(datos):
             </div>
             """, unsafe_allow_html=True)
             
-            analisis = data.get('analisis_coaching', '')
+            analisis = cargar_detalle_coaching(data).get('analisis_coaching', '')
             
             if analisis:
                 # Limpiar introducciones genéricas de Command
@@ -4086,13 +5472,12 @@ def pagina_detalle_llamadas(df, datos):
         # Si hay evaluación de Gemini
         if 'evaluaciones_gemini_df' in datos:
             df_gemini = datos['evaluaciones_gemini_df']
-            # Buscar por coincidencia parcial del ID
-            eval_match = df_gemini[df_gemini['archivo'].str.contains(str(id_seleccionado), na=False)]
+            # Buscar por ID canónico de interacción
+            eval_data = buscar_interaccion('evaluaciones_gemini_df', id_seleccionado, df_gemini)
             
-            if len(eval_match) > 0:
+            if eval_data is not None:
                 st.markdown("---")
                 st.markdown("**🤖 Evaluación:**")
-                eval_data = eval_match.iloc[0]
                 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -4149,28 +5534,16 @@ def pagina_detalle_llamadas(df, datos):
         #        for vendedor in vendedores:
         #            nombre_a_equipo[vendedor.lower().strip()] = equipo
     
-    def obtener_equipo_por_nombre(nombre):
-        """Obtiene el equipo del vendedor por su nombre"""
-        if pd.isna(nombre) or nombre is None:
-            return "Sin Equipo"
-        nombre_lower = str(nombre).lower().strip()
-        if nombre_lower in nombre_a_equipo:
-            return nombre_a_equipo[nombre_lower]
-        for nom, eq in nombre_a_equipo.items():
-            if nombre_lower in nom or nom in nombre_lower:
-                return eq
-        return "Sin Equipo"
-    
     # Cargar CSV de quejas para filtrado
     quejas_df = datos.get('quejas_df', pd.DataFrame())
     
     filtro_activo = False
     df_filtrado = pd.DataFrame()
     
-    if not quejas_df.empty and 'agente' in quejas_df.columns:
+    if 'agente' in quejas_df.columns:
         # Aplicar nombres reales
-        quejas_df['agente_display'] = quejas_df['agente'].apply(obtener_nombre_agente)
-        quejas_df['equipo'] = quejas_df['agente_display'].apply(obtener_equipo_por_nombre)
+        quejas_df['agente_display'] = resolver_nombres_agentes(quejas_df['agente'])
+        quejas_df['equipo'] = resolver_equipos(quejas_df['agente_display'])
         
         # Filtrar vendedores sin equipo
         quejas_df = quejas_df[quejas_df['equipo'] != "Sin Equipo"]
@@ -4181,9 +5554,7 @@ def pagina_detalle_llamadas(df, datos):
         if permisos['rol'] == 'vendedor':
             # Vendedor: Filtrar solo sus datos
             nombre_vendedor = permisos['nombre_usuario'].lower()
-            quejas_df = quejas_df[quejas_df['agente_display'].apply(
-                lambda x: nombre_vendedor in str(x).lower() if pd.notna(x) else False
-            )]
+            quejas_df = quejas_df[mascara_vendedor(quejas_df['agente_display'], nombre_vendedor)]
             equipo_seleccionado = permisos['equipo'] if permisos['equipo'] else "Sin Equipo"
             agente_seleccionado = permisos['nombre_usuario']
             filtro_activo = True
@@ -5069,6 +6440,43 @@ def pagina_clasificacion_integral(datos):
             st.dataframe(top_calidad, use_container_width=True, hide_index=True, height=300)
 
 
+def figura_barras_por_equipo(df_comparativa, columna, sufijo='%', margen=5):
+    """Barras verticales de `columna` por equipo (comparativa de equipos), cacheadas"""
+    def _construir():
+        fig = px.bar(
+            df_comparativa,
+            x='Equipo',
+            y=columna,
+            color=columna,
+            color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
+            text=columna
+        )
+        fig.update_traces(texttemplate='%{text:.1f}' + sufijo, textposition='outside')
+        fig.update_layout(
+            height=300,
+            paper_bgcolor='#FFFFFF',
+            plot_bgcolor='#FAFBFC',
+            showlegend=False,
+            font=dict(color="#000000")
+        )
+        fig.update_xaxes(
+            tickfont=dict(color="#000000"),
+            title=dict(font=dict(color="#000000"))
+        )
+
+        fig.update_yaxes(
+            tickfont=dict(color="#000000"),
+            title=dict(font=dict(color="#000000"))
+        )
+        fig.update_yaxes(range=[0, df_comparativa[columna].max() + margen])
+        return fig
+
+    return figura_cacheada(
+        'barras_por_equipo', df_comparativa[['Equipo', columna]], _construir,
+        sufijo=sufijo, margen=margen
+    )
+
+
 def pagina_analisis_equipos(datos):
     """Página de análisis y planes de mejora para equipos"""
     st.markdown('<div class="main-header">👥 COMMAND · Análisis y Desarrollo de Equipos</div>', unsafe_allow_html=True)
@@ -5094,24 +6502,6 @@ def pagina_analisis_equipos(datos):
     # Cargar datos necesarios
     listado_vendedores, equipos_vendedores = cargar_listado_vendedores()
     
-    # Crear mapeo inverso: nombre -> equipo
-    nombre_a_equipo = {}
-    for equipo, vendedores in equipos_vendedores.items():
-        for vendedor in vendedores:
-            nombre_a_equipo[vendedor.lower().strip()] = equipo
-    
-    def obtener_equipo_por_nombre(nombre):
-        """Obtiene el equipo del vendedor por su nombre"""
-        if pd.isna(nombre) or nombre is None:
-            return "Sin Equipo"
-        nombre_lower = str(nombre).lower().strip()
-        if nombre_lower in nombre_a_equipo:
-            return nombre_a_equipo[nombre_lower]
-        for nom, eq in nombre_a_equipo.items():
-            if nombre_lower in nom or nom in nombre_lower:
-                return eq
-        return "Sin Equipo"
-    
     # Verificar datos disponibles
     coaching_data = datos.get('coaching', {})
     planes_df = datos.get('planes_df', pd.DataFrame())
@@ -5190,25 +6580,24 @@ def pagina_analisis_equipos(datos):
                 'vendedores_data': []
             }
             
-            for vendedor in vendedores_equipo:
+            for agente_key in emparejar_agentes(vendedores_equipo, coaching_data):
                 # Buscar en coaching_data
-                for agente_key, data in coaching_data.items():
-                    if vendedor.lower() in agente_key.lower() or agente_key.lower() in vendedor.lower():
-                        comparativa = data.get('comparativa', {})
-                        puntaje = comparativa.get('puntaje_ia', {}).get('agente', 0)
-                        conversion = comparativa.get('conversion', {}).get('agente', 0)
-                        evaluaciones = data.get('metricas', {}).get('evaluaciones', {}).get('total_evaluadas', 0)
+                if agente_key is not None:
+                    data = coaching_data[agente_key]
+                    comparativa = data.get('comparativa', {})
+                    puntaje = comparativa.get('puntaje_ia', {}).get('agente', 0)
+                    conversion = comparativa.get('conversion', {}).get('agente', 0)
+                    evaluaciones = data.get('metricas', {}).get('evaluaciones', {}).get('total_evaluadas', 0)
                         
-                        metricas_equipo['puntajes_ia'].append(puntaje)
-                        metricas_equipo['conversiones'].append(conversion)
-                        metricas_equipo['total_evaluaciones'] += evaluaciones
-                        metricas_equipo['vendedores_data'].append({
-                            'Vendedor': agente_key,
-                            'Puntaje': puntaje,
-                            'Conversión %': conversion,
-                            'Evaluaciones': evaluaciones
-                        })
-                        break
+                    metricas_equipo['puntajes_ia'].append(puntaje)
+                    metricas_equipo['conversiones'].append(conversion)
+                    metricas_equipo['total_evaluaciones'] += evaluaciones
+                    metricas_equipo['vendedores_data'].append({
+                        'Vendedor': agente_key,
+                        'Puntaje': puntaje,
+                        'Conversión %': conversion,
+                        'Evaluaciones': evaluaciones
+                    })
             
             # Métricas agregadas del equipo
             st.markdown("---")
@@ -5230,8 +6619,8 @@ def pagina_analisis_equipos(datos):
             # Análisis de Fibra y Planes del equipo
             if not planes_df.empty and 'agente' in planes_df.columns:
                 planes_df_temp = planes_df.copy()
-                planes_df_temp['agente_display'] = planes_df_temp['agente'].apply(obtener_nombre_agente)
-                planes_df_temp['equipo'] = planes_df_temp['agente_display'].apply(obtener_equipo_por_nombre)
+                planes_df_temp['agente_display'] = resolver_nombres_agentes(planes_df_temp['agente'])
+                planes_df_temp['equipo'] = resolver_equipos(planes_df_temp['agente_display'])
                 planes_df_temp = planes_df_temp[planes_df_temp['equipo'] != "Sin Equipo"]
                 
                 df_equipo_planes = planes_df_temp[planes_df_temp['equipo'] == equipo_seleccionado]
@@ -5265,8 +6654,8 @@ def pagina_analisis_equipos(datos):
             # Análisis de Quejas del equipo
             #if not quejas_df.empty and 'agente' in quejas_df.columns:
             #    quejas_df_temp = quejas_df.copy()
-            #    quejas_df_temp['agente_display'] = quejas_df_temp['agente'].apply(obtener_nombre_agente)
-            #    quejas_df_temp['equipo'] = quejas_df_temp['agente_display'].apply(obtener_equipo_por_nombre)
+            #    quejas_df_temp['agente_display'] = resolver_nombres_agentes(quejas_df_temp['agente'])
+            #    quejas_df_temp['equipo'] = resolver_equipos(quejas_df_temp['agente_display'])
                 
             #    df_equipo_quejas = quejas_df_temp[quejas_df_temp['equipo'] == equipo_seleccionado]
                 
@@ -5296,38 +6685,41 @@ def pagina_analisis_equipos(datos):
                 df_vendedores = df_vendedores.sort_values('Puntaje', ascending=False)
                 
                 # Gráfico de barras de puntajes
-                fig = px.bar(
-                    df_vendedores,
-                    x='Vendedor',
-                    y='Puntaje',
-                    color='Puntaje',
-                    color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
-                    range_color=[0, 100],
-                    text='Puntaje'
-                )
-                fig.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-                fig.update_layout(
-                    height=350,
-                    paper_bgcolor='#FFFFFF',
-                    plot_bgcolor='#FAFBFC',
-                    showlegend=False,
-                    xaxis_tickangle=-45,
-                    margin=dict(t=30, b=80),
-                    font=dict(color="#000000")
-                )
-                fig.update_xaxes(
-                    tickfont=dict(color="#000000"),
-                    title=dict(font=dict(color="#000000"))
-                )
-
-                fig.update_yaxes(
-                    range=[0, 100],
-                    tickfont=dict(color="#000000"),
-                    title=dict(font=dict(color="#000000"))
-                )
+                def _construir():
+                    fig = px.bar(
+                        df_vendedores,
+                        x='Vendedor',
+                        y='Puntaje',
+                        color='Puntaje',
+                        color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
+                        range_color=[0, 100],
+                        text='Puntaje'
+                    )
+                    fig.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+                    fig.update_layout(
+                        height=350,
+                        paper_bgcolor='#FFFFFF',
+                        plot_bgcolor='#FAFBFC',
+                        showlegend=False,
+                        xaxis_tickangle=-45,
+                        margin=dict(t=30, b=80),
+                        font=dict(color="#000000")
+                    )
+                    fig.update_xaxes(
+                        tickfont=dict(color="#000000"),
+                        title=dict(font=dict(color="#000000"))
+                    )
+                    
+                    fig.update_yaxes(
+                        range=[0, 100],
+                        tickfont=dict(color="#000000"),
+                        title=dict(font=dict(color="#000000"))
+                    )
+                    return fig
+                fig = figura_cacheada('barras_vendedores_equipo', df_vendedores, _construir)
                 st.plotly_chart(fig, use_container_width=True)
                 
-                st.dataframe(df_vendedores, use_container_width=True, hide_index=True)
+                tabla_paginada(df_vendedores, key='tabla_vendedores_equipo', use_container_width=True, hide_index=True)
             else:
                 st.info("No hay datos de evaluación para los vendedores de este equipo.")
             
@@ -5612,12 +7004,11 @@ def pagina_analisis_equipos(datos):
                     # Métricas de coaching
                     puntajes = []
                     conversiones = []
-                    for vendedor in vendedores_eq:
-                        for agente_key, data in coaching_data.items():
-                            if vendedor.lower() in agente_key.lower() or agente_key.lower() in vendedor.lower():
-                                puntajes.append(data.get('comparativa', {}).get('puntaje_ia', {}).get('agente', 0))
-                                conversiones.append(data.get('comparativa', {}).get('conversion', {}).get('agente', 0))
-                                break
+                    for agente_key in emparejar_agentes(vendedores_eq, coaching_data):
+                        if agente_key is not None:
+                            data = coaching_data[agente_key]
+                            puntajes.append(data.get('comparativa', {}).get('puntaje_ia', {}).get('agente', 0))
+                            conversiones.append(data.get('comparativa', {}).get('conversion', {}).get('agente', 0))
                     
                     metricas_eq['Puntaje'] = round(np.mean(puntajes), 1) if puntajes else 0
                     metricas_eq['Conversión %'] = round(np.mean(conversiones), 1) if conversiones else 0
@@ -5625,8 +7016,8 @@ def pagina_analisis_equipos(datos):
                     # Métricas de planes
                     if not planes_df.empty and 'agente' in planes_df.columns:
                         planes_df_temp = planes_df.copy()
-                        planes_df_temp['agente_display'] = planes_df_temp['agente'].apply(obtener_nombre_agente)
-                        planes_df_temp['equipo'] = planes_df_temp['agente_display'].apply(obtener_equipo_por_nombre)
+                        planes_df_temp['agente_display'] = resolver_nombres_agentes(planes_df_temp['agente'])
+                        planes_df_temp['equipo'] = resolver_equipos(planes_df_temp['agente_display'])
                         planes_df_temp = planes_df_temp[planes_df_temp['equipo'] != "Sin Equipo"]
                         df_eq = planes_df_temp[planes_df_temp['equipo'] == equipo]
                         
@@ -5638,8 +7029,8 @@ def pagina_analisis_equipos(datos):
                     # Métricas de quejas
                     if not quejas_df.empty and 'agente' in quejas_df.columns:
                         quejas_df_temp = quejas_df.copy()
-                        quejas_df_temp['agente_display'] = quejas_df_temp['agente'].apply(obtener_nombre_agente)
-                        quejas_df_temp['equipo'] = quejas_df_temp['agente_display'].apply(obtener_equipo_por_nombre)
+                        quejas_df_temp['agente_display'] = resolver_nombres_agentes(quejas_df_temp['agente'])
+                        quejas_df_temp['equipo'] = resolver_equipos(quejas_df_temp['agente_display'])
                         quejas_df_temp = quejas_df_temp[quejas_df_temp['equipo'] != "Sin Equipo"]
                         df_eq_q = quejas_df_temp[quejas_df_temp['equipo'] == equipo]
                         
@@ -5671,127 +7062,24 @@ def pagina_analisis_equipos(datos):
                 
                 with col1:
                     st.markdown("**📊 Puntaje por Equipo**")
-                    fig = px.bar(
-                        df_comparativa,
-                        x='Equipo',
-                        y='Puntaje',
-                        color='Puntaje',
-                        color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
-                        text='Puntaje'
-                    )
-                    fig.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-                    fig.update_layout(
-                        height=300,
-                        paper_bgcolor='#FFFFFF',
-                        plot_bgcolor='#FAFBFC',
-                        showlegend=False,
-                        font=dict(color="#000000")
-                    )
-                    fig.update_xaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-
-                    fig.update_yaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-                    fig.update_yaxes(range=[0, df_comparativa['Puntaje'].max() + 10])
+                    fig = figura_barras_por_equipo(df_comparativa, 'Puntaje', sufijo='', margen=10)
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
                     st.markdown("**💰 Conversión por Equipo**")
-                    fig = px.bar(
-                        df_comparativa,
-                        x='Equipo',
-                        y='Conversión %',
-                        color='Conversión %',
-                        color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
-                        text='Conversión %'
-                    )
-                    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-                    fig.update_layout(
-                        height=300,
-                        paper_bgcolor='#FFFFFF',
-                        plot_bgcolor='#FAFBFC',
-                        showlegend=False,
-                        font=dict(color="#000000")
-                    )
-                    fig.update_xaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-
-                    fig.update_yaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-                    fig.update_yaxes(range=[0, df_comparativa['Conversión %'].max() + 5])
-
+                    fig = figura_barras_por_equipo(df_comparativa, 'Conversión %')
                     st.plotly_chart(fig, use_container_width=True)
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.markdown("**🏠 Oferta de Fibra por Equipo**")
-                    fig = px.bar(
-                        df_comparativa,
-                        x='Equipo',
-                        y='Ofrece Fibra %',
-                        color='Ofrece Fibra %',
-                        color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
-                        text='Ofrece Fibra %'
-                    )
-                    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-                    fig.update_layout(
-                        height=300,
-                        paper_bgcolor='#FFFFFF',
-                        plot_bgcolor='#FAFBFC',
-                        showlegend=False,
-                        font=dict(color="#000000")
-                    )
-                    fig.update_xaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-
-                    fig.update_yaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-                    fig.update_yaxes(range=[0, df_comparativa['Ofrece Fibra %'].max() + 5])
-
+                    fig = figura_barras_por_equipo(df_comparativa, 'Ofrece Fibra %')
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
                     st.markdown("**📱 Oferta de Planes por Equipo**")
-                    fig = px.bar(
-                        df_comparativa,
-                        x='Equipo',
-                        y='Ofrece Plan %',
-                        color='Ofrece Plan %',
-                        color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
-                        text='Ofrece Plan %'
-                    )
-                    fig.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-                    fig.update_layout(
-                        height=300,
-                        paper_bgcolor='#FFFFFF',
-                        plot_bgcolor='#FAFBFC',
-                        showlegend=False,
-                        font=dict(color="#000000")
-                    )
-                    fig.update_xaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-
-                    fig.update_yaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-                    fig.update_yaxes(range=[0, df_comparativa['Ofrece Plan %'].max() + 5])
-
+                    fig = figura_barras_por_equipo(df_comparativa, 'Ofrece Plan %')
                     st.plotly_chart(fig, use_container_width=True)
             
             # Gráfico radar comparativo
@@ -5905,6 +7193,11 @@ def pagina_evaluaciones_gemini(datos):
     
     df = datos['evaluaciones_gemini_df'].copy()
     
+    # Recorte del cubo de métricas equivalente a los filtros que siguen: los
+    # indicadores agregados se leen del cubo y las filas quedan para el detalle
+    cubo = obtener_cubo_evaluaciones()
+    alcance_cubo = {'equipos': [e for e in cubo['equipo'].unique() if e != "Sin Equipo"]}
+    
     # =========================================================================
     # APLICAR FILTRO DE FECHAS DESDE SIDEBAR
     # =========================================================================
@@ -5915,6 +7208,8 @@ def pagina_evaluaciones_gemini(datos):
         # Convertir fechas del filtro a datetime para comparación
         fecha_inicio_dt = pd.to_datetime(fecha_inicio_filtro)
         fecha_fin_dt = pd.to_datetime(fecha_fin_filtro)
+        alcance_cubo['fecha_inicio'] = fecha_inicio_dt
+        alcance_cubo['fecha_fin'] = fecha_fin_dt
         
         df_original_len = len(df)
         df = df[(df['fecha_llamada'] >= fecha_inicio_dt) & (df['fecha_llamada'] <= fecha_fin_dt)]
@@ -5928,27 +7223,10 @@ def pagina_evaluaciones_gemini(datos):
     
     # Aplicar mapeo de nombres a todo el dataframe (usando función global)
     if 'agente' in df.columns:
-        df['agente'] = df['agente'].apply(obtener_nombre_agente)
-    
-    # Crear mapeo inverso: nombre -> equipo
-    nombre_a_equipo = {}
-    for equipo, vendedores in equipos_vendedores.items():
-        for vendedor in vendedores:
-            nombre_a_equipo[vendedor.lower().strip()] = equipo
-    
-    def obtener_equipo_por_nombre(nombre):
-        if pd.isna(nombre) or nombre is None:
-            return "Sin Equipo"
-        nombre_lower = str(nombre).lower().strip()
-        if nombre_lower in nombre_a_equipo:
-            return nombre_a_equipo[nombre_lower]
-        for nom, eq in nombre_a_equipo.items():
-            if nombre_lower in nom or nom in nombre_lower:
-                return eq
-        return "Sin Equipo"
+        df['agente'] = resolver_nombres_agentes(df['agente'])
     
     # Agregar columna de equipo
-    df['equipo'] = df['agente'].apply(obtener_equipo_por_nombre)
+    df['equipo'] = resolver_equipos(df['agente'])
     
     # Filtrar vendedores sin equipo
     df = df[df['equipo'] != "Sin Equipo"]
@@ -5959,7 +7237,8 @@ def pagina_evaluaciones_gemini(datos):
     if permisos['rol'] == 'vendedor':
         # Vendedor: Filtrar solo sus datos
         nombre_vendedor = permisos['nombre_usuario'].lower()
-        df = df[df['agente'].apply(lambda x: nombre_vendedor in str(x).lower() if pd.notna(x) else False)]
+        df = df[mascara_vendedor(df['agente'], nombre_vendedor)]
+        alcance_cubo['agentes'] = [a for a in cubo['agente'].unique() if nombre_vendedor in a.lower()]
         equipo_usuario = permisos['equipo'] if permisos['equipo'] else "Sin Equipo"
         st.info(f"👤 Mostrando evaluaciones de: **{permisos['nombre_usuario']}** | Equipo: **{equipo_usuario}**")
         
@@ -5967,6 +7246,7 @@ def pagina_evaluaciones_gemini(datos):
         # Supervisor con equipo: Filtrar solo su equipo
         equipo_supervisor = permisos['equipos_permitidos'][0]
         df = df[df['equipo'] == equipo_supervisor]
+        alcance_cubo['equipos'] = [equipo_supervisor]
         st.info(f"🏢 Mostrando evaluaciones del equipo: **{equipo_supervisor}**")
     
     # Definir criterios y nombres
@@ -6007,13 +7287,9 @@ def pagina_evaluaciones_gemini(datos):
         # =============================================================================
         st.markdown('<p class="section-header">📈 Indicadores de Evaluación</p>', unsafe_allow_html=True)
         
-        total = len(df)
-        puntaje_promedio = df['puntaje_total'].mean()
-        
-        # Clasificar por rangos de puntaje
-        df['rango_puntaje'] = pd.cut(df['puntaje_total'], 
-                                      bins=[-1, 20, 40, 60, 80, 100],
-                                      labels=['Crítico (0-20)', 'Bajo (21-40)', 'Regular (41-60)', 'Bueno (61-80)', 'Excelente (81-100)'])
+        resumen_cubo = consultar_cubo(cubo, **alcance_cubo)
+        total = int(resumen_cubo['n'])
+        puntaje_promedio = resumen_cubo['prom_puntaje_total']
         
         col1, col2, col3, col4, col5 = st.columns(5)
         
@@ -6023,13 +7299,13 @@ def pagina_evaluaciones_gemini(datos):
             color = "🔴" if puntaje_promedio < 40 else "🟡" if puntaje_promedio < 60 else "🟢"
             st.metric(f"{color} Índice de Calidad", f"{puntaje_promedio:.1f}/100")
         with col3:
-            excelentes = (df['rango_puntaje'] == 'Excelente (81-100)').sum()
+            excelentes = int(resumen_cubo['n_excelente'])
             st.metric("🌟 Rendimiento Excelente", f"{excelentes:,} ({excelentes/total*100:.1f}%)")
         with col4:
-            criticos = len(df[df['puntaje_total'] <= 20])
+            criticos = int(resumen_cubo['n_critico'])
             st.metric("🔴 Requieren Atención", f"{criticos:,} ({criticos/total*100:.1f}%)")
         with col5:
-            cero = len(df[df['puntaje_total'] == 0])
+            cero = int(resumen_cubo['n_cero'])
             st.metric("⚠️ Sin Evaluación", f"{cero:,} ({cero/total*100:.1f}%)")
         
         # Gráfico de torta - Distribución por Rango
@@ -6037,21 +7313,26 @@ def pagina_evaluaciones_gemini(datos):
         col1, col2, col3 = st.columns([1, 2, 1])
         
         with col2:
-            rango_counts = df['rango_puntaje'].value_counts()
-            fig = px.pie(
-                values=rango_counts.values,
-                names=rango_counts.index,
-                title="Distribución por Rango de Desempeño",
-                color_discrete_sequence=['#E74C3C', '#F39C12', '#F1C40F', '#27AE60', '#2ECC71']
-            )
-            fig.update_layout(
-                height=350, 
-                paper_bgcolor='#FFFFFF',
-                font=dict(color='#1E293B', size=13),
-                title_font=dict(color='#1E3A5F', size=16, family='Arial Black'),
-                legend=dict(font=dict(color='#1E293B', size=12))
-            )
-            fig.update_traces(textinfo="none")
+            rango_counts = pd.Series(
+                {etiqueta: int(resumen_cubo[columna]) for columna, etiqueta, _, _ in RANGOS_PUNTAJE}
+            ).sort_values(ascending=False, kind='stable')
+            def _construir():
+                fig = px.pie(
+                    values=rango_counts.values,
+                    names=rango_counts.index,
+                    title="Distribución por Rango de Desempeño",
+                    color_discrete_sequence=['#E74C3C', '#F39C12', '#F1C40F', '#27AE60', '#2ECC71']
+                )
+                fig.update_layout(
+                    height=350, 
+                    paper_bgcolor='#FFFFFF',
+                    font=dict(color='#1E293B', size=13),
+                    title_font=dict(color='#1E3A5F', size=16, family='Arial Black'),
+                    legend=dict(font=dict(color='#1E293B', size=12))
+                )
+                fig.update_traces(textinfo="none")
+                return fig
+            fig = figura_cacheada('pie_rangos_puntaje', rango_counts, _construir)
             st.plotly_chart(fig, use_container_width=True)
         
         # Ranking de agentes resumen
@@ -6059,9 +7340,7 @@ def pagina_evaluaciones_gemini(datos):
         st.markdown('<p class="section-header">👥 Ranking de Rendimiento por Vendedor</p>', unsafe_allow_html=True)
         
         if 'agente' in df.columns:
-            df_agentes_resumen = df.groupby('agente').agg({
-                'puntaje_total': ['mean', 'count']
-            }).round(1)
+            df_agentes_resumen = consultar_cubo(cubo, por='agente', **alcance_cubo)[['prom_puntaje_total', 'n_puntaje_total']].round(1)
             df_agentes_resumen.columns = ['Puntaje_Prom', 'Evaluaciones']
             df_agentes_resumen = df_agentes_resumen.reset_index()
             df_agentes_resumen = df_agentes_resumen[df_agentes_resumen['Evaluaciones'] >= 5]
@@ -6071,47 +7350,53 @@ def pagina_evaluaciones_gemini(datos):
             with col1:
                 st.markdown("**🏆 Top 10 - Mejor Rendimiento:**")
                 top_10 = df_agentes_resumen.nlargest(10, 'Puntaje_Prom')
-                fig = px.bar(
-                    top_10,
-                    x='Puntaje_Prom',
-                    y='agente',
-                    orientation='h',
-                    text='Puntaje_Prom'
-                )
-                fig.update_traces(marker_color="#27AE60", texttemplate='%{text:.1f}', textposition='outside', textfont=dict(color='#1E293B', size=11))
-                fig.update_layout(
-                    height=350, 
-                    paper_bgcolor='#FFFFFF', 
-                    plot_bgcolor='#FAFBFC',
-                    showlegend=False,
-                    yaxis={'categoryorder': 'total ascending'},
-                    font=dict(color='#1E293B', size=11)
-                )
-                fig.update_xaxes(range=[0, 100], tickfont=dict(color='#1E293B', size=10))
-                fig.update_yaxes(tickfont=dict(color='#1E293B', size=10))
+                def _construir():
+                    fig = px.bar(
+                        top_10,
+                        x='Puntaje_Prom',
+                        y='agente',
+                        orientation='h',
+                        text='Puntaje_Prom'
+                    )
+                    fig.update_traces(marker_color="#27AE60", texttemplate='%{text:.1f}', textposition='outside', textfont=dict(color='#1E293B', size=11))
+                    fig.update_layout(
+                        height=350, 
+                        paper_bgcolor='#FFFFFF', 
+                        plot_bgcolor='#FAFBFC',
+                        showlegend=False,
+                        yaxis={'categoryorder': 'total ascending'},
+                        font=dict(color='#1E293B', size=11)
+                    )
+                    fig.update_xaxes(range=[0, 100], tickfont=dict(color='#1E293B', size=10))
+                    fig.update_yaxes(tickfont=dict(color='#1E293B', size=10))
+                    return fig
+                fig = figura_cacheada('barras_top_agentes', top_10, _construir)
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 st.markdown("**⚠️ Requieren Plan de Mejora:**")
                 bottom_10 = df_agentes_resumen.nsmallest(10, 'Puntaje_Prom')
-                fig = px.bar(
-                    bottom_10,
-                    x='Puntaje_Prom',
-                    y='agente',
-                    orientation='h',
-                    text='Puntaje_Prom'
-                )
-                fig.update_traces(marker_color="#E74C3C", texttemplate='%{text:.1f}', textposition='outside', textfont=dict(color='#1E293B', size=11))
-                fig.update_layout(
-                    height=350, 
-                    paper_bgcolor='#FFFFFF', 
-                    plot_bgcolor='#FAFBFC',
-                    showlegend=False,
-                    yaxis={'categoryorder': 'total descending'},
-                    font=dict(color='#1E293B', size=11)
-                )
-                fig.update_xaxes(range=[0, 100], tickfont=dict(color='#1E293B', size=10))
-                fig.update_yaxes(tickfont=dict(color='#1E293B', size=10))
+                def _construir():
+                    fig = px.bar(
+                        bottom_10,
+                        x='Puntaje_Prom',
+                        y='agente',
+                        orientation='h',
+                        text='Puntaje_Prom'
+                    )
+                    fig.update_traces(marker_color="#E74C3C", texttemplate='%{text:.1f}', textposition='outside', textfont=dict(color='#1E293B', size=11))
+                    fig.update_layout(
+                        height=350, 
+                        paper_bgcolor='#FFFFFF', 
+                        plot_bgcolor='#FAFBFC',
+                        showlegend=False,
+                        yaxis={'categoryorder': 'total descending'},
+                        font=dict(color='#1E293B', size=11)
+                    )
+                    fig.update_xaxes(range=[0, 100], tickfont=dict(color='#1E293B', size=10))
+                    fig.update_yaxes(tickfont=dict(color='#1E293B', size=10))
+                    return fig
+                fig = figura_cacheada('barras_bottom_agentes', bottom_10, _construir)
                 st.plotly_chart(fig, use_container_width=True)
             
             # =============================================================================
@@ -6121,8 +7406,8 @@ def pagina_evaluaciones_gemini(datos):
             # Calcular promedios por criterio
             promedios = {}
             for c in criterios:
-                if c in df.columns:
-                    promedios[criterios_nombres.get(c, c)] = pd.to_numeric(df[c], errors="coerce").mean()
+                if f'prom_{c}' in resumen_cubo:
+                    promedios[criterios_nombres.get(c, c)] = resumen_cubo[f'prom_{c}']
 
             if promedios:
                 df_criterios = pd.DataFrame({
@@ -6133,37 +7418,40 @@ def pagina_evaluaciones_gemini(datos):
                 col1, col2 = st.columns([2, 1])
 
                 with col1:
-                    fig = px.bar(
-                        df_criterios,
-                        y='Criterio',
-                        x='Puntaje',
-                        orientation='h',
-                        title="Puntaje Promedio por Criterio",
-                        color='Puntaje',
-                        color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
-                        range_color=[0, 100]
-                    )
-                    fig.update_layout(
-                        height=450,
-                        paper_bgcolor='#FFFFFF',
-                        plot_bgcolor='#FFFFFF',
-                        showlegend=False,
-                        font=dict(color="#000000"),
-                        title=dict(
-                            text="Puntaje Promedio por Criterio",
-                            font=dict(color="#000000", size=16)
-                        )  
-                    )
-                    fig.update_xaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-                    fig.update_yaxes(
-                        tickfont=dict(color="#000000"),
-                        title=dict(font=dict(color="#000000"))
-                    )
-
-                    fig.add_vline(x=50, line_dash="dash", line_color="gray", annotation_text="Meta: 50")
+                    def _construir():
+                        fig = px.bar(
+                            df_criterios,
+                            y='Criterio',
+                            x='Puntaje',
+                            orientation='h',
+                            title="Puntaje Promedio por Criterio",
+                            color='Puntaje',
+                            color_continuous_scale=['#E74C3C', '#F39C12', '#27AE60'],
+                            range_color=[0, 100]
+                        )
+                        fig.update_layout(
+                            height=450,
+                            paper_bgcolor='#FFFFFF',
+                            plot_bgcolor='#FFFFFF',
+                            showlegend=False,
+                            font=dict(color="#000000"),
+                            title=dict(
+                                text="Puntaje Promedio por Criterio",
+                                font=dict(color="#000000", size=16)
+                            )  
+                        )
+                        fig.update_xaxes(
+                            tickfont=dict(color="#000000"),
+                            title=dict(font=dict(color="#000000"))
+                        )
+                        fig.update_yaxes(
+                            tickfont=dict(color="#000000"),
+                            title=dict(font=dict(color="#000000"))
+                        )
+                        
+                        fig.add_vline(x=50, line_dash="dash", line_color="gray", annotation_text="Meta: 50")
+                        return fig
+                    fig = figura_cacheada('barras_criterios_promedio', df_criterios, _construir)
                     st.plotly_chart(fig, use_container_width=True)
 
                 with col2:
@@ -6176,115 +7464,51 @@ def pagina_evaluaciones_gemini(datos):
             # ÁREAS DE MEJORA (RESERVADO)
             # =============================================================================
 
-            def _normalizar_area(texto):
-                import re
-                import unicodedata
-
-                texto = str(texto).strip().lower()
-                texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
-                texto = re.sub(r'[^a-z0-9\s]', ' ', texto)
-                texto = re.sub(r'\s+', ' ', texto).strip()
-                return texto
-
-            def _mapear_area(texto):
-                normalizada = _normalizar_area(texto)
-                excluir = {
-                    _normalizar_area('Completar el proceso de cierre'),
-                    _normalizar_area('Realizar preguntas para detectar las necesidades del cliente'),
-                    _normalizar_area('Resolucion de problemas'),
-                    _normalizar_area('Presentacion inicial'),
-                    _normalizar_area('Profundizar en la deteccion de necesidades'),
-                    _normalizar_area('Mejorar la presentacion inicial')
-                }
-                if normalizada in excluir:
-                    return None
-                mapa = {
-                    'saludo y presentacion': 'Saludo y Presentación',
-                    'presentacion y saludo': 'Saludo y Presentación',
-                    'presentacion y saludo inicial': 'Saludo y Presentación',
-                    'presentacion': 'Saludo y Presentación',
-                    'saludo': 'Saludo y Presentación',
-                    'identificacion cliente': 'Identificación del Cliente',
-                    'identificacion del cliente': 'Identificación del Cliente',
-                    'deteccion necesidades': 'Detección de Necesidades',
-                    'deteccion de necesidades': 'Detección de Necesidades',
-                    'deteccion de necesidades del cliente': 'Detección de Necesidades',
-                    'manejo de objeciones': 'Manejo de Objeciones',
-                    'oferta de productos': 'Oferta de Productos',
-                    'ofrecer productos adicionales': 'Oferta de Productos',
-                    'presentacion y oferta de productos': 'Oferta de Productos',
-                    'cierre de ventas': 'Cierre de Venta',
-                    'cierre de venta': 'Cierre de Venta',
-                    'cierre de la venta': 'Cierre de Venta',
-                    'cierre': 'Cierre de Venta',
-                    'resolucion problemas': 'Resolución de Problemas',
-                    'resolucion de problemas': 'Resolución de Problemas',
-                    'empatia': 'Empatía',
-                    'despedida': 'Despedida',
-                    'proactividad': 'Proactividad',
-                    'proactividad ofrecer fibra': 'Proactividad',
-                    'proactividad en la oferta de productos': 'Proactividad'
-                }
-                return mapa.get(normalizada, texto.strip())
-
             if 'areas_mejora' in df.columns:
-                from collections import Counter
-                all_areas = []
-
-                for areas in df['areas_mejora'].dropna():
-                    if isinstance(areas, str):
-                        areas_unicas = set()  # Usar set para evitar duplicados por fila
-                        for area in areas.split(','):
-                            area = area.strip().strip('"').strip("'").strip('[').strip(']').strip()
-                            if area:
-                                area_mapeada = _mapear_area(area)
-                                if area_mapeada:
-                                    area_norm = _normalizar_area(area_mapeada)
-                                    if area_norm not in areas_unicas:
-                                        areas_unicas.add(area_norm)
-                                        all_areas.append(area_mapeada)
-
-                if all_areas:
-                    area_counts = Counter(all_areas)
-                    top_areas = area_counts.most_common(15)
-
-                    total = sum(area_counts.values())
+                conteo_areas = contar_areas(obtener_indice_areas(datos['versiones_fuentes'].get('evaluaciones_gemini_df')), df.index)
+
+                if len(conteo_areas) > 0:
+                    top_areas = list(conteo_areas.head(15).itertuples(index=False, name=None))
+
+                    total = int(conteo_areas['Frecuencia'].sum())
 
                     col1, col2 = st.columns([2, 1])
 
                     with col1:
                         df_areas = pd.DataFrame(top_areas, columns=['Área', 'Frecuencia'])
-                        fig = px.bar(
-                            df_areas,
-                            x='Frecuencia',
-                            y='Área',
-                            orientation='h',
-                            title="Top 15 Áreas de Mejora Identificadas",
-                            color='Frecuencia',
-                            color_continuous_scale='Reds',
-                            range_color=[0, df_areas['Frecuencia'].max()]
-                        )
-                        fig.update_layout(
-                            height=450,
-                            paper_bgcolor='#FFFFFF',
-                            plot_bgcolor='#FFFFFF',
-                            yaxis={'categoryorder': 'total ascending'},
-                            title=dict(
-                              text="Top 15 Áreas de Mejora Identificadas",
-                                font=dict(color="#000000", size=16)
+                        def _construir():
+                            fig = px.bar(
+                                df_areas,
+                                x='Frecuencia',
+                                y='Área',
+                                orientation='h',
+                                title="Top 15 Áreas de Mejora Identificadas",
+                                color='Frecuencia',
+                                color_continuous_scale='Reds',
+                                range_color=[0, df_areas['Frecuencia'].max()]
+                            )
+                            fig.update_layout(
+                                height=450,
+                                paper_bgcolor='#FFFFFF',
+                                plot_bgcolor='#FFFFFF',
+                                yaxis={'categoryorder': 'total ascending'},
+                                title=dict(
+                                  text="Top 15 Áreas de Mejora Identificadas",
+                                    font=dict(color="#000000", size=16)
+                                )
+                            )
+                            
+                            fig.update_xaxes(
+                                tickfont=dict(color="#000000"),
+                                title=dict(font=dict(color="#000000"))
+                            )
+                            
+                            fig.update_yaxes(
+                                tickfont=dict(color="#000000"),
+                                title=dict(font=dict(color="#000000"))
                             )
-                        )
-                        
-                        fig.update_xaxes(
-                            tickfont=dict(color="#000000"),
-                            title=dict(font=dict(color="#000000"))
-                        )
-
-                        fig.update_yaxes(
-                            tickfont=dict(color="#000000"),
-                            title=dict(font=dict(color="#000000"))
-                        )
-                        
+                            return fig
+                        fig = figura_cacheada('barras_areas_mejora', df_areas, _construir)
                         st.plotly_chart(fig, use_container_width=True)
 
                     with col2:
@@ -6401,10 +7625,16 @@ def pagina_evaluaciones_gemini(datos):
                         color_comparacion = "#DC2626"
                 
                     # Calcular valores del agente seleccionado
+                    def _promedios_criterios(**recorte):
+                        """Promedio de cada criterio en un recorte del cubo (0 si no hay evaluaciones)"""
+                        fila = consultar_cubo(cubo, **{**alcance_cubo, **recorte})
+                        return [fila[f'prom_{c}'] if f'prom_{c}' in fila and fila['n'] > 0 else 0 for c in criterios]
+                    
                     criterios_agente = {}
+                    fila_agente = consultar_cubo(cubo, **{**alcance_cubo, 'agentes': [agente_seleccionado]})
                     for c in criterios:
-                        if c in df_agente.columns:
-                            criterios_agente[criterios_nombres.get(c, c)] = df_agente[c].mean()
+                        if f'prom_{c}' in fila_agente:
+                            criterios_agente[criterios_nombres.get(c, c)] = fila_agente[f'prom_{c}']
                     
                     if criterios_agente:
                         categories = list(criterios_agente.keys())
@@ -6412,23 +7642,21 @@ def pagina_evaluaciones_gemini(datos):
                         
                         # Calcular valores de comparación según la selección
                         if tipo_comparacion == "Promedio General (Todos)":
-                            valores_comparacion = [df[c].mean() if c in df.columns else 0 for c in criterios]
+                            valores_comparacion = _promedios_criterios()
                         elif tipo_comparacion == "Un Equipo Específico" and 'equipo_seleccionado' in dir() and equipo_seleccionado:
                             # Filtrar por equipo
                             agentes_equipo = equipos_vendedores.get(equipo_seleccionado, [])
                             if agentes_equipo:
-                                df_equipo = df[df['agente'].isin(agentes_equipo)]
-                                valores_comparacion = [df_equipo[c].mean() if c in df_equipo.columns and len(df_equipo) > 0 else 0 for c in criterios]
+                                valores_comparacion = _promedios_criterios(agentes=agentes_equipo)
                             else:
-                                valores_comparacion = [df[c].mean() if c in df.columns else 0 for c in criterios]
+                                valores_comparacion = _promedios_criterios()
                         elif tipo_comparacion == "Otro Vendedor" and 'agente_comparar' in dir() and agente_comparar:
-                            df_otro = df[df['agente'] == agente_comparar]
-                            valores_comparacion = [df_otro[c].mean() if c in df_otro.columns and len(df_otro) > 0 else 0 for c in criterios]
+                            valores_comparacion = _promedios_criterios(agentes=[agente_comparar])
                         elif tipo_comparacion == "Promedio del Equipo":
-                            # Supervisor: Comparar con promedio de su propio equipo (ya filtrado en df)
-                            valores_comparacion = [df[c].mean() if c in df.columns else 0 for c in criterios]
+                            # Supervisor: Comparar con promedio de su propio equipo (ya acotado en alcance_cubo)
+                            valores_comparacion = _promedios_criterios()
                         else:
-                            valores_comparacion = [df[c].mean() if c in df.columns else 0 for c in criterios]
+                            valores_comparacion = _promedios_criterios()
                     
                     # Crear DataFrame para el gráfico
                     df_comparativo = pd.DataFrame({
@@ -6450,98 +7678,100 @@ def pagina_evaluaciones_gemini(datos):
                     </p>
                     """, unsafe_allow_html=True)
                     
-                    fig = go.Figure()
-                    
-                    # Barras de Comparación (siempre ROJAS)
-                    fig.add_trace(go.Bar(
-                        y=df_comparativo['Criterio'],
-                        x=df_comparativo['Comparacion'],
-                        name=nombre_comparacion,
-                        orientation='h',
-                        marker=dict(
-                            color='#DC2626',
-                            line=dict(color='#991B1B', width=1.5)
-                        ),
-                        text=[f"{v:.1f}" for v in df_comparativo['Comparacion']],
-                        textposition='inside',
-                        textfont=dict(color='white', size=14, family='Arial Black'),
-                        hovertemplate='<b>%{y}</b><br>' + nombre_comparacion + ': %{x:.1f}<extra></extra>'
-                    ))
-                    
-                    # Barras del Vendedor (azules, adelante)
-                    fig.add_trace(go.Bar(
-                        y=df_comparativo['Criterio'],
-                        x=df_comparativo['Vendedor'],
-                        name=agente_seleccionado,
-                        orientation='h',
-                        marker=dict(
-                            color='#3B82F6',
-                            line=dict(color='#1E40AF', width=1.5)
-                        ),
-                        text=[f"{v:.1f}" for v in df_comparativo['Vendedor']],
-                        textposition='inside',
-                        textfont=dict(color='white', size=14, family='Arial Black'),
-                        hovertemplate='<b>%{y}</b><br>' + agente_seleccionado + ': %{x:.1f}<extra></extra>'
-                    ))
-                    
-                    # Línea de meta (80 = excelente)
-                    fig.add_vline(
-                        x=80, 
-                        line_dash="dot", 
-                        line_color="#10B981",
-                        line_width=3,
-                        annotation_text="Meta: 80",
-                        annotation_position="top",
-                        annotation_font=dict(size=14, color="#10B981", family="Arial Black")
-                    )
-                    
-                    # Línea de promedio
-                    fig.add_vline(
-                        x=50, 
-                        line_dash="dash", 
-                        line_color="#94A3B8",
-                        line_width=1,
-                        annotation_text="50",
-                        annotation_position="bottom",
-                        annotation_font=dict(size=10, color="#94A3B8")
-                    )
-                    
-                    fig.update_layout(
-                        barmode='group',
-                        height=700,  # Mucho más grande
-                        paper_bgcolor='#FFFFFF',
-                        plot_bgcolor='#FAFBFC',
-                        font=dict(family="Arial, sans-serif", size=14, color='#1E293B'),
-                        xaxis=dict(
-                            title=dict(text="Puntaje (0-100)", font=dict(size=16, color='#1E293B', family='Arial Black')),
-                            gridcolor='#E2E8F0',
-                            tickfont=dict(size=14, color='#475569'),
-                            range=[0, 105],
-                            dtick=10,
-                            showgrid=True,
-                            gridwidth=1
-                        ),
-                        yaxis=dict(
-                            title=dict(text="", font=dict(size=14)),
-                            tickfont=dict(size=15, color='#1E293B', family='Arial'),
-                            showgrid=False
-                        ),
-                        legend=dict(
-                            orientation="h",
-                            yanchor="bottom",
-                            y=1.02,
-                            xanchor="center",
-                            x=0.5,
-                            font=dict(size=15),
-                            bgcolor='rgba(255,255,255,0.9)',
-                            bordercolor='#E2E8F0',
-                            borderwidth=1
-                        ),
-                        margin=dict(t=80, b=60, l=150, r=50),
-                        bargap=0.3,
-                        bargroupgap=0.15
-                    )
-                    
+                    def _construir():
+                        fig = go.Figure()
+                        
+                        # Barras de Comparación (siempre ROJAS)
+                        fig.add_trace(go.Bar(
+                            y=df_comparativo['Criterio'],
+                            x=df_comparativo['Comparacion'],
+                            name=nombre_comparacion,
+                            orientation='h',
+                            marker=dict(
+                                color='#DC2626',
+                                line=dict(color='#991B1B', width=1.5)
+                            ),
+                            text=[f"{v:.1f}" for v in df_comparativo['Comparacion']],
+                            textposition='inside',
+                            textfont=dict(color='white', size=14, family='Arial Black'),
+                            hovertemplate='<b>%{y}</b><br>' + nombre_comparacion + ': %{x:.1f}<extra></extra>'
+                        ))
+                        
+                        # Barras del Vendedor (azules, adelante)
+                        fig.add_trace(go.Bar(
+                            y=df_comparativo['Criterio'],
+                            x=df_comparativo['Vendedor'],
+                            name=agente_seleccionado,
+                            orientation='h',
+                            marker=dict(
+                                color='#3B82F6',
+                                line=dict(color='#1E40AF', width=1.5)
+                            ),
+                            text=[f"{v:.1f}" for v in df_comparativo['Vendedor']],
+                            textposition='inside',
+                            textfont=dict(color='white', size=14, family='Arial Black'),
+                            hovertemplate='<b>%{y}</b><br>' + agente_seleccionado + ': %{x:.1f}<extra></extra>'
+                        ))
+                        
+                        # Línea de meta (80 = excelente)
+                        fig.add_vline(
+                            x=80, 
+                            line_dash="dot", 
+                            line_color="#10B981",
+                            line_width=3,
+                            annotation_text="Meta: 80",
+                            annotation_position="top",
+                            annotation_font=dict(size=14, color="#10B981", family="Arial Black")
+                        )
+                        
+                        # Línea de promedio
+                        fig.add_vline(
+                            x=50, 
+                            line_dash="dash", 
+                            line_color="#94A3B8",
+                            line_width=1,
+                            annotation_text="50",
+                            annotation_position="bottom",
+                            annotation_font=dict(size=10, color="#94A3B8")
+                        )
+                        
+                        fig.update_layout(
+                            barmode='group',
+                            height=700,  # Mucho más grande
+                            paper_bgcolor='#FFFFFF',
+                            plot_bgcolor='#FAFBFC',
+                            font=dict(family="Arial, sans-serif", size=14, color='#1E293B'),
+                            xaxis=dict(
+                                title=dict(text="Puntaje (0-100)", font=dict(size=16, color='#1E293B', family='Arial Black')),
+                                gridcolor='#E2E8F0',
+                                tickfont=dict(size=14, color='#475569'),
+                                range=[0, 105],
+                                dtick=10,
+                                showgrid=True,
+                                gridwidth=1
+                            ),
+                            yaxis=dict(
+                                title=dict(text="", font=dict(size=14)),
+                                tickfont=dict(size=15, color='#1E293B', family='Arial'),
+                                showgrid=False
+                            ),
+                            legend=dict(
+                                orientation="h",
+                                yanchor="bottom",
+                                y=1.02,
+                                xanchor="center",
+                                x=0.5,
+                                font=dict(size=15),
+                                bgcolor='rgba(255,255,255,0.9)',
+                                bordercolor='#E2E8F0',
+                                borderwidth=1
+                            ),
+                            margin=dict(t=80, b=60, l=150, r=50),
+                            bargap=0.3,
+                            bargroupgap=0.15
+                        )
+                        return fig
+                    fig = figura_cacheada('comparativo_criterios', df_comparativo, _construir, agente=agente_seleccionado, comparacion=nombre_comparacion)
                     st.plotly_chart(fig, use_container_width=True)
                     
                     # Resumen de fortalezas y áreas de mejora
@@ -6627,8 +7857,10 @@ def pagina_evaluaciones_gemini(datos):
                     df_tabla = df_tabla.sort_values('⭐ Puntaje', ascending=False) if '⭐ Puntaje' in df_tabla.columns else df_tabla
                     
                     # Mostrar tabla con estilo
-                    st.dataframe(
-                        df_tabla.head(20), 
+                    tabla_paginada(
+                        df_tabla,
+                        key='tabla_eval_agente',
+                        filas_por_pagina=25,
                         use_container_width=True, 
                         hide_index=True, 
                         height=400,
@@ -6647,48 +7879,36 @@ def pagina_evaluaciones_gemini(datos):
                     st.markdown("---")
                     st.markdown("**🎯 Áreas de Mejora Recurrentes de Este Agente:**")
                     
-                    from collections import Counter
-                    areas_agente = []
-                    for areas in df_agente['areas_mejora'].dropna():
-                        if isinstance(areas, str):
-                            areas_unicas = set()  # Deduplicar por fila
-                            for area in areas.split(','):
-                                area = area.strip().strip('"').strip("'").strip('[').strip(']').strip()
-                                if area:
-                                    area_mapeada = _mapear_area(area)
-                                    if area_mapeada:
-                                        area_norm = _normalizar_area(area_mapeada)
-                                        if area_norm not in areas_unicas:
-                                            areas_unicas.add(area_norm)
-                                            areas_agente.append(area_mapeada)
+                    conteo_agente = contar_areas(obtener_indice_areas(datos['versiones_fuentes'].get('evaluaciones_gemini_df')), df_agente.index)
                     
-                    if areas_agente:
-                        area_counts = Counter(areas_agente)
-                        top_areas_agente = area_counts.most_common(10)
+                    if len(conteo_agente) > 0:
+                        top_areas_agente = list(conteo_agente.head(10).itertuples(index=False, name=None))
                         
                         col1, col2 = st.columns([2, 1])
                         with col1:
                             df_areas = pd.DataFrame(top_areas_agente, columns=['Área', 'Frecuencia'])
-                            fig = px.bar(
-                                df_areas,
-                                x='Frecuencia',
-                                y='Área',
-                                orientation='h'
-                            )
-                            fig.update_traces(marker_color="#F39C12")
-                            fig.update_layout(height=350, paper_bgcolor='#FFFFFF', 
-                                              yaxis={'categoryorder': 'total ascending'})
-                            
-                            fig.update_xaxes(
-                                tickfont=dict(color="#000000"),
-                                title=dict(font=dict(color="#000000"))
-                            )
-
-                            fig.update_yaxes(
-                                tickfont=dict(color="#000000"),
-                                title=dict(font=dict(color="#000000"))
-                            )
-                            
+                            def _construir():
+                                fig = px.bar(
+                                    df_areas,
+                                    x='Frecuencia',
+                                    y='Área',
+                                    orientation='h'
+                                )
+                                fig.update_traces(marker_color="#F39C12")
+                                fig.update_layout(height=350, paper_bgcolor='#FFFFFF', 
+                                                  yaxis={'categoryorder': 'total ascending'})
+                                
+                                fig.update_xaxes(
+                                    tickfont=dict(color="#000000"),
+                                    title=dict(font=dict(color="#000000"))
+                                )
+                                
+                                fig.update_yaxes(
+                                    tickfont=dict(color="#000000"),
+                                    title=dict(font=dict(color="#000000"))
+                                )
+                                return fig
+                            fig = figura_cacheada('barras_areas_agente', df_areas, _construir)
                             st.plotly_chart(fig, use_container_width=True)
 
                         with col2:
@@ -6740,8 +7960,11 @@ def pagina_evaluaciones_gemini(datos):
                                'cierre', 'oferta_productos', 'resumen']
             columnas_disponibles = [c for c in columnas_mostrar if c in df_filtrado.columns]
             
-            st.dataframe(
-                df_filtrado[columnas_disponibles].head(100),
+            tabla_paginada(
+                df_filtrado[columnas_disponibles],
+                key='tabla_exp',
+                filas_por_pagina=100,
+                nombre_csv=f"evaluaciones_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
                 use_container_width=True,
                 hide_index=True,
                 height=500
@@ -6755,7 +7978,7 @@ def pagina_evaluaciones_gemini(datos):
                 archivos_lista = df_filtrado['archivo'].tolist()[:50]
                 archivo_sel = st.selectbox("Selecciona un archivo:", archivos_lista, key='archivo_detalle')
                 
-                eval_sel = df_filtrado[df_filtrado['archivo'] == archivo_sel].iloc[0]
+                eval_sel = buscar_interaccion('evaluaciones_gemini_df', archivo_sel, df_filtrado)
                 
                 col1, col2 = st.columns(2)
                 
@@ -6809,8 +8032,11 @@ def pagina_evaluaciones_gemini(datos):
                                'cierre', 'oferta_productos', 'resumen']
             columnas_disponibles = [c for c in columnas_mostrar if c in df_filtrado.columns]
             
-            st.dataframe(
-                df_filtrado[columnas_disponibles].head(100),
+            tabla_paginada(
+                df_filtrado[columnas_disponibles],
+                key='tabla_exp_vendedor',
+                filas_por_pagina=100,
+                nombre_csv=f"mis_evaluaciones_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
                 use_container_width=True,
                 hide_index=True,
                 height=400
@@ -6823,7 +8049,7 @@ def pagina_evaluaciones_gemini(datos):
                 archivos_lista = df_filtrado['archivo'].tolist()[:50]
                 archivo_sel = st.selectbox("Selecciona un archivo:", archivos_lista, key='archivo_detalle_vendedor')
                 
-                eval_sel = df_filtrado[df_filtrado['archivo'] == archivo_sel].iloc[0]
+                eval_sel = buscar_interaccion('evaluaciones_gemini_df', archivo_sel, df_filtrado)
                 
                 col1, col2 = st.columns(2)
                 
@@ -6845,101 +8071,615 @@ def pagina_evaluaciones_gemini(datos):
 # SECCIÓN DE CALIDAD - ANÁLISIS DE LLAMADAS CALL CENTER
 # =============================================================================
 
+PATRON_DURACION = r'^(?:\s*([+-]?\d+)\s*:)?\s*([+-]?\d+)\s*:\s*([+-]?\d+)\s*$'
+
+
+def segundos_desde_duracion(valores):
+    """
+    Convierte una columna de duraciones (hh:mm:ss, mm:ss o numérica) a segundos
+    int32. Los valores vacíos o que no se pueden interpretar quedan en 0.
+    """
+    valores = pd.Series(valores)
+    texto = valores.astype('string')
+    partes = texto.str.extract(PATRON_DURACION).apply(pd.to_numeric)
+    con_separador = partes[2].notna()
+    segundos = (partes[0].fillna(0) * 3600 + partes[1] * 60 + partes[2]).where(con_separador)
+
+    numericos = pd.to_numeric(texto.where(~con_separador).str.strip(), errors='coerce')
+    numericos = np.trunc(numericos.where(np.isfinite(numericos)))
+    segundos = segundos.fillna(numericos).fillna(0)
+    return segundos.astype('int64').astype('int32')
+
+
+def _formatear_duracion(segundos, con_horas):
+    segundos = pd.to_numeric(pd.Series(segundos), errors='coerce')
+    vacios = segundos.isna() | (segundos == 0)
+    segundos = segundos.fillna(0)
+    if con_horas:
+        campos = [segundos // 3600, (segundos % 3600) // 60, segundos % 60]
+    else:
+        campos = [segundos // 60, segundos % 60]
+    texto = campos[0].astype('int64').astype(str).str.zfill(2)
+    for campo in campos[1:]:
+        texto = texto + ':' + campo.astype('int64').astype(str).str.zfill(2)
+    return texto.mask(vacios, '00:00:00' if con_horas else '00:00')
+
+
+def formatear_mmss(segundos):
+    """Convierte una columna de segundos a mm:ss"""
+    return _formatear_duracion(segundos, con_horas=False)
+
+
+def formatear_hhmmss(segundos):
+    """Convierte una columna de segundos a hh:mm:ss"""
+    return _formatear_duracion(segundos, con_horas=True)
+
+
+def turnos_desde_hora(horas_inicio):
+    """
+    Determina el turno (TM 6-14, TT 14-22, TN resto) para una columna de horas
+    de inicio, ya sean textos 'hh:mm[:ss]' o fechas/horas.
+    """
+    horas_inicio = pd.Series(horas_inicio)
+    if pd.api.types.is_datetime64_any_dtype(horas_inicio):
+        hora = horas_inicio.dt.hour
+    else:
+        es_texto = horas_inicio.map(type) == str
+        hora = pd.to_numeric(
+            horas_inicio.where(es_texto).str.split(':').str[0].str.strip(), errors='coerce'
+        )
+        hora = hora.where(hora == np.floor(hora))
+        otros = horas_inicio[~es_texto & horas_inicio.notna()]
+        if len(otros) > 0:
+            hora.loc[otros.index] = otros.map(lambda v: getattr(v, 'hour', np.nan))
+    hora = hora.astype('float64')
+    return pd.Series(np.select(
+        [(hora >= 6) & (hora < 14), (hora >= 14) & (hora < 22), hora.notna()],
+        ["TM", "TT", "TN"],  # Mañana, Tarde, Noche
+        default="Sin Turno"
+    ), index=horas_inicio.index)
+
+
 def to_seconds_calidad(dur_str):
     """Convierte hh:mm:ss a segundos para módulo de calidad"""
-    try:
-        if pd.isna(dur_str) or dur_str == '':
-            return 0
-        parts = str(dur_str).split(':')
-        if len(parts) == 3:
-            h, m, s = map(int, parts)
-            return h * 3600 + m * 60 + s
-        elif len(parts) == 2:
-            m, s = map(int, parts)
-            return m * 60 + s
-        else:
-            return int(float(dur_str))
-    except:
-        return 0
+    return int(segundos_desde_duracion([dur_str]).iloc[0])
 
 def sec_to_mmss(s):
     """Convierte segundos a mm:ss"""
-    if pd.isna(s) or s == 0:
-        return "00:00"
-    m = int(s // 60)
-    s = int(s % 60)
-    return f"{m:02d}:{s:02d}"
+    return formatear_mmss([s]).iloc[0]
 
 def sec_to_hhmmss(s):
     """Convierte segundos a hh:mm:ss"""
-    if pd.isna(s) or s == 0:
-        return "00:00:00"
-    h = int(s // 3600)
-    m = int((s % 3600) // 60)
-    sec = int(s % 60)
-    return f"{h:02d}:{m:02d}:{sec:02d}"
+    return formatear_hhmmss([s]).iloc[0]
 
 def determinar_turno(hora_inicio):
     """Determina el turno basado en la hora de inicio"""
-    try:
-        if pd.isna(hora_inicio):
-            return "Sin Turno"
-        if isinstance(hora_inicio, str):
-            hora = int(hora_inicio.split(':')[0])
+    return turnos_desde_hora(pd.Series([hora_inicio], dtype=object)).iloc[0]
+
+# Semáforos: cada tipo tiene reglas (operador, umbral, nivel, etiqueta) que se
+# evalúan en orden; si ninguna se cumple aplica 'base'. Los umbrales pueden
+# sobrescribirse sin tocar el código desde RUTA_UMBRALES_SEMAFORO, con la misma
+# forma bajo 'general', 'por_campana' y 'por_turno'.
+NIVELES_SEMAFORO = {
+    'verde': ("🟢", "#10B981"),
+    'amarillo': ("🟡", "#F59E0B"),
+    'rojo': ("🔴", "#DC2626"),
+    'na': ("⚪", "#6B7280"),
+}
+
+UMBRALES_SEMAFORO = {
+    'NO DISPONIBLE': {
+        'reglas': [['>=', 300, 'rojo', 'Crítico'],      # >= 5 min
+                   ['>=', 180, 'amarillo', 'Alerta']],  # 3-5 min
+        'base': ['verde', 'OK'],
+    },
+    'BREAK': {
+        'reglas': [['>=', 1500, 'rojo', 'Excedido'],    # >= 25 min
+                   ['>=', 1380, 'amarillo', 'Límite']], # 23-25 min
+        'base': ['verde', 'OK'],
+    },
+    'BAÑO': {
+        'reglas': [['>', 600, 'rojo', 'Excedido']],     # > 10 min
+        'base': ['verde', 'OK'],
+    },
+    'TIEMPO_LOGUEO': {
+        'reglas': [['<', 16800, 'rojo', 'Bajo'],        # < 4:40:00
+                   ['<', 17100, 'amarillo', 'Límite']], # 4:40:00 - 4:45:00
+        'base': ['verde', 'OK'],
+    },
+    'CUMPLIMIENTO': {
+        'reglas': [['>=', 90, 'verde', 'Cumplido'],
+                   ['>=', 60, 'amarillo', 'En Proceso']],
+        'base': ['rojo', 'Bajo'],
+    },
+}
+
+RUTA_UMBRALES_SEMAFORO = os.path.join(BASE_DIR, 'datos_calidad', 'umbrales_semaforo.json')
+
+OPERADORES_SEMAFORO = {
+    '>=': np.greater_equal,
+    '>': np.greater,
+    '<=': np.less_equal,
+    '<': np.less,
+}
+
+_CONFIG_UMBRALES = {'firma': None, 'config': {}}
+
+
+def umbral_valido(definicion):
+    """True si la definición tiene la forma {'reglas': [[op, umbral, nivel, etiqueta], ...], 'base': [nivel, etiqueta]}"""
+    if not isinstance(definicion, dict):
+        return False
+    reglas, base = definicion.get('reglas'), definicion.get('base')
+    if not isinstance(reglas, list) or not isinstance(base, list) or len(base) != 2:
+        return False
+    if base[0] not in NIVELES_SEMAFORO:
+        return False
+    for regla in reglas:
+        if not isinstance(regla, list) or len(regla) != 4:
+            return False
+        op, umbral, nivel, _ = regla
+        if op not in OPERADORES_SEMAFORO or nivel not in NIVELES_SEMAFORO:
+            return False
+        if isinstance(umbral, bool) or not isinstance(umbral, (int, float)):
+            return False
+    return True
+
+
+def _depurar_umbrales(seccion, origen):
+    """Deja sólo los tipos con definición válida; los demás quedan con el valor del código"""
+    if not isinstance(seccion, dict):
+        logger.warning("Umbrales de semáforo: '%s' no es un objeto, se ignora", origen)
+        return {}
+    validos = {}
+    for tipo, definicion in seccion.items():
+        if umbral_valido(definicion):
+            validos[tipo] = definicion
         else:
-            hora = hora_inicio.hour
-        
-        if 6 <= hora < 14:
-            return "TM"  # Turno Mañana
-        elif 14 <= hora < 22:
-            return "TT"  # Turno Tarde
+            logger.warning("Umbrales de semáforo: definición inválida para %s en '%s', se usa la del código", tipo, origen)
+    return validos
+
+
+def cargar_config_umbrales():
+    """Lee (y cachea por firma) el archivo de umbrales; sin archivo devuelve {}"""
+    firma = firma_archivo(RUTA_UMBRALES_SEMAFORO)
+    if firma != _CONFIG_UMBRALES['firma']:
+        config = {}
+        if firma is not None:
+            try:
+                with open(RUTA_UMBRALES_SEMAFORO, 'r', encoding='utf-8') as f:
+                    crudo = json.load(f)
+            except Exception:
+                logger.warning("Error leyendo umbrales de semáforo", exc_info=True)
+                crudo = {}
+            if not isinstance(crudo, dict):
+                logger.warning("Umbrales de semáforo: el archivo no es un objeto, se ignora")
+                crudo = {}
+            if 'general' in crudo:
+                config['general'] = _depurar_umbrales(crudo['general'], 'general')
+            for clave in ('por_campana', 'por_turno'):
+                if clave not in crudo:
+                    continue
+                if not isinstance(crudo[clave], dict):
+                    logger.warning("Umbrales de semáforo: '%s' no es un objeto, se ignora", clave)
+                    continue
+                config[clave] = {
+                    nombre: _depurar_umbrales(seccion, f"{clave}/{nombre}")
+                    for nombre, seccion in crudo[clave].items()
+                }
+        _CONFIG_UMBRALES['firma'] = firma
+        _CONFIG_UMBRALES['config'] = config
+    return _CONFIG_UMBRALES['config']
+
+
+def obtener_umbrales_semaforo(campana=None, turno=None):
+    """
+    Tabla de umbrales vigente: la del código, pisada por la sección 'general'
+    del archivo de configuración y luego por la de la campaña y el turno.
+    """
+    config = cargar_config_umbrales()
+    umbrales = dict(UMBRALES_SEMAFORO)
+    umbrales.update(config.get('general', {}))
+    if campana is not None:
+        umbrales.update(config.get('por_campana', {}).get(campana, {}))
+    if turno is not None:
+        umbrales.update(config.get('por_turno', {}).get(turno, {}))
+    return umbrales
+
+
+def clasificar_semaforo(valores, tipo_estado, umbrales=None):
+    """
+    Clasifica una columna de valores según el semáforo de tipo_estado.
+    Devuelve un DataFrame con las columnas 'emoji', 'color' y 'estado'.
+    """
+    valores = pd.to_numeric(pd.Series(valores), errors='coerce')
+    umbrales = obtener_umbrales_semaforo() if umbrales is None else umbrales
+    definicion = umbrales.get(tipo_estado)
+    if definicion is None:
+        reglas, (nivel_base, etiqueta_base) = [], ('na', 'N/A')
+    else:
+        reglas, (nivel_base, etiqueta_base) = definicion['reglas'], definicion['base']
+
+    numeros = valores.to_numpy(dtype='float64')
+    # La última condición (siempre verdadera) es el nivel base
+    condiciones = [OPERADORES_SEMAFORO[op](numeros, umbral) for op, umbral, _, _ in reglas]
+    condiciones.append(np.ones(len(numeros), dtype=bool))
+    niveles = [nivel for _, _, nivel, _ in reglas] + [nivel_base]
+    etiquetas = [etiqueta for _, _, _, etiqueta in reglas] + [etiqueta_base]
+    return pd.DataFrame({
+        'emoji': np.select(condiciones, [NIVELES_SEMAFORO[n][0] for n in niveles], ''),
+        'color': np.select(condiciones, [NIVELES_SEMAFORO[n][1] for n in niveles], ''),
+        'estado': np.select(condiciones, etiquetas, ''),
+    }, index=valores.index)
+
+
+def describir_umbrales(umbrales):
+    """Tabla legible de los umbrales de tiempo (columna por nivel de semáforo)"""
+    def formato(segundos):
+        return f"{sec_to_hhmmss(segundos)} hrs" if segundos >= 3600 else f"{sec_to_mmss(segundos)} min"
+
+    simbolos = {'>=': '≥', '>': '>', '<=': '≤', '<': '<'}
+    # El nivel base cubre lo que no toca ninguna regla: el complemento de la
+    # regla más amplia cuando todas apuntan en el mismo sentido.
+    complementos = {'>=': '<', '>': '<=', '<=': '>', '<': '>='}
+
+    def texto_base(reglas):
+        ops = {op for op, _, _, _ in reglas}
+        if ops and ops <= {'>=', '>'}:
+            op, umbral = min(((op, umbral) for op, umbral, _, _ in reglas), key=lambda r: (r[1], r[0] == '>'))
+        elif ops and ops <= {'<=', '<'}:
+            op, umbral = max(((op, umbral) for op, umbral, _, _ in reglas), key=lambda r: (r[1], r[0] == '<='))
         else:
-            return "TN"  # Turno Noche
-    except:
-        return "Sin Turno"
+            return 'resto'
+        return f"{simbolos[complementos[op]]} {formato(umbral)}"
+
+    filas = []
+    for tipo, definicion in umbrales.items():
+        if tipo == 'CUMPLIMIENTO':
+            continue
+        textos = {'rojo': [], 'amarillo': [], 'verde': []}
+        for op, umbral, nivel, _ in definicion['reglas']:
+            textos.setdefault(nivel, []).append(f"{simbolos[op]} {formato(umbral)}")
+        textos.setdefault(definicion['base'][0], []).append(texto_base(definicion['reglas']))
+        filas.append({
+            'Estado': tipo.replace('_', ' ').replace('TIEMPO LOGUEO', 'TIEMPO DE LOGUEO'),
+            '🔴 Rojo (Crítico)': ' / '.join(textos['rojo']) or '-',
+            '🟡 Amarillo (Alerta)': ' / '.join(textos['amarillo']) or '-',
+            '🟢 Verde (OK)': ' / '.join(textos['verde']) or '-',
+        })
+    return pd.DataFrame(filas)
+
 
 def aplicar_semaforo_tiempo(valor_segundos, tipo_estado):
     """Aplica semáforo según tipo de estado y valor"""
-    if tipo_estado == "NO DISPONIBLE":
-        if valor_segundos >= 300:  # >= 5 min
-            return "🔴", "#DC2626", "Crítico"
-        elif valor_segundos >= 180:  # 3-5 min
-            return "🟡", "#F59E0B", "Alerta"
-        else:
-            return "🟢", "#10B981", "OK"
-    
-    elif tipo_estado == "BREAK":
-        if valor_segundos >= 1500:  # >= 25 min
-            return "🔴", "#DC2626", "Excedido"
-        elif valor_segundos >= 1380:  # 23-25 min
-            return "🟡", "#F59E0B", "Límite"
-        else:
-            return "🟢", "#10B981", "OK"
-    
-    elif tipo_estado == "BAÑO":
-        if valor_segundos > 600:  # > 10 min
-            return "🔴", "#DC2626", "Excedido"
-        else:
-            return "🟢", "#10B981", "OK"
-    
-    elif tipo_estado == "TIEMPO_LOGUEO":
-        if valor_segundos < 16800:  # < 4:40:00
-            return "🔴", "#DC2626", "Bajo"
-        elif valor_segundos < 17100:  # 4:40:00 - 4:45:00
-            return "🟡", "#F59E0B", "Límite"
-        else:
-            return "🟢", "#10B981", "OK"
-    
-    return "⚪", "#6B7280", "N/A"
+    return tuple(clasificar_semaforo([valor_segundos], tipo_estado).iloc[0])
 
 def aplicar_semaforo_cumplimiento(porcentaje):
     """Aplica semáforo de cumplimiento de ventas"""
-    if porcentaje >= 90:
-        return "🟢", "#10B981", "Cumplido"
-    elif porcentaje >= 60:
-        return "🟡", "#F59E0B", "En Proceso"
+    return tuple(clasificar_semaforo([porcentaje], 'CUMPLIMIENTO').iloc[0])
+
+
+# Ingesta por bloques de los Acumuladores de Mitrol: cada bloque del CSV se
+# reduce a totales por agente (y turno / campaña si vienen en el archivo); las
+# filas crudas no se guardan ni en la sesión ni en disco.
+FILAS_POR_BLOQUE_MITROL = 100_000
+CLAVES_MITROL = ['Agente_norm', 'Nombre Agente', 'Turno', 'Campaña']
+TIPIFICACIONES_SIN_CORTE = ['contestador', 'ya tiene mvs']
+
+
+def _agregar_bloque_mitrol(bloque):
+    """Totales por agente de un bloque de Acumuladores (sumas y máximo de TalkingTime)"""
+    bloque['Agente_norm'] = normalizar_ids_agentes(bloque['Agente'])
+    claves = [c for c in CLAVES_MITROL if c in bloque.columns]
+    agregaciones = {c: 'sum' for c in bloque.select_dtypes('number').columns if c not in claves}
+    agregaciones['Agente'] = 'first'
+
+    bloque['Registros'] = 1
+    agregaciones['Registros'] = 'sum'
+    if 'TalkingTime' in bloque.columns:
+        segundos = segundos_desde_duracion(bloque['TalkingTime']).to_numpy('int64')
+        bloque['TalkingTime_seg'] = segundos
+        bloque['TalkingTime_seg_max'] = segundos
+        bloque['Superan_1min'] = (segundos > 60).astype('int64')
+        bloque['Superan_5min'] = (segundos > 300).astype('int64')
+        agregaciones.update({'TalkingTime_seg': 'sum', 'TalkingTime_seg_max': 'max',
+                             'Superan_1min': 'sum', 'Superan_5min': 'sum'})
+    if 'Tipificación' in bloque.columns:
+        tipificacion = bloque['Tipificación'].astype(str).str.lower()
+        bloque['Ya_Tiene_MVS'] = (tipificacion == 'ya tiene mvs').astype('int64')
+        bloque['Contestador'] = (tipificacion == 'contestador').astype('int64')
+        agregaciones.update({'Ya_Tiene_MVS': 'sum', 'Contestador': 'sum'})
+        if 'Origen Corte' in bloque.columns:
+            cortada = (bloque['Origen Corte'].astype(str).str.lower() == 'agente') & ~tipificacion.isin(TIPIFICACIONES_SIN_CORTE)
+            bloque['Llamadas_Cortadas'] = cortada.astype('int64')
+            agregaciones['Llamadas_Cortadas'] = 'sum'
+
+    return bloque.groupby(claves, dropna=False, sort=False).agg(agregaciones).reset_index()
+
+
+def ingerir_acumuladores_mitrol(archivo, filas_por_bloque=FILAS_POR_BLOQUE_MITROL):
+    """
+    Lee el CSV de Acumuladores de Mitrol por bloques sin materializarlo completo:
+    de cada bloque quedan solo sus totales por agente. Retorna (totales por
+    agente, vista previa de las primeras filas).
+    """
+    parciales = []
+    vista_previa = None
+    for bloque in pd.read_csv(archivo, encoding='latin-1', sep=';', chunksize=filas_por_bloque):
+        if vista_previa is None:
+            vista_previa = bloque.head(5).copy()
+        if 'Agente' in bloque.columns:
+            parciales.append(_agregar_bloque_mitrol(bloque))
+
+    if not parciales:
+        return pd.DataFrame(), vista_previa
+
+    totales = pd.concat(parciales, ignore_index=True)
+    claves = [c for c in CLAVES_MITROL if c in totales.columns]
+    agregaciones = {c: ('max' if c == 'TalkingTime_seg_max' else 'first' if c == 'Agente' else 'sum')
+                    for c in totales.columns if c not in claves}
+    totales = totales.groupby(claves, dropna=False, sort=False).agg(agregaciones).reset_index()
+    return totales, vista_previa
+
+
+def filtrar_totales_mitrol(df_totales, turno='Todos', campana='Todas', solo_validos=False):
+    """Recorta los totales de Mitrol por turno, campaña y agentes válidos"""
+    mascara = pd.Series(True, index=df_totales.index)
+    if turno != 'Todos' and 'Turno' in df_totales.columns:
+        mascara &= df_totales['Turno'] == turno
+    if campana != 'Todas' and 'Campaña' in df_totales.columns:
+        mascara &= df_totales['Campaña'] == campana
+    if solo_validos and 'agente_valido' in df_totales.columns:
+        mascara &= df_totales['agente_valido'] == True
+    return df_totales[mascara]
+
+
+def calcular_metricas_agentes(df_totales):
+    """
+    Tabla 'Métricas por Agente' a partir de los totales de la ingesta, en una
+    sola pasada de groupby por 'Nombre Agente'. Ordenada por cantidad de llamadas.
+    """
+    if 'Llamadas_Cortadas' not in df_totales.columns:
+        df_totales = df_totales.assign(Llamadas_Cortadas=0)
+    por_agente = df_totales.groupby('Nombre Agente', sort=False).agg(
+        cantidad=('Registros', 'sum'),
+        tiempo_total=('TalkingTime_seg', 'sum'),
+        mas_larga=('TalkingTime_seg_max', 'max'),
+        cortadas=('Llamadas_Cortadas', 'sum'),
+        superan_minuto=('Superan_1min', 'sum'),
+        superan_5min=('Superan_5min', 'sum'),
+    )
+    tiempo_promedio = por_agente['tiempo_total'] / por_agente['cantidad']
+    pct_cortadas = (por_agente['cortadas'] / por_agente['cantidad'] * 100).where(por_agente['cantidad'] > 0, 0)
+
+    df_metricas = pd.DataFrame({
+        'Agente': por_agente.index,
+        'Cantidad Llamadas': por_agente['cantidad'].to_numpy(),
+        'Llamada Más Larga': formatear_mmss(por_agente['mas_larga']).to_numpy(),
+        'Tiempo Prom. Hablado': formatear_mmss(tiempo_promedio).to_numpy(),
+        'Tiempo Prom. (seg)': tiempo_promedio.round(1).to_numpy(),
+        'Llamadas Cortadas': por_agente['cortadas'].to_numpy(),
+        '% Cortadas': pct_cortadas.round(1).to_numpy(),
+        'Superan 1 Min': por_agente['superan_minuto'].to_numpy(),
+        'Superan 5 Min': por_agente['superan_5min'].to_numpy(),
+        'Capta Atención': np.where(tiempo_promedio >= 60, "SI", "NO"),
+    })
+    return df_metricas.sort_values('Cantidad Llamadas', ascending=False)
+
+
+def calcular_kpis_vendedores(df_ventas, objetivo_aprobadas):
+    """
+    Tabla de KPIs de ventas por vendedor (cargadas, aprobadas, efectividad,
+    cumplimiento y semáforo) en una sola pasada de groupby. Espera las columnas
+    'Vendedor' y 'Aprobada' (booleana). Ordenada por ventas aprobadas.
+    """
+    por_vendedor = df_ventas.groupby('Vendedor', sort=False).agg(
+        cargadas=('Aprobada', 'size'),
+        aprobadas=('Aprobada', 'sum'),
+    )
+    efectividad = (por_vendedor['aprobadas'] / por_vendedor['cargadas'] * 100).where(por_vendedor['cargadas'] > 0, 0)
+    cumplimiento = por_vendedor['aprobadas'] / objetivo_aprobadas * 100 if objetivo_aprobadas > 0 else por_vendedor['aprobadas'] * 0.0
+    semaforo = clasificar_semaforo(cumplimiento, 'CUMPLIMIENTO')
+
+    df_kpis = pd.DataFrame({
+        'Vendedor': por_vendedor.index,
+        'Ventas Cargadas': por_vendedor['cargadas'].to_numpy(),
+        'Ventas Aprobadas': por_vendedor['aprobadas'].astype('int64').to_numpy(),
+        'Efectividad (%)': efectividad.round(1).to_numpy(),
+        'Cumplimiento (%)': cumplimiento.round(1).to_numpy(),
+        'Semáforo': semaforo['emoji'].to_numpy(),
+        'Estado': semaforo['estado'].to_numpy(),
+    })
+    return df_kpis.sort_values('Ventas Aprobadas', ascending=False)
+
+
+def memo_calidad(nombre, tabla, clave, calcular):
+    """
+    Memoiza en la sesión un resultado derivado de una tabla de calidad por
+    combinación de filtros; se descarta cuando la tabla de la sesión cambia.
+    """
+    memo = st.session_state.setdefault(f'memo_calidad_{nombre}', {'tabla': None, 'resultados': {}})
+    if memo['tabla'] is not tabla:
+        memo['tabla'] = tabla
+        memo['resultados'] = {}
+    if clave not in memo['resultados']:
+        memo['resultados'][clave] = calcular()
+    return memo['resultados'][clave]
+
+
+def calcular_componentes_iqc(df_mitrol, df_ventas, df_eva=None):
+    """
+    Componentes normalizados (0-100) del IQC por vendedor: EVA_norm,
+    Ventas_norm y Engagement_norm, junto con las métricas de origen.
+    No dependen de los pesos, así que se calculan una vez por versión de datos.
+    """
+    df_ventas = df_ventas.copy()
+
+    # ============================================
+    # 1. MÉTRICAS DE VENTAS (Efectividad)
+    # ============================================
+    # Identificar columnas
+    col_vendedor = None
+    col_estado = None
+    for c in df_ventas.columns:
+        if 'vendedor' in c.lower():
+            col_vendedor = c
+        if 'estado' in c.lower():
+            col_estado = c
+
+    if col_vendedor and col_estado:
+        # Agrupar por vendedor - convertir a string primero
+        df_ventas[col_estado] = df_ventas[col_estado].astype(str)
+        df_ventas['es_aprobada'] = df_ventas[col_estado].str.contains('APROB', case=False, na=False)
+        ventas_por_vendedor = df_ventas.groupby(col_vendedor).agg(
+            total_ventas=('es_aprobada', 'count'),
+            ventas_aprobadas=('es_aprobada', 'sum')
+        ).reset_index()
+        ventas_por_vendedor.columns = ['Vendedor_Ventas', 'Total_Ventas', 'Ventas_Aprobadas']
+        ventas_por_vendedor['Efectividad_Ventas'] = (
+            ventas_por_vendedor['Ventas_Aprobadas'] / 
+            ventas_por_vendedor['Total_Ventas'] * 100
+        ).fillna(0)
+        ventas_por_vendedor['Vendedor_norm'] = ventas_por_vendedor['Vendedor_Ventas'].astype(str).str.upper().str.strip()
+    else:
+        ventas_por_vendedor = pd.DataFrame()
+
+    # ============================================
+    # 2. MÉTRICAS MITROL (Engagement)
+    # ============================================
+    # Calcular engagement basado en tipificaciones y tiempos
+    # Buscar columnas de tipificación
+    cols_tipif_ok = [c for c in df_mitrol.columns if 'exitoso' in c.lower() and 'no' not in c.lower()]
+    cols_tipif_no = [c for c in df_mitrol.columns if 'no exitoso' in c.lower() or 'noexitoso' in c.lower()]
+
+    df_mitrol_agg = df_mitrol.groupby('Vendedor').agg({
+        c: 'sum' for c in cols_tipif_ok + cols_tipif_no if c in df_mitrol.columns
+    }).reset_index() if cols_tipif_ok or cols_tipif_no else pd.DataFrame()
+
+    if not df_mitrol_agg.empty and cols_tipif_ok:
+        df_mitrol_agg['Total_Tipif_OK'] = df_mitrol_agg[cols_tipif_ok].sum(axis=1) if cols_tipif_ok else 0
+        df_mitrol_agg['Total_Tipif_NO'] = df_mitrol_agg[cols_tipif_no].sum(axis=1) if cols_tipif_no else 0
+        df_mitrol_agg['Total_Tipif'] = df_mitrol_agg['Total_Tipif_OK'] + df_mitrol_agg['Total_Tipif_NO']
+        df_mitrol_agg['Engagement'] = (
+            df_mitrol_agg['Total_Tipif_OK'] / df_mitrol_agg['Total_Tipif'] * 100
+        ).fillna(50)
+    else:
+        # Si no hay tipificaciones, usar engagement base
+        df_mitrol_agg = df_mitrol[['Vendedor']].drop_duplicates()
+        df_mitrol_agg['Engagement'] = 70  # Valor base
+
+    df_mitrol_agg['Vendedor_norm'] = df_mitrol_agg['Vendedor'].str.upper().str.strip()
+
+    # ============================================
+    # 3. MÉTRICAS EVA (Puntaje Evaluaciones)
+    # ============================================
+    puntaje_eva_por_vendedor = pd.DataFrame()
+    if df_eva is not None:
+        # Usar datos de EVA si existen
+        if not df_eva.empty and 'vendedor' in [c.lower() for c in df_eva.columns]:
+            col_vend_eva = [c for c in df_eva.columns if 'vendedor' in c.lower()][0]
+            col_punt_eva = [c for c in df_eva.columns if 'punt' in c.lower() or 'score' in c.lower() or 'nota' in c.lower()]
+            if col_punt_eva:
+                puntaje_eva_por_vendedor = df_eva[[col_vend_eva, col_punt_eva[0]]].copy()
+                puntaje_eva_por_vendedor.columns = ['Vendedor_EVA', 'Puntaje_EVA']
+                puntaje_eva_por_vendedor['Vendedor_norm'] = puntaje_eva_por_vendedor['Vendedor_EVA'].str.upper().str.strip()
+
+    # ============================================
+    # 4. UNIFICAR COMPONENTES
+    # ============================================
+    # Base: vendedores de Mitrol
+    df_iqc = df_mitrol_agg[['Vendedor', 'Vendedor_norm', 'Engagement']].copy()
+
+    # Unir ventas
+    if not ventas_por_vendedor.empty:
+        df_iqc = df_iqc.merge(
+            ventas_por_vendedor[['Vendedor_norm', 'Total_Ventas', 'Ventas_Aprobadas', 'Efectividad_Ventas']],
+            on='Vendedor_norm',
+            how='left'
+        )
+    else:
+        df_iqc['Total_Ventas'] = 0
+        df_iqc['Ventas_Aprobadas'] = 0
+        df_iqc['Efectividad_Ventas'] = 50
+
+    # Unir EVA
+    if not puntaje_eva_por_vendedor.empty:
+        df_iqc = df_iqc.merge(
+            puntaje_eva_por_vendedor[['Vendedor_norm', 'Puntaje_EVA']],
+            on='Vendedor_norm',
+            how='left'
+        )
     else:
-        return "🔴", "#DC2626", "Bajo"
+        df_iqc['Puntaje_EVA'] = 70  # Valor base si no hay datos EVA
+
+    # Rellenar NaN
+    df_iqc['Engagement'] = df_iqc['Engagement'].fillna(50)
+    df_iqc['Efectividad_Ventas'] = df_iqc['Efectividad_Ventas'].fillna(50)
+    df_iqc['Puntaje_EVA'] = df_iqc['Puntaje_EVA'].fillna(70)
+
+    # Normalizar métricas a escala 0-100
+    df_iqc['EVA_norm'] = df_iqc['Puntaje_EVA'].clip(0, 100)
+    df_iqc['Ventas_norm'] = df_iqc['Efectividad_Ventas'].clip(0, 100)
+    df_iqc['Engagement_norm'] = df_iqc['Engagement'].clip(0, 100)
+
+    return df_iqc
+
+
+COMPONENTES_IQC = ['EVA_norm', 'Ventas_norm', 'Engagement_norm']
+
+
+def componentes_iqc_sesion(forzar=False):
+    """
+    Componentes del IQC de la sesión, cacheados por versión de datos: se
+    recalculan solo si cambió alguna de las tablas de origen (o si se fuerza).
+    """
+    fuentes = (
+        st.session_state['df_calidad_procesado'],
+        st.session_state['df_calidad_solicitudes'],
+        st.session_state.get('resumen_vendedores'),
+    )
+    cache = st.session_state.get('componentes_iqc')
+    if forzar or cache is None or any(a is not b for a, b in zip(cache['fuentes'], fuentes)):
+        cache = {'fuentes': fuentes, 'componentes': calcular_componentes_iqc(*fuentes)}
+        st.session_state['componentes_iqc'] = cache
+    return cache['componentes']
+
+
+def calcular_iqc_lote(componentes, pesos):
+    """
+    IQC de cada vendedor para uno o varios juegos de pesos (en %, en el orden
+    EVA, Ventas, Engagement). Con un solo juego devuelve una Serie; con una
+    matriz (k x 3) devuelve un DataFrame vendedores x k, una columna por juego.
+    """
+    matriz = componentes[COMPONENTES_IQC].to_numpy(dtype='float64')
+    pesos = np.asarray(pesos, dtype='float64') / 100
+    if pesos.ndim == 1:
+        return pd.Series(matriz @ pesos, index=componentes.index)
+    etiquetas = ['/'.join(f"{p * 100:g}" for p in fila) for fila in pesos]
+    return pd.DataFrame(matriz @ pesos.T, index=componentes.index, columns=etiquetas)
+
+
+def combinaciones_pesos_iqc(paso=5):
+    """Todas las combinaciones de pesos (EVA, Ventas, Engagement) que suman 100"""
+    return np.array([
+        (eva, ventas, 100 - eva - ventas)
+        for eva in range(0, 101, paso)
+        for ventas in range(0, 101 - eva, paso)
+    ])
+
+
+def armar_ranking_iqc(componentes, pesos):
+    """Ranking IQC (con clasificación) para un juego de pesos"""
+    df_iqc = componentes.copy()
+    df_iqc['IQC'] = calcular_iqc_lote(componentes, pesos)
+    df_iqc['Clasificación'] = np.select(
+        [df_iqc['IQC'] >= 80, df_iqc['IQC'] >= 60, df_iqc['IQC'] >= 40],
+        ['🟢 Excelente', '🟡 Adecuado', '🟠 En Desarrollo'],
+        default='🔴 Requiere Atención'
+    )
+    df_iqc = df_iqc.sort_values('IQC', ascending=False).reset_index(drop=True)
+    df_iqc['Ranking'] = range(1, len(df_iqc) + 1)
+    return df_iqc
 
 
 # =============================================================================
@@ -7065,24 +8805,6 @@ def pagina_comparativa_periodos(datos):
     # Cargar equipos disponibles
     listado_vendedores, equipos_vendedores = cargar_listado_vendedores()
     
-    # Crear mapeo nombre -> equipo
-    nombre_a_equipo_comp = {}
-    for equipo, vendedores in equipos_vendedores.items():
-        for vendedor in vendedores:
-            nombre_a_equipo_comp[vendedor.lower().strip()] = equipo
-    
-    def obtener_equipo_comp(agente):
-        """Obtiene el equipo del agente"""
-        if pd.isna(agente) or agente is None:
-            return "Sin Equipo"
-        nombre = obtener_nombre_agente(str(agente)).lower().strip()
-        if nombre in nombre_a_equipo_comp:
-            return nombre_a_equipo_comp[nombre]
-        for nom, eq in nombre_a_equipo_comp.items():
-            if nombre in nom or nom in nombre:
-                return eq
-        return "Sin Equipo"
-    
     # Obtener equipos únicos
     equipos_lista = [e for e in equipos_vendedores.keys() if e and e != "nan" and e != "Sin Equipo"]
     equipos_lista = sorted(equipos_lista)
@@ -7103,8 +8825,8 @@ def pagina_comparativa_periodos(datos):
     # Aplicar filtro de equipos si se seleccionaron
     if equipos_seleccionados:
         # Agregar columna de equipo a cada período
-        df_periodo1['equipo_calc'] = df_periodo1['agente'].apply(obtener_equipo_comp)
-        df_periodo2['equipo_calc'] = df_periodo2['agente'].apply(obtener_equipo_comp)
+        df_periodo1['equipo_calc'] = resolver_equipos(resolver_nombres_agentes(df_periodo1['agente']))
+        df_periodo2['equipo_calc'] = resolver_equipos(resolver_nombres_agentes(df_periodo2['agente']))
         
         df_periodo1 = df_periodo1[df_periodo1['equipo_calc'].isin(equipos_seleccionados)]
         df_periodo2 = df_periodo2[df_periodo2['equipo_calc'].isin(equipos_seleccionados)]
@@ -7258,16 +8980,20 @@ def pagina_comparativa_periodos(datos):
             'resolucion_problemas': 'Resolución Problemas'
         }
         
-        # Calcular promedios por criterio
+        # Calcular promedios por criterio sobre el cubo de métricas
+        cubo = obtener_cubo_evaluaciones()
+        equipos_cubo = equipos_seleccionados or None
+        resumen_p1 = consultar_cubo(cubo, fecha_ini_1, fecha_fin_1, equipos=equipos_cubo)
+        resumen_p2 = consultar_cubo(cubo, fecha_ini_2, fecha_fin_2, equipos=equipos_cubo)
         valores_p1 = []
         valores_p2 = []
         nombres_criterios = []
         
         for c in criterios:
-            if c in df_periodo1.columns and c in df_periodo2.columns:
+            if f'prom_{c}' in resumen_p1 and f'prom_{c}' in resumen_p2:
                 nombres_criterios.append(criterios_nombres.get(c, c))
-                valores_p1.append(df_periodo1[c].mean())
-                valores_p2.append(df_periodo2[c].mean())
+                valores_p1.append(resumen_p1[f'prom_{c}'])
+                valores_p2.append(resumen_p2[f'prom_{c}'])
         
         # Crear gráfico de barras comparativo
         df_comparativo = pd.DataFrame({
@@ -7334,10 +9060,10 @@ def pagina_comparativa_periodos(datos):
         
         # Calcular promedios por agente en cada período
         if 'agente' in df_periodo1.columns and 'agente' in df_periodo2.columns:
-            prom_agente_p1 = df_periodo1.groupby('agente')['puntaje_total'].agg(['mean', 'count']).reset_index()
+            prom_agente_p1 = df_periodo1.groupby('agente', observed=True)['puntaje_total'].agg(['mean', 'count']).reset_index()
             prom_agente_p1.columns = ['agente', 'puntaje_p1', 'n_p1']
             
-            prom_agente_p2 = df_periodo2.groupby('agente')['puntaje_total'].agg(['mean', 'count']).reset_index()
+            prom_agente_p2 = df_periodo2.groupby('agente', observed=True)['puntaje_total'].agg(['mean', 'count']).reset_index()
             prom_agente_p2.columns = ['agente', 'puntaje_p2', 'n_p2']
             
             # Merge
@@ -7488,11 +9214,19 @@ def pagina_calidad():
             
             if archivo_mitrol is not None:
                 try:
-                    df_mitrol = pd.read_csv(archivo_mitrol, encoding='latin-1', sep=';')
-                    st.session_state['df_calidad_mitrol'] = df_mitrol
-                    st.success(f"✅ Mitrol cargado: {len(df_mitrol):,} registros")
+                    # Se ingiere una sola vez por archivo subido, no en cada rerun
+                    id_mitrol = getattr(archivo_mitrol, 'file_id', None) or (archivo_mitrol.name, archivo_mitrol.size)
+                    if st.session_state.get('id_calidad_mitrol') != id_mitrol:
+                        with st.spinner("Leyendo Acumuladores por bloques..."):
+                            df_mitrol, vista_previa = ingerir_acumuladores_mitrol(archivo_mitrol)
+                        st.session_state['df_calidad_mitrol'] = df_mitrol
+                        st.session_state['vista_previa_calidad_mitrol'] = vista_previa
+                        st.session_state['id_calidad_mitrol'] = id_mitrol
+                    df_mitrol = st.session_state['df_calidad_mitrol']
+                    registros = int(df_mitrol['Registros'].sum()) if 'Registros' in df_mitrol.columns else 0
+                    st.success(f"✅ Mitrol cargado: {registros:,} registros ({len(df_mitrol):,} agentes/turnos)")
                     with st.expander("👁️ Vista previa Mitrol"):
-                        st.dataframe(df_mitrol.head(5), use_container_width=True)
+                        st.dataframe(st.session_state['vista_previa_calidad_mitrol'], use_container_width=True)
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
         
@@ -7528,7 +9262,7 @@ def pagina_calidad():
                 df_listado = df_listado[['Usuario', 'Nombre', 'Equipo']].dropna(subset=['Usuario'])
                 df_listado = df_listado[df_listado['Usuario'] != 'Usuario']  # Quitar header
                 # Normalizar Usuario
-                df_listado['Usuario_norm'] = df_listado['Usuario'].str.lower().str.strip().str.replace(' ', '').str.replace('\t', '')
+                df_listado['Usuario_norm'] = normalizar_ids_agentes(df_listado['Usuario'])
                 st.session_state['df_mapeo_vendedores'] = df_listado
                 st.success(f"✅ Mapeo de vendedores cargado: {len(df_listado)} agentes")
                 
@@ -7562,7 +9296,7 @@ def pagina_calidad():
                     
                     # Normalizar columna Agente de Mitrol
                     if 'Agente' in df_mitrol.columns:
-                        df_mitrol['Agente_norm'] = df_mitrol['Agente'].str.lower().str.strip().str.replace(' ', '')
+                        df_mitrol['Agente_norm'] = normalizar_ids_agentes(df_mitrol['Agente'])
                     
                     # Unir con mapeo
                     if not df_mapeo.empty and 'Agente_norm' in df_mitrol.columns:
@@ -7584,7 +9318,8 @@ def pagina_calidad():
                     st.markdown("### 📊 Resumen de Datos")
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("📞 Registros Mitrol", f"{len(df_mitrol):,}")
+                        registros = int(df_mitrol['Registros'].sum()) if 'Registros' in df_mitrol.columns else len(df_mitrol)
+                        st.metric("📞 Registros Mitrol", f"{registros:,}")
                     with col2:
                         agentes = df_mitrol['Vendedor'].nunique() if 'Vendedor' in df_mitrol.columns else 0
                         st.metric("👥 Agentes", agentes)
@@ -7622,14 +9357,11 @@ def pagina_calidad():
             with col_f3:
                 mostrar_solo_validos = st.checkbox("✅ Solo agentes válidos", value=False)
             
-            # Aplicar filtros
-            df_filtrado = df.copy()
-            if turno_filtro != 'Todos' and 'Turno' in df_filtrado.columns:
-                df_filtrado = df_filtrado[df_filtrado['Turno'] == turno_filtro]
-            if campana_filtro != 'Todas' and 'Campaña' in df_filtrado.columns:
-                df_filtrado = df_filtrado[df_filtrado['Campaña'] == campana_filtro]
-            if mostrar_solo_validos and 'agente_valido' in df_filtrado.columns:
-                df_filtrado = df_filtrado[df_filtrado['agente_valido'] == True]
+            # Aplicar filtros (las métricas de cada combinación de filtros se calculan una vez)
+            df_filtrado = memo_calidad(
+                'filtrado', df, (turno_filtro, campana_filtro, mostrar_solo_validos),
+                lambda: filtrar_totales_mitrol(df, turno_filtro, campana_filtro, mostrar_solo_validos)
+            )
             
             if len(df_filtrado) == 0:
                 st.warning("⚠️ No hay datos con los filtros seleccionados")
@@ -7637,59 +9369,10 @@ def pagina_calidad():
                 # Calcular métricas por agente
                 if 'Nombre Agente' in df_filtrado.columns and 'TalkingTime_seg' in df_filtrado.columns:
                     
-                    # Tipificaciones especiales a excluir
-                    tipif_excluir = ['contestador', 'ya tiene mvs']
-                    
-                    metricas_agente = []
-                    
-                    for agente in df_filtrado['Nombre Agente'].unique():
-                        df_agente = df_filtrado[df_filtrado['Nombre Agente'] == agente]
-                        
-                        # Métricas básicas
-                        cantidad_llamadas = len(df_agente)
-                        
-                        # Llamada más larga
-                        llamada_mas_larga = df_agente['TalkingTime_seg'].max()
-                        
-                        # Tiempo promedio hablado
-                        tiempo_promedio = df_agente['TalkingTime_seg'].mean()
-                        
-                        # Llamadas cortadas (por agente, excluyendo tipificaciones especiales)
-                        if 'Origen Corte_lower' in df_agente.columns and 'Tipificación_lower' in df_agente.columns:
-                            llamadas_cortadas = len(df_agente[
-                                (df_agente['Origen Corte_lower'] == 'agente') & 
-                                (~df_agente['Tipificación_lower'].isin(tipif_excluir))
-                            ])
-                        else:
-                            llamadas_cortadas = 0
-                        
-                        # Superan el minuto (> 60 seg)
-                        superan_minuto = len(df_agente[df_agente['TalkingTime_seg'] > 60])
-                        
-                        # Superan 5 minutos (> 300 seg)
-                        superan_5min = len(df_agente[df_agente['TalkingTime_seg'] > 300])
-                        
-                        # Capta la atención
-                        capta_atencion = "SI" if tiempo_promedio >= 60 else "NO"
-                        
-                        # Porcentaje de llamadas cortadas
-                        pct_cortadas = (llamadas_cortadas / cantidad_llamadas * 100) if cantidad_llamadas > 0 else 0
-                        
-                        metricas_agente.append({
-                            'Agente': agente,
-                            'Cantidad Llamadas': cantidad_llamadas,
-                            'Llamada Más Larga': sec_to_mmss(llamada_mas_larga),
-                            'Tiempo Prom. Hablado': sec_to_mmss(tiempo_promedio),
-                            'Tiempo Prom. (seg)': round(tiempo_promedio, 1),
-                            'Llamadas Cortadas': llamadas_cortadas,
-                            '% Cortadas': round(pct_cortadas, 1),
-                            'Superan 1 Min': superan_minuto,
-                            'Superan 5 Min': superan_5min,
-                            'Capta Atención': capta_atencion
-                        })
-                    
-                    df_metricas = pd.DataFrame(metricas_agente)
-                    df_metricas = df_metricas.sort_values('Cantidad Llamadas', ascending=False)
+                    df_metricas = memo_calidad(
+                        'metricas', df, (turno_filtro, campana_filtro, mostrar_solo_validos),
+                        lambda: calcular_metricas_agentes(df_filtrado)
+                    )
                     
                     # Métricas globales
                     st.markdown("---")
@@ -7710,13 +9393,13 @@ def pagina_calidad():
                     
                     with col4:
                         # Contar tipificaciones especiales
-                        if 'Tipificación_lower' in df_filtrado.columns:
-                            ya_tiene_mvs = len(df_filtrado[df_filtrado['Tipificación_lower'] == 'ya tiene mvs'])
+                        if 'Ya_Tiene_MVS' in df_filtrado.columns:
+                            ya_tiene_mvs = int(df_filtrado['Ya_Tiene_MVS'].sum())
                             st.metric("📱 Ya Tiene MVS", f"{ya_tiene_mvs:,}")
                     
                     with col5:
-                        if 'Tipificación_lower' in df_filtrado.columns:
-                            contestador = len(df_filtrado[df_filtrado['Tipificación_lower'] == 'contestador'])
+                        if 'Contestador' in df_filtrado.columns:
+                            contestador = int(df_filtrado['Contestador'].sum())
                             st.metric("📞 Contestador", f"{contestador:,}")
                     
                     # Tabla de métricas
@@ -7738,14 +9421,18 @@ def pagina_calidad():
                         else:
                             return 'background-color: #D1FAE5; color: #065F46;'
                     
-                    styled_df = df_metricas.style.applymap(
-                        color_capta_atencion, subset=['Capta Atención']
-                    ).applymap(
-                        color_cortadas, subset=['% Cortadas']
+                    tabla_paginada(
+                        df_metricas,
+                        key='tabla_metricas_agentes',
+                        estilo=lambda pagina: pagina.style.applymap(
+                            color_capta_atencion, subset=['Capta Atención']
+                        ).applymap(
+                            color_cortadas, subset=['% Cortadas']
+                        ),
+                        use_container_width=True,
+                        height=400
                     )
                     
-                    st.dataframe(styled_df, use_container_width=True, height=400)
-                    
                     # Gráficos
                     st.markdown("---")
                     col_g1, col_g2 = st.columns(2)
@@ -7816,12 +9503,11 @@ def pagina_calidad():
                     
                     # Botón para descargar
                     st.markdown("---")
-                    csv = df_metricas.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="📥 Descargar Métricas (CSV)",
-                        data=csv,
-                        file_name=f"metricas_agentes_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                        mime="text/csv"
+                    boton_descarga_csv(
+                        df_metricas,
+                        "📥 Descargar Métricas (CSV)",
+                        f"metricas_agentes_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+                        key='metricas_agentes'
                     )
                 else:
                     st.warning("⚠️ No se encontraron las columnas necesarias (Nombre Agente, TalkingTime)")
@@ -7839,17 +9525,30 @@ def pagina_calidad():
         </div>
         """, unsafe_allow_html=True)
         
+        # Umbrales vigentes (por campaña / turno si el archivo de configuración los define)
+        config_umbrales = cargar_config_umbrales()
+        campana_umbrales, turno_umbrales = None, None
+        if config_umbrales.get('por_campana') or config_umbrales.get('por_turno'):
+            col_u1, col_u2 = st.columns(2)
+            with col_u1:
+                opciones = ['General'] + list(config_umbrales.get('por_campana', {}).keys())
+                campana_umbrales = st.selectbox("📢 Umbrales de Campaña", opciones)
+                campana_umbrales = None if campana_umbrales == 'General' else campana_umbrales
+            with col_u2:
+                opciones = ['General'] + list(config_umbrales.get('por_turno', {}).keys())
+                turno_umbrales = st.selectbox("🌅 Umbrales de Turno", opciones)
+                turno_umbrales = None if turno_umbrales == 'General' else turno_umbrales
+        umbrales = obtener_umbrales_semaforo(campana_umbrales, turno_umbrales)
+        
         # Tabla de referencia de umbrales
         st.markdown("#### 📋 Tabla de Umbrales")
         
-        umbrales_data = {
-            'Estado': ['NO DISPONIBLE', 'BREAK', 'BAÑO', 'TIEMPO DE LOGUEO', 'ADMINISTRATIVO'],
-            '🔴 Rojo (Crítico)': ['≥ 05:00 min', '≥ 25:00 min', '> 10:00 min', '< 04:40:00 hrs', '≥ (cant×10)+6 min'],
-            '🟡 Amarillo (Alerta)': ['03:00 a 05:00 min', '23:00 a 24:59 min', '-', '04:40:00 a 04:45:00 hrs', '(cant×10) a (cant×10)+5 min'],
-            '🟢 Verde (OK)': ['< 03:00 min', '< 23:00 min', '≤ 10:00 min', '≥ 04:45:00 hrs', '< (cant×10) min']
-        }
-        
-        df_umbrales = pd.DataFrame(umbrales_data)
+        df_umbrales = pd.concat([describir_umbrales(umbrales), pd.DataFrame([{
+            'Estado': 'ADMINISTRATIVO',
+            '🔴 Rojo (Crítico)': '≥ (cant×10)+6 min',
+            '🟡 Amarillo (Alerta)': '(cant×10) a (cant×10)+5 min',
+            '🟢 Verde (OK)': '< (cant×10) min'
+        }])], ignore_index=True)
         st.table(df_umbrales)
         
         # Simulador de semáforo
@@ -7880,7 +9579,7 @@ def pagina_calidad():
                 except:
                     tiempo_seg = 0
         
-        emoji, color, estado = aplicar_semaforo_tiempo(tiempo_seg, tipo_estado)
+        emoji, color, estado = clasificar_semaforo([tiempo_seg], tipo_estado, umbrales).iloc[0]
         
         st.markdown(f"""
         <div style='text-align: center; padding: 30px; background: {color}20; border-radius: 15px; border: 3px solid {color}; margin-top: 20px;'>
@@ -7895,26 +9594,29 @@ def pagina_calidad():
             st.markdown("---")
             st.markdown("#### 📊 Análisis de Tiempos del Dataset")
             
-            df = st.session_state['df_calidad_procesado']
+            df = filtrar_totales_mitrol(
+                st.session_state['df_calidad_procesado'],
+                turno_umbrales or 'Todos', campana_umbrales or 'Todas'
+            )
             
             if 'TalkingTime_seg' in df.columns and 'Nombre Agente' in df.columns:
                 # Calcular tiempo total por agente
                 tiempo_por_agente = df.groupby('Nombre Agente')['TalkingTime_seg'].sum().reset_index()
                 tiempo_por_agente.columns = ['Agente', 'Tiempo Total (seg)']
-                tiempo_por_agente['Tiempo Total'] = tiempo_por_agente['Tiempo Total (seg)'].apply(sec_to_hhmmss)
+                tiempo_por_agente['Tiempo Total'] = formatear_hhmmss(tiempo_por_agente['Tiempo Total (seg)'])
                 
                 # Aplicar semáforo de logueo
-                tiempo_por_agente['Semáforo'] = tiempo_por_agente['Tiempo Total (seg)'].apply(
-                    lambda x: aplicar_semaforo_tiempo(x, 'TIEMPO_LOGUEO')
-                )
-                tiempo_por_agente['Estado'] = tiempo_por_agente['Semáforo'].apply(lambda x: x[0] + ' ' + x[2])
+                semaforo = clasificar_semaforo(tiempo_por_agente['Tiempo Total (seg)'], 'TIEMPO_LOGUEO', umbrales)
+                tiempo_por_agente['Semáforo'] = semaforo['emoji']
+                tiempo_por_agente['Estado'] = semaforo['emoji'] + ' ' + semaforo['estado']
                 
                 # Contar por semáforo
                 col1, col2, col3 = st.columns(3)
                 
-                verdes = len([x for x in tiempo_por_agente['Semáforo'] if x[0] == '🟢'])
-                amarillos = len([x for x in tiempo_por_agente['Semáforo'] if x[0] == '🟡'])
-                rojos = len([x for x in tiempo_por_agente['Semáforo'] if x[0] == '🔴'])
+                conteo = semaforo['emoji'].value_counts()
+                verdes = int(conteo.get('🟢', 0))
+                amarillos = int(conteo.get('🟡', 0))
+                rojos = int(conteo.get('🔴', 0))
                 
                 with col1:
                     st.markdown(f"""
@@ -8024,30 +9726,10 @@ def pagina_calidad():
                     objetivo_aprobadas = st.number_input("Objetivo Ventas Aprobadas", value=50, min_value=1)
                 
                 # Calcular KPIs por vendedor
-                kpis_vendedor = []
-                
-                for vendedor in df_ventas['Vendedor'].dropna().unique():
-                    df_vend = df_ventas[df_ventas['Vendedor'] == vendedor]
-                    
-                    cargadas = len(df_vend)
-                    aprobadas = len(df_vend[df_vend['Aprobada'] == True])
-                    efectividad = (aprobadas / cargadas * 100) if cargadas > 0 else 0
-                    cumplimiento = (aprobadas / objetivo_aprobadas * 100) if objetivo_aprobadas > 0 else 0
-                    
-                    emoji, color, estado = aplicar_semaforo_cumplimiento(cumplimiento)
-                    
-                    kpis_vendedor.append({
-                        'Vendedor': vendedor,
-                        'Ventas Cargadas': cargadas,
-                        'Ventas Aprobadas': aprobadas,
-                        'Efectividad (%)': round(efectividad, 1),
-                        'Cumplimiento (%)': round(cumplimiento, 1),
-                        'Semáforo': emoji,
-                        'Estado': estado
-                    })
-                
-                df_kpis = pd.DataFrame(kpis_vendedor)
-                df_kpis = df_kpis.sort_values('Ventas Aprobadas', ascending=False)
+                df_kpis = memo_calidad(
+                    'kpis', st.session_state['df_calidad_ventas'], objetivo_aprobadas,
+                    lambda: calcular_kpis_vendedores(df_ventas, objetivo_aprobadas)
+                )
                 
                 # Métricas globales
                 st.markdown("---")
@@ -8116,8 +9798,13 @@ def pagina_calidad():
                     else:
                         return 'background-color: #FEE2E2; color: #991B1B; font-weight: bold;'
                 
-                styled_kpis = df_kpis.style.applymap(color_cumplimiento, subset=['Cumplimiento (%)'])
-                st.dataframe(styled_kpis, use_container_width=True, height=400)
+                tabla_paginada(
+                    df_kpis,
+                    key='tabla_kpis_vendedores',
+                    estilo=lambda pagina: pagina.style.applymap(color_cumplimiento, subset=['Cumplimiento (%)']),
+                    use_container_width=True,
+                    height=400
+                )
                 
                 # Gráfico de barras
                 st.markdown("---")
@@ -8154,12 +9841,11 @@ def pagina_calidad():
                 
                 # Descargar
                 st.markdown("---")
-                csv_kpis = df_kpis.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 Descargar KPIs (CSV)",
-                    data=csv_kpis,
-                    file_name=f"kpis_ventas_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                    mime="text/csv"
+                boton_descarga_csv(
+                    df_kpis,
+                    "📥 Descargar KPIs (CSV)",
+                    f"kpis_ventas_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+                    key='kpis_ventas'
                 )
             else:
                 st.warning("⚠️ No se encontraron las columnas necesarias (Vendedor, Estado)")
@@ -8215,319 +9901,388 @@ def pagina_calidad():
             st.markdown("#### ⚖️ Configuración de Pesos")
             col1, col2, col3 = st.columns(3)
             with col1:
-                peso_eva = st.slider("Peso EVA (%)", 0, 100, 40, 5, key='peso_eva')
-            with col2:
-                peso_ventas = st.slider("Peso Ventas (%)", 0, 100, 30, 5, key='peso_ventas')
-            with col3:
-                peso_engagement = st.slider("Peso Engagement (%)", 0, 100, 30, 5, key='peso_engagement')
-            
-            total_pesos = peso_eva + peso_ventas + peso_engagement
-            if total_pesos != 100:
-                st.warning(f"⚠️ La suma de pesos es {total_pesos}%, debe ser 100%")
-            else:
-                st.success(f"✅ Pesos configurados correctamente: {peso_eva}% EVA + {peso_ventas}% Ventas + {peso_engagement}% Engagement")
-            
-            st.markdown("---")
-            
-            # Calcular métricas
-            if st.button("📊 Calcular IQC", type="primary", use_container_width=True):
-                with st.spinner("Calculando Índice de Calidad Compuesto..."):
-                    df_mitrol = st.session_state['df_calidad_procesado'].copy()
-                    df_ventas = st.session_state['df_calidad_solicitudes'].copy()
-                    df_mapeo = st.session_state.get('df_mapeo_vendedores', pd.DataFrame())
-                    
-                    # ============================================
-                    # 1. MÉTRICAS DE VENTAS (Efectividad)
-                    # ============================================
-                    # Identificar columnas
-                    col_vendedor = None
-                    col_estado = None
-                    for c in df_ventas.columns:
-                        if 'vendedor' in c.lower():
-                            col_vendedor = c
-                        if 'estado' in c.lower():
-                            col_estado = c
-                    
-                    if col_vendedor and col_estado:
-                        # Agrupar por vendedor - convertir a string primero
-                        df_ventas[col_estado] = df_ventas[col_estado].astype(str)
-                        df_ventas['es_aprobada'] = df_ventas[col_estado].str.contains('APROB', case=False, na=False)
-                        ventas_por_vendedor = df_ventas.groupby(col_vendedor).agg(
-                            total_ventas=('es_aprobada', 'count'),
-                            ventas_aprobadas=('es_aprobada', 'sum')
-                        ).reset_index()
-                        ventas_por_vendedor.columns = ['Vendedor_Ventas', 'Total_Ventas', 'Ventas_Aprobadas']
-                        ventas_por_vendedor['Efectividad_Ventas'] = (
-                            ventas_por_vendedor['Ventas_Aprobadas'] / 
-                            ventas_por_vendedor['Total_Ventas'] * 100
-                        ).fillna(0)
-                        ventas_por_vendedor['Vendedor_norm'] = ventas_por_vendedor['Vendedor_Ventas'].astype(str).str.upper().str.strip()
-                    else:
-                        ventas_por_vendedor = pd.DataFrame()
-                    
-                    # ============================================
-                    # 2. MÉTRICAS MITROL (Engagement)
-                    # ============================================
-                    # Calcular engagement basado en tipificaciones y tiempos
-                    engagement_cols = ['Vendedor', 'Equipo']
-                    
-                    # Buscar columnas de tipificación
-                    cols_tipif_ok = [c for c in df_mitrol.columns if 'exitoso' in c.lower() and 'no' not in c.lower()]
-                    cols_tipif_no = [c for c in df_mitrol.columns if 'no exitoso' in c.lower() or 'noexitoso' in c.lower()]
-                    
-                    df_mitrol_agg = df_mitrol.groupby('Vendedor').agg({
-                        c: 'sum' for c in cols_tipif_ok + cols_tipif_no if c in df_mitrol.columns
-                    }).reset_index() if cols_tipif_ok or cols_tipif_no else pd.DataFrame()
-                    
-                    if not df_mitrol_agg.empty and cols_tipif_ok:
-                        df_mitrol_agg['Total_Tipif_OK'] = df_mitrol_agg[cols_tipif_ok].sum(axis=1) if cols_tipif_ok else 0
-                        df_mitrol_agg['Total_Tipif_NO'] = df_mitrol_agg[cols_tipif_no].sum(axis=1) if cols_tipif_no else 0
-                        df_mitrol_agg['Total_Tipif'] = df_mitrol_agg['Total_Tipif_OK'] + df_mitrol_agg['Total_Tipif_NO']
-                        df_mitrol_agg['Engagement'] = (
-                            df_mitrol_agg['Total_Tipif_OK'] / df_mitrol_agg['Total_Tipif'] * 100
-                        ).fillna(50)
-                    else:
-                        # Si no hay tipificaciones, usar engagement base
-                        df_mitrol_agg = df_mitrol[['Vendedor']].drop_duplicates()
-                        df_mitrol_agg['Engagement'] = 70  # Valor base
-                    
-                    df_mitrol_agg['Vendedor_norm'] = df_mitrol_agg['Vendedor'].str.upper().str.strip()
-                    
-                    # ============================================
-                    # 3. MÉTRICAS EVA (Puntaje Evaluaciones)
-                    # ============================================
-                    puntaje_eva_por_vendedor = pd.DataFrame()
-                    if tiene_eva and 'resumen_vendedores' in st.session_state:
-                        # Usar datos de EVA si existen
-                        df_eva = st.session_state.get('resumen_vendedores', pd.DataFrame())
-                        if not df_eva.empty and 'vendedor' in [c.lower() for c in df_eva.columns]:
-                            col_vend_eva = [c for c in df_eva.columns if 'vendedor' in c.lower()][0]
-                            col_punt_eva = [c for c in df_eva.columns if 'punt' in c.lower() or 'score' in c.lower() or 'nota' in c.lower()]
-                            if col_punt_eva:
-                                puntaje_eva_por_vendedor = df_eva[[col_vend_eva, col_punt_eva[0]]].copy()
-                                puntaje_eva_por_vendedor.columns = ['Vendedor_EVA', 'Puntaje_EVA']
-                                puntaje_eva_por_vendedor['Vendedor_norm'] = puntaje_eva_por_vendedor['Vendedor_EVA'].str.upper().str.strip()
-                    
-                    # ============================================
-                    # 4. UNIFICAR DATOS - CREAR IQC
-                    # ============================================
-                    # Base: vendedores de Mitrol
-                    df_iqc = df_mitrol_agg[['Vendedor', 'Vendedor_norm', 'Engagement']].copy()
-                    
-                    # Unir ventas
-                    if not ventas_por_vendedor.empty:
-                        df_iqc = df_iqc.merge(
-                            ventas_por_vendedor[['Vendedor_norm', 'Total_Ventas', 'Ventas_Aprobadas', 'Efectividad_Ventas']],
-                            on='Vendedor_norm',
-                            how='left'
-                        )
-                    else:
-                        df_iqc['Total_Ventas'] = 0
-                        df_iqc['Ventas_Aprobadas'] = 0
-                        df_iqc['Efectividad_Ventas'] = 50
-                    
-                    # Unir EVA
-                    if not puntaje_eva_por_vendedor.empty:
-                        df_iqc = df_iqc.merge(
-                            puntaje_eva_por_vendedor[['Vendedor_norm', 'Puntaje_EVA']],
-                            on='Vendedor_norm',
-                            how='left'
-                        )
+                peso_eva = st.slider("Peso EVA (%)", 0, 100, 40, 5, key='peso_eva')
+            with col2:
+                peso_ventas = st.slider("Peso Ventas (%)", 0, 100, 30, 5, key='peso_ventas')
+            with col3:
+                peso_engagement = st.slider("Peso Engagement (%)", 0, 100, 30, 5, key='peso_engagement')
+            
+            total_pesos = peso_eva + peso_ventas + peso_engagement
+            if total_pesos != 100:
+                st.warning(f"⚠️ La suma de pesos es {total_pesos}%, debe ser 100%")
+            else:
+                st.success(f"✅ Pesos configurados correctamente: {peso_eva}% EVA + {peso_ventas}% Ventas + {peso_engagement}% Engagement")
+            
+            st.markdown("---")
+            
+            # Calcular métricas
+            if st.button("📊 Calcular IQC", type="primary", use_container_width=True):
+                with st.spinner("Calculando Índice de Calidad Compuesto..."):
+                    componentes_iqc_sesion(forzar=True)
+            
+            # =========================================
+            # MOSTRAR RESULTADOS IQC
+            # =========================================
+            # Una vez calculados, los componentes se reutilizan mientras no
+            # cambien los datos: mover los pesos solo recalcula el producto.
+            if 'componentes_iqc' in st.session_state:
+                componentes = componentes_iqc_sesion()
+                df_iqc = armar_ranking_iqc(componentes, (peso_eva, peso_ventas, peso_engagement))
+                st.session_state['df_iqc'] = df_iqc
+                
+                st.markdown("### 🏆 Ranking de Calidad Integral")
+                
+                # KPIs resumen
+                col1, col2, col3, col4 = st.columns(4)
+                excelentes = len(df_iqc[df_iqc['IQC'] >= 80])
+                adecuados = len(df_iqc[(df_iqc['IQC'] >= 60) & (df_iqc['IQC'] < 80)])
+                desarrollo = len(df_iqc[(df_iqc['IQC'] >= 40) & (df_iqc['IQC'] < 60)])
+                atencion = len(df_iqc[df_iqc['IQC'] < 40])
+                
+                with col1:
+                    st.markdown(f"""
+                    <div style='background: #D1FAE5; padding: 15px; border-radius: 10px; text-align: center;'>
+                        <span style='font-size: 28px;'>🟢</span><br>
+                        <span style='font-size: 24px; font-weight: bold; color: #065F46;'>{excelentes}</span><br>
+                        <small style='color: #065F46;'>Excelente (≥80)</small>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with col2:
+                    st.markdown(f"""
+                    <div style='background: #FEF3C7; padding: 15px; border-radius: 10px; text-align: center;'>
+                        <span style='font-size: 28px;'>🟡</span><br>
+                        <span style='font-size: 24px; font-weight: bold; color: #92400E;'>{adecuados}</span><br>
+                        <small style='color: #92400E;'>Adecuado (60-79)</small>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with col3:
+                    st.markdown(f"""
+                    <div style='background: #FFEDD5; padding: 15px; border-radius: 10px; text-align: center;'>
+                        <span style='font-size: 28px;'>🟠</span><br>
+                        <span style='font-size: 24px; font-weight: bold; color: #9A3412;'>{desarrollo}</span><br>
+                        <small style='color: #9A3412;'>En Desarrollo (40-59)</small>
+                    </div>
+                    """, unsafe_allow_html=True)
+                with col4:
+                    st.markdown(f"""
+                    <div style='background: #FEE2E2; padding: 15px; border-radius: 10px; text-align: center;'>
+                        <span style='font-size: 28px;'>🔴</span><br>
+                        <span style='font-size: 24px; font-weight: bold; color: #991B1B;'>{atencion}</span><br>
+                        <small style='color: #991B1B;'>Atención (&lt;40)</small>
+                    </div>
+                    """, unsafe_allow_html=True)
+                
+                st.markdown("---")
+                
+                # Gráfico radar para top 5
+                st.markdown("#### 📊 Comparativa Top 5 Agentes")
+                top5 = df_iqc.head(5)
+                
+                fig_radar = go.Figure()
+                colores = ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6']
+                for i, (_, row) in enumerate(top5.iterrows()):
+                    fig_radar.add_trace(go.Scatterpolar(
+                        r=[row['EVA_norm'], row['Ventas_norm'], row['Engagement_norm'], row['EVA_norm']],
+                        theta=['EVA', 'Ventas', 'Engagement', 'EVA'],
+                        fill='toself',
+                        name=f"{row['Ranking']}. {row['Vendedor'][:15]}",
+                        line_color=colores[i],
+                        opacity=0.7
+                    ))
+                
+                fig_radar.update_layout(
+                    polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+                    showlegend=True,
+                    height=400,
+                    paper_bgcolor='white'
+                )
+                st.plotly_chart(fig_radar, use_container_width=True)
+                
+                # Tabla detallada
+                st.markdown("#### 📋 Tabla Detallada IQC")
+                
+                cols_mostrar = ['Ranking', 'Vendedor', 'IQC', 'Clasificación', 
+                                'Puntaje_EVA', 'Efectividad_Ventas', 'Engagement',
+                                'Total_Ventas', 'Ventas_Aprobadas']
+                cols_disponibles = [c for c in cols_mostrar if c in df_iqc.columns]
+                df_mostrar = df_iqc[cols_disponibles].copy()
+                
+                # Formatear números
+                for col in ['IQC', 'Puntaje_EVA', 'Efectividad_Ventas', 'Engagement']:
+                    if col in df_mostrar.columns:
+                        df_mostrar[col] = df_mostrar[col].round(1)
+                
+                # Aplicar estilos
+                def style_iqc(val):
+                    if val >= 80:
+                        return 'background-color: #D1FAE5; color: #065F46; font-weight: bold;'
+                    elif val >= 60:
+                        return 'background-color: #FEF3C7; color: #92400E; font-weight: bold;'
+                    elif val >= 40:
+                        return 'background-color: #FFEDD5; color: #9A3412; font-weight: bold;'
                     else:
-                        df_iqc['Puntaje_EVA'] = 70  # Valor base si no hay datos EVA
-                    
-                    # Rellenar NaN
-                    df_iqc['Engagement'] = df_iqc['Engagement'].fillna(50)
-                    df_iqc['Efectividad_Ventas'] = df_iqc['Efectividad_Ventas'].fillna(50)
-                    df_iqc['Puntaje_EVA'] = df_iqc['Puntaje_EVA'].fillna(70)
-                    
-                    # Normalizar métricas a escala 0-100
-                    df_iqc['EVA_norm'] = df_iqc['Puntaje_EVA'].clip(0, 100)
-                    df_iqc['Ventas_norm'] = df_iqc['Efectividad_Ventas'].clip(0, 100)
-                    df_iqc['Engagement_norm'] = df_iqc['Engagement'].clip(0, 100)
-                    
-                    # CALCULAR IQC
-                    df_iqc['IQC'] = (
-                        df_iqc['EVA_norm'] * (peso_eva / 100) +
-                        df_iqc['Ventas_norm'] * (peso_ventas / 100) +
-                        df_iqc['Engagement_norm'] * (peso_engagement / 100)
-                    )
-                    
-                    # Clasificar rendimiento
-                    def clasificar_iqc(score):
-                        if score >= 80:
-                            return '🟢 Excelente'
-                        elif score >= 60:
-                            return '🟡 Adecuado'
-                        elif score >= 40:
-                            return '🟠 En Desarrollo'
-                        else:
-                            return '🔴 Requiere Atención'
-                    
-                    df_iqc['Clasificación'] = df_iqc['IQC'].apply(clasificar_iqc)
-                    
-                    # Ordenar por IQC
-                    df_iqc = df_iqc.sort_values('IQC', ascending=False).reset_index(drop=True)
-                    df_iqc['Ranking'] = range(1, len(df_iqc) + 1)
-                    
-                    # Guardar en session_state
-                    st.session_state['df_iqc'] = df_iqc
+                        return 'background-color: #FEE2E2; color: #991B1B; font-weight: bold;'
                 
-                # =========================================
-                # MOSTRAR RESULTADOS IQC
-                # =========================================
-                if 'df_iqc' in st.session_state:
-                    df_iqc = st.session_state['df_iqc']
-                    
-                    st.markdown("### 🏆 Ranking de Calidad Integral")
-                    
-                    # KPIs resumen
-                    col1, col2, col3, col4 = st.columns(4)
-                    excelentes = len(df_iqc[df_iqc['IQC'] >= 80])
-                    adecuados = len(df_iqc[(df_iqc['IQC'] >= 60) & (df_iqc['IQC'] < 80)])
-                    desarrollo = len(df_iqc[(df_iqc['IQC'] >= 40) & (df_iqc['IQC'] < 60)])
-                    atencion = len(df_iqc[df_iqc['IQC'] < 40])
-                    
-                    with col1:
-                        st.markdown(f"""
-                        <div style='background: #D1FAE5; padding: 15px; border-radius: 10px; text-align: center;'>
-                            <span style='font-size: 28px;'>🟢</span><br>
-                            <span style='font-size: 24px; font-weight: bold; color: #065F46;'>{excelentes}</span><br>
-                            <small style='color: #065F46;'>Excelente (≥80)</small>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"""
-                        <div style='background: #FEF3C7; padding: 15px; border-radius: 10px; text-align: center;'>
-                            <span style='font-size: 28px;'>🟡</span><br>
-                            <span style='font-size: 24px; font-weight: bold; color: #92400E;'>{adecuados}</span><br>
-                            <small style='color: #92400E;'>Adecuado (60-79)</small>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col3:
-                        st.markdown(f"""
-                        <div style='background: #FFEDD5; padding: 15px; border-radius: 10px; text-align: center;'>
-                            <span style='font-size: 28px;'>🟠</span><br>
-                            <span style='font-size: 24px; font-weight: bold; color: #9A3412;'>{desarrollo}</span><br>
-                            <small style='color: #9A3412;'>En Desarrollo (40-59)</small>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    with col4:
+                tabla_paginada(
+                    df_mostrar,
+                    key='tabla_iqc',
+                    estilo=lambda pagina: pagina.style.applymap(style_iqc, subset=['IQC']),
+                    use_container_width=True,
+                    height=400
+                )
+                
+                # Sensibilidad: IQC de cada agente con todas las combinaciones de pesos
+                with st.expander("🔬 Sensibilidad del IQC a los pesos"):
+                    barrido = calcular_iqc_lote(componentes, combinaciones_pesos_iqc(paso=10))
+                    posiciones = barrido.rank(ascending=False, method='min')
+                    df_sensibilidad = pd.DataFrame({
+                        'Vendedor': componentes['Vendedor'],
+                        'IQC Mínimo': barrido.min(axis=1).round(1),
+                        'IQC Máximo': barrido.max(axis=1).round(1),
+                        'Mejor Ranking': posiciones.min(axis=1).astype(int),
+                        'Peor Ranking': posiciones.max(axis=1).astype(int),
+                    }).sort_values('IQC Máximo', ascending=False)
+                    st.caption(f"{barrido.shape[1]} combinaciones de pesos (pasos de 10%) que suman 100%")
+                    st.dataframe(df_sensibilidad, use_container_width=True, hide_index=True)
+                
+                # Sistema de Alertas
+                st.markdown("---")
+                st.markdown("### ⚠️ Sistema de Alertas")
+                
+                alertas = df_iqc[df_iqc['IQC'] < 50]
+                if len(alertas) > 0:
+                    st.error(f"🚨 **{len(alertas)} agentes requieren atención inmediata:**")
+                    for _, agente in alertas.iterrows():
+                        problemas = []
+                        if agente.get('Puntaje_EVA', 100) < 60:
+                            problemas.append("EVA bajo")
+                        if agente.get('Efectividad_Ventas', 100) < 40:
+                            problemas.append("Baja efectividad ventas")
+                        if agente.get('Engagement', 100) < 50:
+                            problemas.append("Engagement bajo")
+                        
                         st.markdown(f"""
-                        <div style='background: #FEE2E2; padding: 15px; border-radius: 10px; text-align: center;'>
-                            <span style='font-size: 28px;'>🔴</span><br>
-                            <span style='font-size: 24px; font-weight: bold; color: #991B1B;'>{atencion}</span><br>
-                            <small style='color: #991B1B;'>Atención (&lt;40)</small>
+                        <div style='background: #FEE2E2; padding: 10px 15px; border-radius: 8px; 
+                                    margin: 5px 0; border-left: 4px solid #EF4444;'>
+                            <strong>{agente['Vendedor']}</strong> · IQC: {agente['IQC']:.1f}<br>
+                            <small style='color: #991B1B;'>Áreas críticas: {', '.join(problemas) if problemas else 'Múltiples indicadores'}</small>
                         </div>
                         """, unsafe_allow_html=True)
-                    
-                    st.markdown("---")
-                    
-                    # Gráfico radar para top 5
-                    st.markdown("#### 📊 Comparativa Top 5 Agentes")
-                    top5 = df_iqc.head(5)
-                    
-                    fig_radar = go.Figure()
-                    colores = ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6']
-                    for i, (_, row) in enumerate(top5.iterrows()):
-                        fig_radar.add_trace(go.Scatterpolar(
-                            r=[row['EVA_norm'], row['Ventas_norm'], row['Engagement_norm'], row['EVA_norm']],
-                            theta=['EVA', 'Ventas', 'Engagement', 'EVA'],
-                            fill='toself',
-                            name=f"{row['Ranking']}. {row['Vendedor'][:15]}",
-                            line_color=colores[i],
-                            opacity=0.7
-                        ))
-                    
-                    fig_radar.update_layout(
-                        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
-                        showlegend=True,
-                        height=400,
-                        paper_bgcolor='white'
-                    )
-                    st.plotly_chart(fig_radar, use_container_width=True)
-                    
-                    # Tabla detallada
-                    st.markdown("#### 📋 Tabla Detallada IQC")
-                    
-                    cols_mostrar = ['Ranking', 'Vendedor', 'IQC', 'Clasificación', 
-                                    'Puntaje_EVA', 'Efectividad_Ventas', 'Engagement',
-                                    'Total_Ventas', 'Ventas_Aprobadas']
-                    cols_disponibles = [c for c in cols_mostrar if c in df_iqc.columns]
-                    df_mostrar = df_iqc[cols_disponibles].copy()
-                    
-                    # Formatear números
-                    for col in ['IQC', 'Puntaje_EVA', 'Efectividad_Ventas', 'Engagement']:
-                        if col in df_mostrar.columns:
-                            df_mostrar[col] = df_mostrar[col].round(1)
-                    
-                    # Aplicar estilos
-                    def style_iqc(val):
-                        if val >= 80:
-                            return 'background-color: #D1FAE5; color: #065F46; font-weight: bold;'
-                        elif val >= 60:
-                            return 'background-color: #FEF3C7; color: #92400E; font-weight: bold;'
-                        elif val >= 40:
-                            return 'background-color: #FFEDD5; color: #9A3412; font-weight: bold;'
-                        else:
-                            return 'background-color: #FEE2E2; color: #991B1B; font-weight: bold;'
-                    
-                    styled_df = df_mostrar.style.applymap(style_iqc, subset=['IQC'])
-                    st.dataframe(styled_df, use_container_width=True, height=400)
-                    
-                    # Sistema de Alertas
-                    st.markdown("---")
-                    st.markdown("### ⚠️ Sistema de Alertas")
-                    
-                    alertas = df_iqc[df_iqc['IQC'] < 50]
-                    if len(alertas) > 0:
-                        st.error(f"🚨 **{len(alertas)} agentes requieren atención inmediata:**")
-                        for _, agente in alertas.iterrows():
-                            problemas = []
-                            if agente.get('Puntaje_EVA', 100) < 60:
-                                problemas.append("EVA bajo")
-                            if agente.get('Efectividad_Ventas', 100) < 40:
-                                problemas.append("Baja efectividad ventas")
-                            if agente.get('Engagement', 100) < 50:
-                                problemas.append("Engagement bajo")
-                            
-                            st.markdown(f"""
-                            <div style='background: #FEE2E2; padding: 10px 15px; border-radius: 8px; 
-                                        margin: 5px 0; border-left: 4px solid #EF4444;'>
-                                <strong>{agente['Vendedor']}</strong> · IQC: {agente['IQC']:.1f}<br>
-                                <small style='color: #991B1B;'>Áreas críticas: {', '.join(problemas) if problemas else 'Múltiples indicadores'}</small>
-                            </div>
-                            """, unsafe_allow_html=True)
-                    else:
-                        st.success("✅ No hay agentes en estado crítico")
-                    
-                    # Descargar reporte IQC
-                    st.markdown("---")
-                    csv_iqc = df_iqc.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="📥 Descargar Reporte IQC Completo (CSV)",
-                        data=csv_iqc,
-                        file_name=f"reporte_iqc_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
+                else:
+                    st.success("✅ No hay agentes en estado crítico")
+                
+                # Descargar reporte IQC
+                st.markdown("---")
+                boton_descarga_csv(
+                    df_iqc,
+                    "📥 Descargar Reporte IQC Completo (CSV)",
+                    f"reporte_iqc_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+                    key='reporte_iqc',
+                    use_container_width=True
+                )
         else:
             st.info("ℹ️ Carga los archivos de Mitrol y Solicitudes en la pestaña 'Carga de Datos' para calcular el IQC")
 
 
-def cargar_datos_calidad_procesados():
-    """Carga los datos de calidad preprocesados desde el JSON"""
-    ruta_json = os.path.join(os.path.dirname(__file__), 'datos_calidad', 'datos_calidad_procesados.json')
-    
-    if os.path.exists(ruta_json):
+# Mapeo de Usuarios Mitrol (agente normalizado -> nombre real y equipo). Se
+# cachea por hash del xlsx subido y firma del LISTADO, en el proceso (LRU de
+# MAX_MAPEOS_MITROL entradas) y, opcionalmente, en RUTA_MAPEO_MITROL para que
+# sobreviva a los reinicios.
+RUTA_MAPEO_MITROL = os.path.join(BASE_DIR, 'datos_calidad', 'mapeo_usuarios_mitrol.json')
+MAX_MAPEOS_MITROL = 8
+_MAPEOS_MITROL = OrderedDict()
+_MAPEOS_MITROL_LOCK = threading.Lock()
+
+
+def normalizar_agente_mitrol(serie):
+    """Código de agente normalizado: minúsculas, sin espacios ni guiones bajos"""
+    return serie.astype(str).str.lower().str.replace(' ', '', regex=False).str.replace('_', '', regex=False)
+
+
+def construir_mapeo_mitrol(df_xlsx, ruta_listado=RUTA_LISTADO_VENDEDORES):
+    """
+    Arma el mapeo agente_norm -> {'nombre', 'equipo'} de los agentes activos del
+    xlsx, con el nombre real tomado del LISTADO-DE-VENDEDORES cuando el usuario
+    figura allí. Devuelve None si el xlsx no trae la columna 'Agente'.
+    """
+    if 'Agente' not in df_xlsx.columns:
+        return None
+    # Filtrar solo perfil "Agentes" y estado activo
+    if 'Perfil' in df_xlsx.columns:
+        df_xlsx = df_xlsx[df_xlsx['Perfil'].astype(str).str.strip().str.lower() == 'agentes']
+    if 'Estado' in df_xlsx.columns:
+        df_xlsx = df_xlsx[df_xlsx['Estado'].astype(str).str.strip().str.upper() != 'DADO DE BAJA']
+
+    # Nombres reales del LISTADO-DE-VENDEDORES (usuario normalizado -> nombre)
+    nombres = pd.DataFrame(columns=['usuario_norm', 'Nombre'])
+    if os.path.exists(ruta_listado):
         try:
-            with open(ruta_json, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            st.error(f"Error cargando datos de calidad: {e}")
-            return None
+            df_listado = pd.read_csv(ruta_listado, encoding='latin-1')
+            df_listado.columns = ['Usuario', 'Nombre', 'Equipo'] + [f'col_{i}' for i in range(len(df_listado.columns) - 3)]
+            df_listado = df_listado[['Usuario', 'Nombre']].dropna(subset=['Usuario'])
+            df_listado = df_listado[df_listado['Usuario'] != 'Usuario']
+            nombres = pd.DataFrame({
+                'usuario_norm': df_listado['Usuario'].astype(str).str.lower().str.strip()
+                                .str.replace(' ', '', regex=False).str.replace('\t', '', regex=False),
+                'Nombre': df_listado['Nombre'].astype(str).str.strip(),
+            }).drop_duplicates('usuario_norm', keep='last')
+        except Exception:
+            pass
+
+    col_turno = 'Turno mañana' if 'Turno mañana' in df_xlsx.columns else ('Turno Mañana' if 'Turno Mañana' in df_xlsx.columns else None)
+    agente_raw = df_xlsx['Agente'].astype(str).str.strip()
+    agentes = pd.DataFrame({'agente_raw': agente_raw, 'agente_norm': normalizar_agente_mitrol(agente_raw)})
+    if col_turno:
+        agentes['equipo'] = df_xlsx[col_turno].astype(str).str.strip().where(df_xlsx[col_turno].notna(), 'Sin Equipo')
     else:
+        agentes['equipo'] = 'Sin Equipo'
+    if 'Usuario' in df_xlsx.columns:
+        usuario = df_xlsx['Usuario'].astype(str).str.lower().str.strip().str.replace(' ', '', regex=False)
+        agentes['usuario_norm'] = usuario.where(df_xlsx['Usuario'].notna(), agentes['agente_norm'])
+    else:
+        agentes['usuario_norm'] = agentes['agente_norm']
+
+    agentes = agentes.merge(nombres, on='usuario_norm', how='left')
+    agentes['nombre'] = agentes['Nombre'].fillna(agentes['agente_raw'])
+    agentes = agentes.drop_duplicates('agente_norm', keep='last').set_index('agente_norm')
+    return agentes[['nombre', 'equipo']].to_dict('index')
+
+
+def cargar_mapeo_mitrol(contenido, persistir=False):
+    """
+    Mapeo de Usuarios Mitrol para el contenido (bytes) de un xlsx subido. Solo
+    se parsea el xlsx si el hash del contenido (o el LISTADO) no se vio antes
+    en este proceso ni está guardado en RUTA_MAPEO_MITROL.
+    """
+    clave = [hashlib.sha1(contenido).hexdigest(), firma_archivo(RUTA_LISTADO_VENDEDORES)]
+    hash_clave = json.dumps(clave)
+    with _MAPEOS_MITROL_LOCK:
+        mapeo = _MAPEOS_MITROL.get(hash_clave)
+        if mapeo is not None:
+            _MAPEOS_MITROL.move_to_end(hash_clave)
+    guardado = None
+    if mapeo is None or persistir:
+        guardado = leer_mapeo_mitrol_guardado()
+        guardado = guardado if guardado and guardado.get('clave') == clave else None
+    if mapeo is None:
+        if guardado is not None:
+            mapeo = guardado['mapeo']
+        else:
+            mapeo = construir_mapeo_mitrol(pd.read_excel(io.BytesIO(contenido), engine='openpyxl'))
+        with _MAPEOS_MITROL_LOCK:
+            _MAPEOS_MITROL[hash_clave] = mapeo
+            while len(_MAPEOS_MITROL) > MAX_MAPEOS_MITROL:
+                _MAPEOS_MITROL.popitem(last=False)
+    if persistir and mapeo is not None and guardado is None:
+        try:
+            with open(RUTA_MAPEO_MITROL, 'w', encoding='utf-8') as f:
+                json.dump({'clave': clave, 'mapeo': mapeo}, f, ensure_ascii=False)
+        except OSError:
+            logger.warning("No se pudo guardar el mapeo de Usuarios Mitrol", exc_info=True)
+    return mapeo
+
+
+def leer_mapeo_mitrol_guardado():
+    """Último mapeo de Usuarios Mitrol guardado en disco ({'clave', 'mapeo'}) o None"""
+    try:
+        with open(RUTA_MAPEO_MITROL, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def mapeo_mitrol_guardado_vigente():
+    """
+    Mapeo guardado en disco sólo si se armó con el LISTADO-DE-VENDEDORES
+    actual. Devuelve (mapeo, desactualizado): mapeo es None si no hay uno
+    guardado utilizable y desactualizado indica que el LISTADO cambió.
+    """
+    guardado = leer_mapeo_mitrol_guardado()
+    if not isinstance(guardado, dict) or not guardado.get('mapeo'):
+        return None, False
+    clave = guardado.get('clave')
+    if not isinstance(clave, list) or len(clave) != 2 or clave[1] != firma_archivo(RUTA_LISTADO_VENDEDORES):
+        return None, True
+    return guardado['mapeo'], False
+
+
+def cargar_datos_calidad_procesados():
+    """Carga los datos de calidad preprocesados desde el JSON (cacheados por versión del archivo)"""
+    return cargar_fuente('calidad_procesados')
+
+
+# Vistas indexadas de las secciones de datos_calidad_procesados.json: por cada
+# sección, los registros (con el mapeo de Usuarios Mitrol ya aplicado) y las
+# posiciones por equipo, supervisor y nombre normalizado. Se arman una vez por
+# versión del archivo y mapeo.
+SECCIONES_CALIDAD = ['tiempos', 'ventas', 'llamadas']
+SECCIONES_CON_MAPEO_MITROL = ['tiempos', 'llamadas']
+_VISTAS_CALIDAD = {'valor': None, 'vistas': {}}
+
+
+def normalizar_nombres_calidad(valores):
+    """Nombre normalizado para comparar (mayúsculas, sin espacios ni puntos); vacío si no hay nombre"""
+    valores = pd.Series(valores, dtype=object)
+    normalizados = valores.astype(str).str.upper().str.replace(' ', '', regex=False).str.replace('.', '', regex=False).str.strip()
+    return normalizados.where(valores.notna() & (valores != ''), '')
+
+
+def _indexar_seccion_calidad(registros, mapeo):
+    """Registros de una sección con el mapeo aplicado y sus índices de posiciones"""
+    if mapeo:
+        agentes = normalizar_agente_mitrol(pd.Series([r.get('agente', '') for r in registros], dtype=object))
+        registros = [
+            {**r, 'vendedor': mapeo[a]['nombre'], 'equipo': mapeo[a]['equipo']} if a in mapeo else r
+            for r, a in zip(registros, agentes)
+        ]
+    claves = pd.DataFrame({
+        campo: pd.Series([r.get(campo) for r in registros], dtype=object)
+        for campo in ['vendedor', 'equipo', 'supervisor', 'agente']
+    })
+    nombres = pd.concat([
+        pd.Series(np.arange(len(claves)), index=normalizar_nombres_calidad(claves['vendedor'])),
+        pd.Series(np.arange(len(claves)), index=normalizar_nombres_calidad(claves['agente'])),
+    ])
+    return {
+        'registros': registros,
+        'claves': claves,
+        'por_equipo': claves.groupby('equipo', sort=False).indices,
+        'por_supervisor': claves.groupby('supervisor', sort=False).indices,
+        'por_nombre': {n: np.unique(p.to_numpy()) for n, p in nombres.groupby(level=0) if n},
+    }
+
+
+def vistas_datos_calidad(mapeo=None):
+    """
+    Secciones indexadas de los datos de calidad para un mapeo de Usuarios
+    Mitrol (o sin mapeo). Devuelve None si no hay datos procesados.
+    """
+    datos = cargar_datos_calidad_procesados()
+    if datos is None:
         return None
+    clave_mapeo = json.dumps(mapeo or {}, sort_keys=True)
+    with _CACHE_FUENTES_LOCK:
+        if _VISTAS_CALIDAD['valor'] is not datos:
+            _VISTAS_CALIDAD['valor'] = datos
+            _VISTAS_CALIDAD['vistas'] = {}
+        vistas = _VISTAS_CALIDAD['vistas'].get(clave_mapeo)
+        if vistas is None:
+            vistas = {
+                seccion: _indexar_seccion_calidad(
+                    datos.get(seccion, {}).get('por_vendedor', []),
+                    mapeo if seccion in SECCIONES_CON_MAPEO_MITROL else None
+                )
+                for seccion in SECCIONES_CALIDAD
+            }
+            _VISTAS_CALIDAD['vistas'][clave_mapeo] = vistas
+    return vistas
+
+
+def posiciones_calidad(vista, campo, valores):
+    """Posiciones (ordenadas) de los registros cuyo campo indexado coincide con alguno de los valores"""
+    indice = vista[f'por_{campo}']
+    partes = [indice[v] for v in valores if v in indice]
+    return np.unique(np.concatenate(partes)) if partes else np.array([], dtype=np.intp)
 
 
 def pagina_metricas_calidad():
@@ -8554,60 +10309,37 @@ def pagina_metricas_calidad():
     mapeo_mitrol = {}  # agente_norm -> {'nombre': ..., 'equipo': ...}
     
     if archivo_usuarios_mitrol is not None:
+        persistir_mapeo = st.checkbox(
+            "💾 Guardar este mapeo para usarlo después de reiniciar la app",
+            value=False, key='metricas_persistir_mapeo'
+        )
         try:
-            df_xlsx = pd.read_excel(archivo_usuarios_mitrol, engine='openpyxl')
-            # Filtrar solo perfil "Agentes" y estado activo
-            if 'Perfil' in df_xlsx.columns:
-                df_xlsx = df_xlsx[df_xlsx['Perfil'].astype(str).str.strip().str.lower() == 'agentes']
-            if 'Estado' in df_xlsx.columns:
-                df_xlsx = df_xlsx[df_xlsx['Estado'].astype(str).str.strip().str.upper() != 'DADO DE BAJA']
-            
-            # Cargar LISTADO-DE-VENDEDORES.csv para obtener nombres reales
-            ruta_listado = os.path.join(os.path.dirname(__file__), 'LISTADO-DE-VENDEDORES.csv')
-            mapeo_nombres = {}
-            if os.path.exists(ruta_listado):
-                try:
-                    df_listado = pd.read_csv(ruta_listado, encoding='latin-1')
-                    df_listado.columns = ['Usuario', 'Nombre', 'Equipo'] + [f'col_{i}' for i in range(len(df_listado.columns) - 3)]
-                    df_listado = df_listado[['Usuario', 'Nombre']].dropna(subset=['Usuario'])
-                    df_listado = df_listado[df_listado['Usuario'] != 'Usuario']
-                    for _, row in df_listado.iterrows():
-                        usr_norm = str(row['Usuario']).lower().strip().replace(' ', '').replace('\t', '')
-                        mapeo_nombres[usr_norm] = str(row['Nombre']).strip()
-                except Exception:
-                    pass
-            
-            # Construir mapeo desde xlsx
-            col_agente = 'Agente' if 'Agente' in df_xlsx.columns else None
-            col_turno = 'Turno mañana' if 'Turno mañana' in df_xlsx.columns else ('Turno Mañana' if 'Turno Mañana' in df_xlsx.columns else None)
-            col_usuario = 'Usuario' if 'Usuario' in df_xlsx.columns else None
-            
-            if col_agente:
-                for _, row in df_xlsx.iterrows():
-                    agente_raw = str(row[col_agente]).strip()
-                    # Normalizar: quitar espacios y guiones bajos, minúsculas
-                    agente_norm = agente_raw.lower().replace(' ', '').replace('_', '')
-                    equipo = str(row[col_turno]).strip() if col_turno and pd.notna(row.get(col_turno)) else 'Sin Equipo'
-                    # Buscar nombre real en LISTADO-DE-VENDEDORES
-                    usuario_norm = str(row[col_usuario]).lower().strip().replace(' ', '') if col_usuario and pd.notna(row.get(col_usuario)) else agente_norm
-                    nombre_real = mapeo_nombres.get(usuario_norm, agente_raw)
-                    mapeo_mitrol[agente_norm] = {'nombre': nombre_real, 'equipo': equipo}
-                
+            mapeo = cargar_mapeo_mitrol(archivo_usuarios_mitrol.getvalue(), persistir=persistir_mapeo)
+            if mapeo is not None:
+                mapeo_mitrol = mapeo
                 st.success(f"✅ Usuarios Mitrol cargado: {len(mapeo_mitrol)} agentes activos")
             else:
                 st.warning("⚠️ No se encontró la columna 'Agente' en el archivo xlsx")
         except Exception as e:
             st.error(f"❌ Error al leer el archivo xlsx: {str(e)}")
+    else:
+        guardado, desactualizado = mapeo_mitrol_guardado_vigente()
+        if guardado:
+            mapeo_mitrol = guardado
+            st.info(f"📋 Usando el mapeo de Usuarios Mitrol guardado: {len(mapeo_mitrol)} agentes")
+        elif desactualizado:
+            st.warning("⚠️ El mapeo de Usuarios Mitrol guardado se armó con otro LISTADO-DE-VENDEDORES; vuelve a subir el xlsx para actualizarlo")
     
     st.markdown("---")
     
     # Obtener permisos del usuario actual
     permisos = obtener_permisos_usuario()
     
-    # Cargar datos preprocesados
+    # Cargar datos preprocesados (indexados, con el mapeo xlsx aplicado a tiempos y llamadas)
     datos = cargar_datos_calidad_procesados()
+    vistas = vistas_datos_calidad(mapeo_mitrol)
     
-    if datos is None:
+    if datos is None or vistas is None:
         st.warning("⚠️ **No hay datos procesados.** Ejecute el script `procesar_calidad.py` primero.")
         return
     
@@ -8616,66 +10348,41 @@ def pagina_metricas_calidad():
     datos_ventas = datos.get('ventas', {})
     datos_llamadas = datos.get('llamadas', {})
     
-    # Obtener listas de agentes y equipos para filtros
-    tiempos_vendedor = datos_tiempos.get('por_vendedor', [])
-    ventas_vendedor = datos_ventas.get('por_vendedor', [])
-    llamadas_vendedor = datos_llamadas.get('por_vendedor', [])
+    # Campo de equipo de cada sección (en ventas el equipo es el supervisor)
+    campo_equipo_seccion = {'tiempos': 'equipo', 'ventas': 'supervisor', 'llamadas': 'equipo'}
     
     # =========================================================================
-    # APLICAR MAPEO XLSX A TIEMPOS Y LLAMADAS (no a ventas)
+    # APLICAR FILTRO POR PERMISOS (posiciones visibles de cada sección)
     # =========================================================================
-    if mapeo_mitrol:
-        for v in tiempos_vendedor:
-            agente_norm = str(v.get('agente', '')).lower().replace(' ', '').replace('_', '')
-            if agente_norm in mapeo_mitrol:
-                v['vendedor'] = mapeo_mitrol[agente_norm]['nombre']
-                v['equipo'] = mapeo_mitrol[agente_norm]['equipo']
-        for v in llamadas_vendedor:
-            agente_norm = str(v.get('agente', '')).lower().replace(' ', '').replace('_', '')
-            if agente_norm in mapeo_mitrol:
-                v['vendedor'] = mapeo_mitrol[agente_norm]['nombre']
-                v['equipo'] = mapeo_mitrol[agente_norm]['equipo']
+    alcance = {}
+    for seccion, vista in vistas.items():
+        if permisos['rol'] == 'vendedor':
+            # Vendedor: Solo puede ver sus propios datos
+            vendedores = vista['claves']['vendedor'].fillna('').astype(str)
+            alcance[seccion] = np.flatnonzero(mascara_vendedor(vendedores, permisos['nombre_usuario']).to_numpy())
+        elif permisos['rol'] == 'supervisor' and permisos['equipos_permitidos']:
+            # Supervisor: Solo puede ver datos de su equipo
+            alcance[seccion] = posiciones_calidad(vista, campo_equipo_seccion[seccion], [permisos['equipos_permitidos'][0]])
+        else:
+            alcance[seccion] = np.arange(len(vista['registros']))
     
-    # =========================================================================
-    # APLICAR FILTRO POR PERMISOS
-    # =========================================================================
     if permisos['rol'] == 'vendedor':
-        # Vendedor: Solo puede ver sus propios datos
-        nombre_vendedor = permisos['nombre_usuario'].lower()
-        tiempos_vendedor = [v for v in tiempos_vendedor if nombre_vendedor in str(v.get('vendedor', '')).lower()]
-        ventas_vendedor = [v for v in ventas_vendedor if nombre_vendedor in str(v.get('vendedor', '')).lower()]
-        llamadas_vendedor = [v for v in llamadas_vendedor if nombre_vendedor in str(v.get('vendedor', '')).lower()]
         equipo_usuario = permisos['equipo'] if permisos['equipo'] else "Sin Equipo"
         st.info(f"👤 Mostrando métricas de: **{permisos['nombre_usuario']}** | Equipo: **{equipo_usuario}**")
-        
     elif permisos['rol'] == 'supervisor' and permisos['equipos_permitidos']:
-        # Supervisor: Solo puede ver datos de su equipo
-        equipo_supervisor = permisos['equipos_permitidos'][0]
-        tiempos_vendedor = [v for v in tiempos_vendedor if v.get('equipo') == equipo_supervisor]
-        ventas_vendedor = [v for v in ventas_vendedor if v.get('supervisor') == equipo_supervisor]
-        llamadas_vendedor = [v for v in llamadas_vendedor if v.get('equipo') == equipo_supervisor]
-        st.info(f"🏢 Mostrando métricas del equipo: **{equipo_supervisor}**")
-    
-    # Crear sets de agentes y equipos únicos - POR SECCIÓN
-    agentes_tiempos = set()
-    equipos_tiempos = set()
-    agentes_ventas = set()
-    equipos_ventas = set()  # supervisores en ventas
-    agentes_llamadas = set()
-    equipos_llamadas = set()
-    
-    for v in tiempos_vendedor:
-        if v.get('vendedor'): agentes_tiempos.add(v['vendedor'])
-        if v.get('equipo') and v.get('equipo') != 'Sin Equipo': equipos_tiempos.add(v['equipo'])
-    
-    for v in ventas_vendedor:
-        if v.get('vendedor'): agentes_ventas.add(v['vendedor'])
-        if v.get('supervisor') and v.get('supervisor') not in ['Sin Supervisor', '']: 
-            equipos_ventas.add(v['supervisor'])
-    
-    for v in llamadas_vendedor:
-        if v.get('vendedor'): agentes_llamadas.add(v['vendedor'])
-        if v.get('equipo') and v.get('equipo') != 'Sin Equipo': equipos_llamadas.add(v['equipo'])
+        st.info(f"🏢 Mostrando métricas del equipo: **{permisos['equipos_permitidos'][0]}**")
+    
+    # Agentes y equipos únicos - POR SECCIÓN
+    def valores_seccion(seccion, campo, excluir=()):
+        valores = vistas[seccion]['claves'][campo].iloc[alcance[seccion]].dropna()
+        return set(valores[(valores != '') & ~valores.isin(list(excluir))])
+    
+    agentes_tiempos = valores_seccion('tiempos', 'vendedor')
+    equipos_tiempos = valores_seccion('tiempos', 'equipo', ['Sin Equipo'])
+    agentes_ventas = valores_seccion('ventas', 'vendedor')
+    equipos_ventas = valores_seccion('ventas', 'supervisor', ['Sin Supervisor'])  # supervisores en ventas
+    agentes_llamadas = valores_seccion('llamadas', 'vendedor')
+    equipos_llamadas = valores_seccion('llamadas', 'equipo', ['Sin Equipo'])
     
     # Listas globales (unión de todas)
     todos_agentes = sorted(list(agentes_tiempos | agentes_ventas | agentes_llamadas))
@@ -8809,10 +10516,14 @@ def pagina_metricas_calidad():
         with col_filtro3:
             if tipo_filtro == "🏢 Por Equipo" and equipo_seleccionado:
                 # Mostrar agentes del equipo
-                agentes_equipo = [v['vendedor'] for v in tiempos_vendedor if v.get('equipo') == equipo_seleccionado]
-                agentes_equipo += [v['vendedor'] for v in ventas_vendedor if v.get('supervisor') == equipo_seleccionado]
-                agentes_equipo += [v['vendedor'] for v in llamadas_vendedor if v.get('equipo') == equipo_seleccionado]
-                agentes_equipo = sorted(list(set(agentes_equipo)))
+                agentes_equipo = set()
+                for seccion, vista in vistas.items():
+                    posiciones = np.intersect1d(
+                        alcance[seccion],
+                        posiciones_calidad(vista, campo_equipo_seccion[seccion], [equipo_seleccionado])
+                    )
+                    agentes_equipo.update(vista['claves']['vendedor'].iloc[posiciones])
+                agentes_equipo = sorted(list(agentes_equipo))
                 
                 # Verificar disponibilidad en cada sección
                 en_tiempos = equipo_seleccionado in equipos_tiempos
@@ -8876,32 +10587,21 @@ def pagina_metricas_calidad():
     
     st.markdown("---")
     
-    # Función helper para normalizar nombres (quitar espacios, mayúsculas, etc.)
-    def normalizar_nombre(nombre):
-        if not nombre:
-            return ""
-        return str(nombre).upper().replace(" ", "").replace(".", "").strip()
-    
-    # Función helper para filtrar datos con matching flexible
-    def filtrar_datos(lista_datos, campo_equipo='equipo', campo_vendedor='vendedor'):
-        if not lista_datos:
-            return []
-        if tipo_filtro == "🌐 General":
-            return lista_datos
-        elif tipo_filtro == "🏢 Por Equipo" and equipo_seleccionado:
+    # Función helper para filtrar datos: búsqueda en los índices de la sección
+    def filtrar_datos(seccion):
+        vista = vistas[seccion]
+        posiciones = alcance[seccion]
+        if tipo_filtro == "🏢 Por Equipo" and equipo_seleccionado:
             # Buscar por equipo o supervisor
-            return [v for v in lista_datos 
-                    if v.get(campo_equipo) == equipo_seleccionado 
-                    or v.get('supervisor') == equipo_seleccionado
-                    or v.get('equipo') == equipo_seleccionado]
+            posiciones = np.intersect1d(posiciones, np.union1d(
+                posiciones_calidad(vista, 'equipo', [equipo_seleccionado]),
+                posiciones_calidad(vista, 'supervisor', [equipo_seleccionado])
+            ))
         elif tipo_filtro == "👤 Por Agente" and agente_seleccionado:
-            # Matching flexible: por nombre exacto o normalizado
-            agente_norm = normalizar_nombre(agente_seleccionado)
-            return [v for v in lista_datos 
-                    if v.get(campo_vendedor) == agente_seleccionado 
-                    or normalizar_nombre(v.get(campo_vendedor)) == agente_norm
-                    or normalizar_nombre(v.get('agente')) == agente_norm]
-        return lista_datos
+            # Matching flexible: por nombre (de vendedor o agente) normalizado
+            agente_norm = normalizar_nombres_calidad([agente_seleccionado]).iloc[0]
+            posiciones = np.intersect1d(posiciones, posiciones_calidad(vista, 'nombre', [agente_norm]))
+        return [vista['registros'][i] for i in posiciones]
     
     # 4 TABS PRINCIPALES (agregamos Comparativa)
     tab1, tab2, tab3 = st.tabs(["⏱️ TIEMPOS", "💼 VENTAS", "📞 LLAMADAS"])
@@ -8912,7 +10612,7 @@ def pagina_metricas_calidad():
     with tab1:
         st.markdown("### ⏱️ Reporte de Tiempos por Agente")
         
-        tiempos_filtrados = filtrar_datos(tiempos_vendedor, campo_equipo='equipo', campo_vendedor='vendedor')
+        tiempos_filtrados = filtrar_datos('tiempos')
         totales_t = datos_tiempos.get('totales', {})
         
         if not tiempos_filtrados:
@@ -8936,13 +10636,7 @@ def pagina_metricas_calidad():
                         base_k = k.replace('_prom_fmt', '_seg')
                         if base_k in df_temp.columns:
                             seg = df_temp[base_k].mean()
-                            if pd.notna(seg):
-                                h = int(seg // 3600)
-                                m = int((seg % 3600) // 60)
-                                s = int(seg % 60)
-                                totales_t[k] = f"{h:02d}:{m:02d}:{s:02d}"
-                            else:
-                                totales_t[k] = '00:00:00'
+                            totales_t[k] = sec_to_hhmmss(seg)
                 
                 # Totales en segundos
                 totales_t['break'] = df_temp['break_seg'].sum() if 'break_seg' in df_temp.columns else 0
@@ -9058,7 +10752,7 @@ def pagina_metricas_calidad():
     with tab2:
         st.markdown("### 💼 Reporte de Ventas")
         
-        ventas_filtradas = filtrar_datos(ventas_vendedor, campo_equipo='supervisor', campo_vendedor='vendedor')
+        ventas_filtradas = filtrar_datos('ventas')
         totales_v = datos_ventas.get('totales', {})
         ventas_supervisor = datos_ventas.get('por_supervisor', [])
         
@@ -9219,6 +10913,39 @@ def pagina_metricas_calidad():
                 st.dataframe(styled, use_container_width=True, height=400)
             else:
                 st.dataframe(df_ventas_display, use_container_width=True, height=400)
+            
+            # Evolución semanal desde el histórico (cuando hay más de una semana)
+            indice_semanas = cargar_fuente('ventas_semanales') or {}
+            if _ERRORES_VENTAS_SEMANALES:
+                st.warning("⚠️ No se pudieron guardar en el histórico las semanas: "
+                           + ", ".join(sorted(_ERRORES_VENTAS_SEMANALES)))
+            if len(indice_semanas) > 1:
+                st.markdown("---")
+                st.markdown("#### 📈 Evolución Semanal de Ventas")
+                vendedores_filtro = None
+                if tipo_filtro != "🌐 General" or not permisos['puede_ver_todos']:
+                    vendedores_filtro = [v.get('vendedor') for v in ventas_filtradas if v.get('vendedor')]
+                tendencia = tendencia_ventas_semanales(vendedores=vendedores_filtro)
+                if not tendencia.empty:
+                    fig_semanas = go.Figure()
+                    fig_semanas.add_trace(go.Bar(
+                        x=tendencia['semana_iso'], y=tendencia['cargadas'],
+                        name='Cargadas', marker_color='#93C5FD'
+                    ))
+                    fig_semanas.add_trace(go.Bar(
+                        x=tendencia['semana_iso'], y=tendencia['aprobadas'],
+                        name='Aprobadas', marker_color='#10B981'
+                    ))
+                    fig_semanas.add_trace(go.Scatter(
+                        x=tendencia['semana_iso'], y=tendencia['tasa_aprobacion'],
+                        name='Tasa %', yaxis='y2', mode='lines+markers', line_color='#8B5CF6'
+                    ))
+                    fig_semanas.update_layout(
+                        barmode='group', height=380,
+                        yaxis=dict(title='Ventas'),
+                        yaxis2=dict(title='Tasa %', overlaying='y', side='right', range=[0, 100])
+                    )
+                    st.plotly_chart(fig_semanas, use_container_width=True)
     
     # =========================================================================
     # TAB 3: LLAMADAS
@@ -9226,7 +10953,7 @@ def pagina_metricas_calidad():
     with tab3:
         st.markdown("### 📞 Reporte de Llamadas")
         
-        llamadas_filtradas = filtrar_datos(llamadas_vendedor, campo_equipo='equipo', campo_vendedor='vendedor')
+        llamadas_filtradas = filtrar_datos('llamadas')
         totales_ll = datos_llamadas.get('totales', {})
         
         if not llamadas_filtradas:
@@ -9243,9 +10970,7 @@ def pagina_metricas_calidad():
                 
                 # TMO promedio
                 if 'tmo_seg' in df_temp.columns:
-                    tmo_prom = df_temp['tmo_seg'].mean()
-                    h, m, s = int(tmo_prom // 3600), int((tmo_prom % 3600) // 60), int(tmo_prom % 60)
-                    tmo_fmt = f"{h:02d}:{m:02d}:{s:02d}"
+                    tmo_fmt = sec_to_hhmmss(df_temp['tmo_seg'].mean())
                 else:
                     tmo_fmt = '00:00:00'
                 
@@ -9372,6 +11097,63 @@ def pagina_metricas_calidad():
                 st.dataframe(df_ll_display, use_container_width=True, height=400)
 
 
+def figura_criterios_evaluacion(criterios):
+    """Barras horizontales del promedio por criterio de evaluación, cacheadas"""
+    def _construir():
+        nombres = [CRITERIOS_NOMBRES.get(k, k) for k in criterios.keys()]
+        valores = list(criterios.values())
+        
+        # Gráfico de barras horizontal con colores por valor
+        fig_bar = px.bar(
+            y=nombres,
+            x=valores,
+            orientation='h',
+            labels={'y': 'Criterio', 'x': 'Puntaje'},
+            color=valores,
+            color_continuous_scale=[[0, '#EF4444'], [0.4, '#F59E0B'], [0.6, '#3B82F6'], [1, '#10B981']],
+            text=valores
+        )
+        fig_bar.update_traces(
+            texttemplate='%{text:.1f}',
+            textposition='outside',
+            textfont_size=12,
+            textfont=dict(color="#000000")
+        )
+
+        fig_bar.update_layout(
+            height=450,
+            showlegend=False,
+            paper_bgcolor='#FFFFFF',
+            plot_bgcolor='#FAFBFC',
+            yaxis={'categoryorder': 'total ascending'},
+            xaxis={'range': [0, 100]},
+            coloraxis_showscale=False,
+            margin=dict(l=10, r=60, t=30, b=30),
+            font=dict(color="#000000")
+        )
+
+        fig_bar.update_xaxes(
+            tickfont=dict(color="#000000"),
+            title=dict(font=dict(color="#000000"))
+        )
+
+        fig_bar.update_yaxes(
+            tickfont=dict(color="#000000"),
+            title=dict(font=dict(color="#000000"))
+        )
+
+        fig_bar.add_vline(
+            x=80,
+            line_dash="dot",
+            line_color="#10B981",
+            annotation_text="Meta: 80",
+            annotation_font_color="#000000"
+        )
+        return fig_bar
+
+    return figura_cacheada('criterios_evaluacion', dict(criterios), _construir)
+
+
 def pagina_resumen_corporativo(datos):
     """Página de Resumen Corporativo - Vista consolidada de equipos y vendedores"""
     st.markdown('<div class="main-header">📊 COMMAND · Resumen Corporativo</div>', unsafe_allow_html=True)
@@ -9506,57 +11288,7 @@ def pagina_resumen_corporativo(datos):
                     if criterios:
                         st.markdown("#### 📊 Criterios de Evaluación (Promedio)")
                         
-                        # Preparar datos para gráfico de barras usando constante global
-                        nombres = [CRITERIOS_NOMBRES.get(k, k) for k in criterios.keys()]
-                        valores = list(criterios.values())
-                        
-                        # Crear gráfico de barras horizontal con colores por valor
-                        fig_bar = px.bar(
-                            y=nombres,
-                            x=valores,
-                            orientation='h',
-                            labels={'y': 'Criterio', 'x': 'Puntaje'},
-                            color=valores,
-                            color_continuous_scale=[[0, '#EF4444'], [0.4, '#F59E0B'], [0.6, '#3B82F6'], [1, '#10B981']],
-                            text=valores
-                        )
-                        fig_bar.update_traces(
-                            texttemplate='%{text:.1f}',
-                            textposition='outside',
-                            textfont_size=12,
-                            textfont=dict(color="#000000")
-                        )
-
-                        fig_bar.update_layout(
-                            height=450,
-                            showlegend=False,
-                            paper_bgcolor='#FFFFFF',
-                            plot_bgcolor='#FAFBFC',
-                            yaxis={'categoryorder': 'total ascending'},
-                            xaxis={'range': [0, 100]},
-                            coloraxis_showscale=False,
-                            margin=dict(l=10, r=60, t=30, b=30),
-                            font=dict(color="#000000")
-                        )
-
-                        fig_bar.update_xaxes(
-                            tickfont=dict(color="#000000"),
-                            title=dict(font=dict(color="#000000"))
-                        )
-
-                        fig_bar.update_yaxes(
-                            tickfont=dict(color="#000000"),
-                            title=dict(font=dict(color="#000000"))
-                        )
-
-                        fig_bar.add_vline(
-                            x=80,
-                            line_dash="dot",
-                            line_color="#10B981",
-                            annotation_text="Meta: 80",
-                            annotation_font_color="#000000"
-                        )
-
+                        fig_bar = figura_criterios_evaluacion(criterios)
                         st.plotly_chart(fig_bar, use_container_width=True)
                     
                     st.markdown("---")
@@ -9728,7 +11460,7 @@ def pagina_resumen_corporativo(datos):
         )
         
         if vendedor_seleccionado and vendedor_seleccionado in coaching_data:
-            vendedor_data = coaching_data[vendedor_seleccionado]
+            vendedor_data = cargar_detalle_coaching(coaching_data[vendedor_seleccionado])
             
             # Header del vendedor
             st.markdown(f"""
@@ -9771,55 +11503,7 @@ def pagina_resumen_corporativo(datos):
             if criterios:
                 st.markdown("#### 📊 Criterios de Evaluación")
                 
-                # Gráfico de barras horizontal usando constante global
-                nombres = [CRITERIOS_NOMBRES.get(k, k) for k in criterios.keys()]
-                valores = list(criterios.values())
-                
-                fig_bar = px.bar(
-                    y=nombres,
-                    x=valores,
-                    orientation='h',
-                    labels={'y': 'Criterio', 'x': 'Puntaje'},
-                    color=valores,
-                    color_continuous_scale=[[0, '#EF4444'], [0.4, '#F59E0B'], [0.6, '#3B82F6'], [1, '#10B981']],
-                    text=valores
-                )
-                fig_bar.update_traces(
-                    texttemplate='%{text:.1f}',
-                    textposition='outside',
-                    textfont_size=12,
-                    textfont=dict(color="#000000")
-                )
-
-                fig_bar.update_layout(
-                    height=450,
-                    showlegend=False,
-                    paper_bgcolor='#FFFFFF',
-                    plot_bgcolor='#FAFBFC',
-                    yaxis={'categoryorder': 'total ascending'},
-                    xaxis={'range': [0, 100]},
-                    coloraxis_showscale=False,
-                    margin=dict(l=10, r=60, t=30, b=30),
-                    font=dict(color="#000000")
-                )
-
-                fig_bar.update_xaxes(
-                    tickfont=dict(color="#000000"),
-                    title=dict(font=dict(color="#000000"))
-                )
-
-                fig_bar.update_yaxes(
-                    tickfont=dict(color="#000000"),
-                    title=dict(font=dict(color="#000000"))
-                )
-
-                fig_bar.add_vline(
-                    x=80,
-                    line_dash="dot",
-                    line_color="#10B981",
-                    annotation_text="Meta: 80",
-                    annotation_font_color="#000000"
-                )
+                fig_bar = figura_criterios_evaluacion(criterios)
                 st.plotly_chart(fig_bar, use_container_width=True)
             
             st.markdown("---")
@@ -9852,31 +11536,21 @@ def main():
     nombre_usuario = datos_usuario.get('nombre', 'Usuario')
     rol_usuario = datos_usuario.get('rol', 'vendedor')
     
-    # Cargar datos: preferir pre-carga en background iniciada en el login
-    if st.session_state.get('datos_preload_started'):
-        # Si la pre-carga ya completó, usamos los datos ya cargados
-        if _DATOS_PRELOAD is not None:
-            datos = _DATOS_PRELOAD
-        else:
-            # Pre-carga en curso: esperar silenciosamente hasta que termine
-            import time
-            while _DATOS_LOADING:
-                time.sleep(0.1)
-            datos = _DATOS_PRELOAD or cargar_datos()
-    else:
-        # No hubo pre-carga: cargar de forma síncrona (comportamiento por defecto)
-        with st.spinner('Cargando datos...'):
-            datos = cargar_datos()
+    # Cargar datos: la caché de fuentes es compartida con la pre-carga del login,
+    # así que si la pre-carga sigue en curso esta llamada espera esa misma lectura
+    # y solo vuelve a leer las fuentes cuyos archivos cambiaron
+    with st.spinner('Cargando datos...'):
+        datos = cargar_datos(obtener_permisos_usuario())
     
-    transcripciones = datos.get('transcripciones', [])
-    if transcripciones:
+    transcripciones = datos.get('transcripciones')
+    if transcripciones is not None and not transcripciones.empty:
         df = crear_df_llamadas(transcripciones)
     else:
-        df_eval = datos.get('evaluaciones_gemini_df')
-        if df_eval is None:
-            df_eval = datos.get('evaluaciones')
-        df = crear_df_llamadas_desde_evaluaciones(df_eval)
-        if df.empty:
+        df = crear_df_llamadas_desde_hechos(datos.get('llamadas_df'))
+        # Con datos recortados al alcance de la sesión puede no haber filas propias
+        # aunque la fuente exista: solo es un error si la fuente completa está vacía
+        fuente_eval = cargar_fuente('evaluaciones_gemini_df')
+        if df.empty and (fuente_eval is None or fuente_eval.empty):
             st.error("No se encontraron transcripciones procesadas ni evaluaciones. Verifica 'reportes/evaluaciones_gemini.csv'.")
             return
         st.info("No se encontraron JSON de transcripciones. Usando solo 'reportes/evaluaciones_gemini.csv'.")
@@ -9906,7 +11580,20 @@ def main():
     # Botón cerrar sesión
     if st.sidebar.button("🚪 Cerrar Sesión", use_container_width=True):
         cerrar_sesion()
-    
+
+    # Admin: forzar la relectura de todas las fuentes para todas las sesiones
+    if rol_usuario == 'admin':
+        if st.sidebar.button("🔄 Actualizar Datos", use_container_width=True,
+                             help="Vuelve a leer todos los archivos de datos"):
+            with st.spinner('Actualizando datos...'):
+                refrescar_fuentes()
+            st.rerun()
+        # Códigos de agente que no figuran en LISTADO-DE-VENDEDORES.csv
+        sin_resolver = agentes_sin_resolver()
+        if sin_resolver:
+            with st.sidebar.expander(f"⚠️ Agentes sin listado ({len(sin_resolver)})"):
+                st.caption(", ".join(sin_resolver))
+
     st.sidebar.markdown("---")
     st.sidebar.markdown("## 📊 Panel de Control")
     